@@ -0,0 +1,192 @@
+"""
+Comparación del protocolo binario contra HTTP/JSON en /api/v1/validate
+
+Levanta en un proceso hijo la app (uvicorn) y el servidor binario sobre
+sockets locales, con el mismo núcleo de validación, y mide desde el proceso
+padre con el mismo número de conexiones:
+- http:          POST /api/v1/validate con keep-alive, una request a la vez por conexión
+- binary:        llamadas unarias, una a la vez por conexión
+- binary.stream: streaming bidireccional (todas las llamadas en vuelo sobre
+                 las mismas conexiones, hasta BINARY_MAX_IN_FLIGHT por conexión);
+                 su latencia incluye la espera en la ventana, compárese el throughput
+
+Por defecto se quita la latencia simulada de process_transaction para que
+la diferencia sea el costo del protocolo y no la espera; --simulated-latency
+la conserva. Cada transacción lleva un transaction_id único (sin aciertos del
+cache de idempotencia).
+
+Uso: python -m benchmarks.bench_binary [--requests N] [--connections C] [--simulated-latency]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import time
+from typing import Any, Dict, List
+
+os.environ.setdefault("TRACE_EXPORTER", "none")
+
+from benchmarks.suite import SAMPLE_TRANSACTION, quiet_app, summarize  # noqa: E402
+from src.binary_protocol import HEADER, BinaryClient, BinaryServer, CallError, bind, encode_validate  # noqa: E402
+from src.server import bind_socket  # noqa: E402
+
+
+class NoSimulatedLatency:
+    """Sustituto de random en src.main: latencia simulada cero, mismo 0.8% de errores"""
+
+    random = staticmethod(random.random)
+
+    @staticmethod
+    def uniform(a: float, b: float) -> float:
+        return 0.0
+
+
+def transaction(run: str, i: int) -> Dict[str, Any]:
+    return dict(SAMPLE_TRANSACTION, transaction_id=f"TX-BENCH-{run}-{i}", amount=1000.0 + i % 5000)
+
+
+def serve(http_sock: socket.socket, binary_sock: socket.socket, simulated_latency: bool):
+    import uvicorn
+
+    main = quiet_app()
+    if not simulated_latency:
+        main.random = NoSimulatedLatency
+    server = BinaryServer(f"unix:{binary_sock.getsockname()}", main.validate_binary)
+    server.sock = binary_sock
+    config = uvicorn.Config(main.app, log_level="warning", access_log=False)
+
+    async def run():
+        await server.start()
+        await uvicorn.Server(config).serve(sockets=[http_sock])
+
+    asyncio.run(run())
+
+
+async def http_client(port: int, run: str, ids: List[int], samples: List[int], statuses: Dict[int, int]):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    clock = time.perf_counter_ns
+    for i in ids:
+        body = json.dumps(transaction(run, i)).encode()
+        start = clock()
+        writer.write(
+            b"POST /api/v1/validate HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+            b"Content-Length: %d\r\n\r\n%s" % (len(body), body)
+        )
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in head.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.lower() == b"content-length":
+                length = int(value)
+        await reader.readexactly(length)
+        samples.append(clock() - start)
+        status = int(head.split(b" ", 2)[1])
+        statuses[status] = statuses.get(status, 0) + 1
+    writer.close()
+
+
+async def binary_client(address: str, run: str, ids: List[int], samples: List[int], statuses: Dict[int, int]):
+    client = await BinaryClient.connect(address)
+    clock = time.perf_counter_ns
+    for i in ids:
+        start = clock()
+        try:
+            await client.validate(transaction(run, i))
+            status = 200
+        except CallError as e:
+            status = e.status
+        samples.append(clock() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+    await client.close()
+
+
+async def binary_stream(address: str, run: str, ids: List[int], samples: List[int], statuses: Dict[int, int]):
+    client = await BinaryClient.connect(address)
+    clock = time.perf_counter_ns
+    sent: List[int] = []
+
+    async def transactions():
+        for i in ids:
+            sent.append(clock())
+            yield transaction(run, i)
+
+    async for index, outcome in client.stream(transactions()):
+        samples.append(clock() - sent[index])
+        status = outcome.status if isinstance(outcome, CallError) else 200
+        statuses[status] = statuses.get(status, 0) + 1
+    await client.close()
+
+
+async def measure(client, target, run: str, requests: int, connections: int) -> Dict[str, Any]:
+    samples: List[int] = []
+    statuses: Dict[int, int] = {}
+    ids = list(range(requests))
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(target, run, ids[c::connections], samples, statuses) for c in range(connections)
+    ))
+    result: Dict[str, Any] = summarize(samples, time.perf_counter() - start)
+    result["statuses"] = {str(k): v for k, v in sorted(statuses.items())}
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--simulated-latency", action="store_true")
+    args = parser.parse_args(argv)
+
+    http_sock = bind_socket("127.0.0.1", 0)
+    binary_address = f"unix:/tmp/bench-binary-{os.getpid()}.sock"
+    binary_sock = bind(binary_address)
+    port = http_sock.getsockname()[1]
+
+    context = multiprocessing.get_context("fork")
+    server = context.Process(target=serve, args=(http_sock, binary_sock, args.simulated_latency), daemon=True)
+    server.start()
+    try:
+        async def run():
+            # Esperar a que uvicorn acepte conexiones y calentar ambos caminos
+            for _ in range(100):
+                try:
+                    _, writer = await asyncio.open_connection("127.0.0.1", port)
+                    writer.close()
+                    break
+                except OSError:
+                    await asyncio.sleep(0.05)
+            warmup = min(200, args.requests)
+            await measure(http_client, port, "warmup-http", warmup, args.connections)
+            await measure(binary_client, binary_address, "warmup-binary", warmup, args.connections)
+            return {
+                "http": await measure(http_client, port, "http", args.requests, args.connections),
+                "binary": await measure(binary_client, binary_address, "binary", args.requests, args.connections),
+                "binary.stream": await measure(
+                    binary_stream, binary_address, "stream", args.requests, args.connections
+                ),
+            }
+
+        results = asyncio.run(run())
+    finally:
+        server.terminate()
+        server.join(5)
+        os.unlink(binary_address[len("unix:"):])
+
+    sample = transaction("http", 1)
+    print(f"request: JSON {len(json.dumps(sample))} bytes, binario {len(encode_validate(1, sample)) - HEADER.size} "
+          f"bytes (+{HEADER.size} de cabecera)")
+    print(f"{args.requests} validaciones, {args.connections} conexiones, "
+          f"latencia simulada {'sí' if args.simulated_latency else 'no'}")
+    for name, result in results.items():
+        print(f"{name:<14} p50 {result['p50_us']:>10.1f} µs  p95 {result['p95_us']:>10.1f} µs  "
+              f"p99 {result['p99_us']:>10.1f} µs  {result['ops_per_sec']:>8.0f} ops/s  {result['statuses']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
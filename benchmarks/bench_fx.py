@@ -0,0 +1,50 @@
+"""
+Microbenchmark de la normalización de montos por tipo de cambio
+
+Compara el costo por transacción de un límite sobre el monto crudo, sobre
+el monto normalizado con umbrales float precomputados y en modo exacto
+(Decimal), con la moneda base y con una moneda convertida.
+
+Uso: python -m benchmarks.bench_fx
+"""
+import os
+import timeit
+from types import SimpleNamespace
+
+from src.fx import load_fx_table
+from src.rules import compile_rules
+
+FX_FILE = os.path.join(os.path.dirname(__file__), "..", "src", "fx_rates.json")
+
+
+def spec(field: str):
+    return {
+        "version": "bench",
+        "checks": [{"name": "limit", "field": field, "op": "le", "value": 1000000}],
+        "warnings": [{"name": "high", "field": field, "op": "gt", "value": 500000, "message": "alto valor"}],
+    }
+
+
+def bench(plan, label: str, currency: str, number: int = 200000):
+    tx = SimpleNamespace(
+        transaction_id="TX-BENCH",
+        amount=1500.25,
+        currency=currency,
+        sender_account="1234567890",
+        receiver_account="0987654321",
+        description=None,
+    )
+    best = min(timeit.repeat(lambda: plan.evaluate(tx), number=number, repeat=5))
+    print(f"{label:<24} {currency}  {best / number * 1e6:8.3f} µs/transacción")
+
+
+if __name__ == "__main__":
+    fx = load_fx_table(FX_FILE)
+    plans = [
+        ("monto crudo", compile_rules(spec("amount"))),
+        ("base_amount (float)", compile_rules(spec("base_amount"), fx=fx)),
+        ("base_amount (Decimal)", compile_rules(spec("base_amount"), fx=fx, exact=True)),
+    ]
+    for currency in ("MXN", "EUR"):
+        for label, plan in plans:
+            bench(plan, label, currency)
@@ -0,0 +1,137 @@
+"""
+Benchmark del overhead por request del middleware de métricas
+
+Compara, sobre una app mínima invocada directamente por ASGI (sin red):
+- sin middleware
+- el metrics_middleware anterior (BaseHTTPMiddleware, time.time, path crudo)
+- MetricsMiddleware (ASGI puro, plantilla de ruta, hijos pre-registrados)
+
+Uso: python -m benchmarks.bench_middleware [requests]
+"""
+import asyncio
+import logging
+import sys
+import time
+
+from fastapi import FastAPI, Request
+from opentelemetry import trace
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+
+from src.instrumentation import MetricsMiddleware
+
+
+def make_metrics():
+    registry = CollectorRegistry()
+    return dict(
+        request_count=Counter('bench_requests_total', 'r', ['method', 'endpoint', 'status'], registry=registry),
+        request_latency=Histogram('bench_request_duration_seconds', 'l', ['method', 'endpoint'], registry=registry),
+        active_transactions=Gauge('bench_active', 'a', registry=registry),
+        error_count=Counter('bench_errors_total', 'e', ['error_type'], registry=registry),
+    )
+
+
+def make_logger():
+    logger = logging.getLogger("bench.middleware")
+    logger.handlers = [logging.NullHandler()]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def base_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/v1/items/{item_id}")
+    async def item(item_id: str):
+        return {"item_id": item_id}
+
+    return app
+
+
+def legacy_app() -> FastAPI:
+    """Reproducción del metrics_middleware original"""
+    app = base_app()
+    metrics = make_metrics()
+    logger = make_logger()
+
+    @app.middleware("http")
+    async def metrics_middleware(request: Request, call_next):
+        start_time = time.time()
+        metrics["active_transactions"].inc()
+        try:
+            response = await call_next(request)
+            duration = time.time() - start_time
+            metrics["request_count"].labels(
+                method=request.method, endpoint=request.url.path, status=response.status_code
+            ).inc()
+            metrics["request_latency"].labels(
+                method=request.method, endpoint=request.url.path
+            ).observe(duration)
+            logger.info(
+                f"{request.method} {request.url.path} - {response.status_code} - {duration:.3f}s",
+                extra={
+                    "otelTraceID": trace.format_trace_id(trace.get_current_span().get_span_context().trace_id),
+                    "otelSpanID": trace.format_span_id(trace.get_current_span().get_span_context().span_id)
+                }
+            )
+            return response
+        finally:
+            metrics["active_transactions"].dec()
+
+    return app
+
+
+def new_app(log_sample_rate: float = 1.0) -> FastAPI:
+    app = base_app()
+    app.add_middleware(
+        MetricsMiddleware,
+        logger=make_logger(),
+        routes=app.routes,
+        log_sample_rate=log_sample_rate,
+        **make_metrics()
+    )
+    return app
+
+
+async def drive(app, requests: int) -> float:
+    """Ejecuta requests ASGI directamente y retorna segundos por request"""
+    def make_receive():
+        messages = [{"type": "http.disconnect"}, {"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            return messages.pop() if len(messages) > 1 else messages[0]
+        return receive
+
+    async def send(message):
+        pass
+
+    def scope(i):
+        return {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": f"/api/v1/items/{i}",
+            "raw_path": f"/api/v1/items/{i}".encode(), "root_path": "",
+            "query_string": b"", "headers": [], "client": ("127.0.0.1", 1), "server": ("test", 80),
+        }
+
+    for i in range(200):
+        await app(scope(i), make_receive(), send)
+    start = time.perf_counter()
+    for i in range(requests):
+        await app(scope(i), make_receive(), send)
+    return (time.perf_counter() - start) / requests
+
+
+def main(requests: int = 20000):
+    baseline = asyncio.run(drive(base_app(), requests))
+    results = {
+        "metrics_middleware anterior": asyncio.run(drive(legacy_app(), requests)),
+        "MetricsMiddleware": asyncio.run(drive(new_app(), requests)),
+        "MetricsMiddleware (log 10%)": asyncio.run(drive(new_app(0.1), requests)),
+    }
+    print(f"{'sin middleware':<30} {baseline * 1e6:8.1f} µs/request")
+    for label, value in results.items():
+        print(f"{label:<30} {value * 1e6:8.1f} µs/request  (overhead {(value - baseline) * 1e6:7.1f} µs)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,52 @@
+"""
+Microbenchmark del motor de reglas
+
+Mide el costo por transacción del plan compilado con el archivo de reglas por
+defecto y con planes sintéticos de 100+ reglas.
+
+Uso: python -m benchmarks.bench_rules
+"""
+import os
+import timeit
+from types import SimpleNamespace
+
+from src.rules import compile_rules, load_rules
+
+RULES_FILE = os.path.join(os.path.dirname(__file__), "..", "src", "validation_rules.json")
+FX_FILE = os.path.join(os.path.dirname(__file__), "..", "src", "fx_rates.json")
+
+
+def synthetic_spec(size: int):
+    """Mezcla de operadores representativa de un archivo de reglas grande"""
+    checks = []
+    for i in range(size):
+        kind = i % 4
+        if kind == 0:
+            checks.append({"name": f"amount_{i}", "field": "amount", "op": "le", "value": 1000000 + i})
+        elif kind == 1:
+            checks.append({"name": f"currency_{i}", "field": "currency", "op": "in", "value": ["MXN", "USD", "EUR"]})
+        elif kind == 2:
+            checks.append({"name": f"sender_{i}", "field": "sender_account", "op": "min_len", "value": 10})
+        else:
+            checks.append({"name": f"accounts_{i}", "field": "sender_account", "op": "ne_field", "value": "receiver_account"})
+    warnings = [{"name": "high_value", "field": "amount", "op": "gt", "value": 500000, "message": "alto valor"}]
+    return {"version": "bench", "checks": checks, "warnings": warnings}
+
+
+def bench(plan, label: str, number: int = 100000):
+    tx = SimpleNamespace(
+        transaction_id="TX-BENCH",
+        amount=1500.0,
+        currency="MXN",
+        sender_account="1234567890",
+        receiver_account="0987654321",
+        description=None,
+    )
+    best = min(timeit.repeat(lambda: plan.evaluate(tx), number=number, repeat=5))
+    print(f"{label:<28} {len(plan):>4} reglas  {best / number * 1e6:8.2f} µs/transacción")
+
+
+if __name__ == "__main__":
+    bench(load_rules(RULES_FILE, fx_path=FX_FILE), "validation_rules.json")
+    for size in (50, 100, 200):
+        bench(compile_rules(synthetic_spec(size)), f"sintético ({size})", number=20000)
@@ -0,0 +1,368 @@
+"""
+Suite de benchmarks del validador (sin k6 ni stack externo)
+
+Mide, con semillas fijas:
+- stages:     costo por etapa de validate_transaction (parseo, reglas,
+              fraude sin la espera simulada, construcción del resultado)
+- middleware: overhead de MetricsMiddleware sobre una app mínima
+- metrics:    tiempo de render de /metrics con distinto número de series
+- e2e:        throughput e histograma de latencia de /api/v1/validate
+              invocando la app ASGI en el mismo proceso
+
+Uso:
+    python -m benchmarks.suite                      # imprime resultados
+    python -m benchmarks.suite --save               # guarda la línea base
+    python -m benchmarks.suite --compare            # falla si hay regresión
+    python -m benchmarks.suite --only stages,e2e --quick
+
+La comparación falla (exit 1) si el p95 de un caso sube, o su throughput
+baja, más allá de --threshold (20% por defecto) respecto a la línea base.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Antes de importar la app: sin exportar trazas a un host inexistente
+os.environ.setdefault("JAEGER_HOST", "127.0.0.1")
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SEED = 20250101
+
+# Límites (µs) del histograma de latencia de e2e
+HISTOGRAM_BOUNDS_US = (1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000)
+
+SAMPLE_TRANSACTION = {
+    "transaction_id": "TX-BENCH-0",
+    "amount": 1500.0,
+    "currency": "MXN",
+    "sender_account": "1234567890",
+    "receiver_account": "0987654321",
+    "description": "Benchmark",
+}
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(samples_ns: List[int], elapsed: Optional[float] = None) -> Dict[str, float]:
+    """p50/p95/p99 en µs y operaciones por segundo"""
+    values = sorted(samples_ns)
+    total = elapsed if elapsed is not None else sum(values) / 1e9
+    return {
+        "n": len(values),
+        "p50_us": round(percentile(values, 0.50) / 1000, 3),
+        "p95_us": round(percentile(values, 0.95) / 1000, 3),
+        "p99_us": round(percentile(values, 0.99) / 1000, 3),
+        "ops_per_sec": round(len(values) / total, 1) if total else 0.0,
+    }
+
+
+def histogram(samples_ns: List[int]) -> Dict[str, int]:
+    counts = {f"le_{bound}us": 0 for bound in HISTOGRAM_BOUNDS_US}
+    counts["inf"] = 0
+    for sample in samples_ns:
+        us = sample / 1000
+        for bound in HISTOGRAM_BOUNDS_US:
+            if us <= bound:
+                counts[f"le_{bound}us"] += 1
+                break
+        else:
+            counts["inf"] += 1
+    return counts
+
+
+def measure(func: Callable[[], Any], iterations: int, warmup: int = 200) -> Dict[str, float]:
+    for _ in range(warmup):
+        func()
+    samples = []
+    clock = time.perf_counter_ns
+    for _ in range(iterations):
+        start = clock()
+        func()
+        samples.append(clock() - start)
+    return summarize(samples)
+
+
+def quiet_app():
+    """Importa la app con los logs descartados (el costo de emitirlos se conserva)"""
+    from src import main
+
+    main.log_handler.stream = open(os.devnull, "w")
+    return main
+
+
+def bench_stages(quick: bool) -> Dict[str, Dict[str, float]]:
+    main = quiet_app()
+    iterations = 2000 if quick else 20000
+    raw = json.dumps(SAMPLE_TRANSACTION).encode()
+    transaction = main.parse_transaction(raw, "application/json")
+    checks, warnings = main.check_rules(transaction)
+    checks["fraud_check"] = True
+
+    def build_result():
+        is_valid, score, risk = main.score_checks(checks)
+        return main.encode_result(main.ValidationResult.model_construct(
+            transaction_id=transaction.transaction_id,
+            is_valid=is_valid,
+            validation_score=score,
+            risk_level=risk,
+            checks_passed=checks,
+            warnings=warnings,
+            timestamp=datetime.utcnow(),
+        ))
+
+    return {
+        "stages.parse": measure(lambda: main.parse_transaction(raw, "application/json"), iterations),
+        "stages.checks": measure(lambda: main.check_rules(transaction), iterations),
+        "stages.fraud": measure(lambda: main.score_fraud(
+            transaction, float(main.risk_scorer.model.score([transaction])[0]), main.risk_scorer.model
+        ), iterations),
+        "stages.result": measure(build_result, iterations),
+    }
+
+
+def bench_middleware(quick: bool) -> Dict[str, Dict[str, float]]:
+    from benchmarks.bench_middleware import base_app, new_app
+
+    requests = 2000 if quick else 20000
+
+    async def run(app):
+        scope = asgi_scope("GET", "/api/v1/items/1")
+        for _ in range(200):
+            await call_asgi(app, scope, b"")
+        samples = []
+        clock = time.perf_counter_ns
+        for _ in range(requests):
+            start = clock()
+            await call_asgi(app, scope, b"")
+            samples.append(clock() - start)
+        return summarize(samples)
+
+    baseline = asyncio.run(run(base_app()))
+    instrumented = asyncio.run(run(new_app()))
+    overhead = {
+        key: round(instrumented[key] - baseline[key], 3)
+        for key in ("p50_us", "p95_us", "p99_us")
+    }
+    overhead["n"] = instrumented["n"]
+    # Diferencia de dos mediciones: se reporta pero no se compara
+    overhead["derived"] = True
+    return {
+        "middleware.none": baseline,
+        "middleware.metrics": instrumented,
+        "middleware.overhead": overhead,
+    }
+
+
+def bench_metrics(quick: bool) -> Dict[str, Dict[str, float]]:
+    from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest
+
+    results = {}
+    for series in (100, 1000) if quick else (100, 1000, 10000):
+        registry = CollectorRegistry()
+        counter = Counter("bench_requests_total", "r", ["endpoint", "status"], registry=registry)
+        latency = Histogram("bench_request_duration_seconds", "l", ["endpoint"], registry=registry)
+        # Mitad contadores, mitad histogramas (cada uno expone ~15 líneas)
+        for i in range(series // 2):
+            counter.labels(endpoint=f"/e{i}", status="200").inc(i)
+        for i in range(max(1, series // 2 // 15)):
+            latency.labels(endpoint=f"/e{i}").observe(0.01 * i)
+        results[f"metrics.render_{series}"] = measure(
+            lambda: generate_latest(registry), 20 if quick else 100, warmup=3
+        )
+    return results
+
+
+def asgi_scope(method: str, path: str, headers: Optional[List] = None) -> Dict[str, Any]:
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": headers or [],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+
+async def call_asgi(app, scope: Dict[str, Any], body: bytes) -> int:
+    """Invoca la app ASGI directamente y retorna el status de la respuesta"""
+    sent = False
+    status = 0
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def e2e_body(i: int) -> bytes:
+    """
+    Transacción única por request: transaction_id (sin aciertos del cache de
+    idempotencia) y par de cuentas propios, para que ni las reglas de
+    velocidad ni la detección de reenvíos disparen y se mida la validación
+    normal y no el camino de rechazo
+    """
+    return json.dumps(dict(
+        SAMPLE_TRANSACTION,
+        transaction_id=f"TX-BENCH-{i}",
+        sender_account=f"{1000000000 + i}",
+        receiver_account=f"{2000000000 + i}",
+    )).encode()
+
+
+def bench_e2e(quick: bool, concurrency: int = 64) -> Dict[str, Dict[str, Any]]:
+    main = quiet_app()
+    requests = 500 if quick else 5000
+    headers = [(b"content-type", b"application/json")]
+
+    async def run():
+        queue: "asyncio.Queue[int]" = asyncio.Queue()
+        for i in range(requests):
+            queue.put_nowait(i)
+        samples: List[int] = []
+        statuses: Dict[int, int] = {}
+
+        async def client():
+            clock = time.perf_counter_ns
+            while True:
+                try:
+                    i = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                body = e2e_body(i)
+                start = clock()
+                status = await call_asgi(main.app, asgi_scope("POST", "/api/v1/validate", headers), body)
+                samples.append(clock() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        result: Dict[str, Any] = summarize(samples, elapsed)
+        result["concurrency"] = concurrency
+        result["statuses"] = {str(k): v for k, v in sorted(statuses.items())}
+        result["histogram"] = histogram(samples)
+        return result
+
+    return {"e2e.validate": asyncio.run(run())}
+
+
+BENCHMARKS = {
+    "stages": bench_stages,
+    "middleware": bench_middleware,
+    "metrics": bench_metrics,
+    "e2e": bench_e2e,
+}
+
+
+def compare(current: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float) -> List[str]:
+    """Lista de regresiones de p95/throughput respecto a la línea base"""
+    regressions = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        if not base or result.get("derived"):
+            continue
+        base_p95, p95 = base.get("p95_us"), result.get("p95_us")
+        if base_p95 and p95 is not None and p95 > base_p95 * (1 + threshold):
+            regressions.append(f"{name}: p95 {p95:.1f} µs > {base_p95:.1f} µs (+{threshold:.0%})")
+        base_ops, ops = base.get("ops_per_sec"), result.get("ops_per_sec")
+        if base_ops and ops is not None and ops < base_ops * (1 - threshold):
+            regressions.append(f"{name}: throughput {ops:.0f}/s < {base_ops:.0f}/s (-{threshold:.0%})")
+    return regressions
+
+
+def run(names: Sequence[str], quick: bool, seed: int = SEED) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    # La semilla es sólo para las corridas: no dejar random sembrado al llamador
+    state = random.getstate()
+    try:
+        for name in names:
+            random.seed(seed)
+            results.update(BENCHMARKS[name](quick))
+    finally:
+        random.setstate(state)
+    return results
+
+
+def print_results(results: Dict[str, Dict[str, Any]]):
+    for name, result in results.items():
+        line = f"{name:<24} p50 {result['p50_us']:>10.1f} µs  p95 {result['p95_us']:>10.1f} µs  p99 {result['p99_us']:>10.1f} µs"
+        if "ops_per_sec" in result:
+            line += f"  {result['ops_per_sec']:>10.0f} ops/s"
+        print(line)
+        if "histogram" in result:
+            for bucket, count in result["histogram"].items():
+                print(f"{'':<24} {bucket:<14} {count:>6} {'#' * min(60, count * 60 // max(1, result['n']))}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="benchmarks separados por coma")
+    parser.add_argument("--quick", action="store_true", help="menos iteraciones (CI)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save", action="store_true", help="guardar resultados como línea base")
+    parser.add_argument("--compare", action="store_true", help="fallar si hay regresión")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    names = [name for name in args.only.split(",") if name]
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"benchmarks desconocidos: {', '.join(sorted(unknown))}")
+
+    results = run(names, args.quick, args.seed)
+    print_results(results)
+
+    if args.compare:
+        try:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)["results"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"No se pudo leer la línea base {args.baseline}: {e}", file=sys.stderr)
+            return 2
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESIÓN {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "seed": args.seed,
+                    "quick": args.quick,
+                },
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Línea base guardada en {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,6 +12,10 @@ param(
 # Configuración
 $HEALTH_CHECK_URL_BLUE = "http://localhost:8000/health"
 $HEALTH_CHECK_URL_GREEN = "http://localhost:8001/health"
+$READY_CHECK_URL_GREEN = "http://localhost:8001/ready"
+$DRAIN_URL_BLUE = "http://localhost:8000/api/v1/admin/drain?wait=true"
+$DRAIN_TIMEOUT = 30  # segundos; igual a DRAIN_TIMEOUT_SECONDS del servicio
+$STARTUP_TIMEOUT = 60  # segundos; se consulta /ready cada segundo
 
 # Función para imprimir con color
 function Write-Info {
@@ -111,7 +115,11 @@ docker-compose build transaction-validator-green
 Write-Info "Iniciando contenedor GREEN..."
 docker-compose --profile green-deployment up -d transaction-validator-green
 
-Start-Sleep -Seconds 10
+# Esperar sólo lo que tarde en arrancar (la telemetría ya no se inicializa al importar)
+if (-not (Test-HealthCheck -Url $READY_CHECK_URL_GREEN -Retries $STARTUP_TIMEOUT -Interval 1)) {
+    Write-Error "El contenedor GREEN no quedó listo en ${STARTUP_TIMEOUT}s"
+    Invoke-Rollback
+}
 Write-Success "Contenedor GREEN iniciado"
 Write-Host ""
 
@@ -216,8 +224,17 @@ Write-Host ""
 Write-Info "Paso 7/7: Finalización del despliegue"
 Write-Host ""
 
+# Drenar antes de detener: termina las validaciones en vuelo y vacía spans, logs y outbox
+Write-Info "Drenando ambiente BLUE (antiguo)..."
+try {
+    Invoke-WebRequest -Uri $DRAIN_URL_BLUE -Method Post -TimeoutSec ($DRAIN_TIMEOUT + 15) -UseBasicParsing | Out-Null
+    Write-Success "Ambiente BLUE drenado"
+} catch {
+    Write-Warning "No se pudo confirmar el drenado de BLUE; el cierre espera hasta $($DRAIN_TIMEOUT)s"
+}
+
 Write-Info "Deteniendo ambiente BLUE (antiguo)..."
-docker-compose stop transaction-validator-blue
+docker-compose stop -t ($DRAIN_TIMEOUT + 10) transaction-validator-blue
 
 Write-Success "Ambiente BLUE detenido"
 Write-Success "GREEN es ahora el ambiente de producción"
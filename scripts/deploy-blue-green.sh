@@ -16,6 +16,10 @@ CURRENT_ENV="blue"
 NEW_ENV="green"
 HEALTH_CHECK_URL_BLUE="http://localhost:8000/health"
 HEALTH_CHECK_URL_GREEN="http://localhost:8001/health"
+READY_CHECK_URL_GREEN="http://localhost:8001/ready"
+DRAIN_URL_BLUE="http://localhost:8000/api/v1/admin/drain?wait=true"
+DRAIN_TIMEOUT=30  # segundos; igual a DRAIN_TIMEOUT_SECONDS del servicio
+STARTUP_TIMEOUT=60  # segundos; se consulta /ready cada segundo
 MAX_HEALTH_RETRIES=30
 HEALTH_CHECK_INTERVAL=10
 MONITORING_PERIOD=300  # 5 minutos de monitoreo
@@ -114,7 +118,11 @@ docker-compose build transaction-validator-green
 print_info "Iniciando contenedor GREEN..."
 docker-compose --profile green-deployment up -d transaction-validator-green
 
-sleep 10
+# /ready responde 200 cuando terminó el calentamiento del hot path
+if ! check_health "$READY_CHECK_URL_GREEN" $STARTUP_TIMEOUT 1; then
+    print_error "El contenedor GREEN no quedó listo en ${STARTUP_TIMEOUT}s"
+    rollback
+fi
 print_success "Contenedor GREEN iniciado"
 echo ""
 
@@ -225,8 +233,16 @@ echo ""
 print_info "Paso 7/7: Finalización del despliegue"
 echo ""
 
+# Drenar antes de detener: termina las validaciones en vuelo y vacía spans, logs y outbox
+print_info "Drenando ambiente BLUE (antiguo)..."
+if curl -sf -X POST --max-time $((DRAIN_TIMEOUT + 15)) "$DRAIN_URL_BLUE" > /dev/null; then
+    print_success "Ambiente BLUE drenado"
+else
+    print_warning "No se pudo confirmar el drenado de BLUE; el cierre espera hasta ${DRAIN_TIMEOUT}s"
+fi
+
 print_info "Deteniendo ambiente BLUE (antiguo)..."
-docker-compose stop transaction-validator-blue
+docker-compose stop -t $((DRAIN_TIMEOUT + 10)) transaction-validator-blue
 
 print_success "Ambiente BLUE detenido"
 print_success "GREEN es ahora el ambiente de producción"
@@ -0,0 +1,240 @@
+"""
+Registro compacto de cuentas conocidas
+
+Las cuentas válidas se leen de un snapshot binario local que se mapea en
+memoria (mmap): abrirlo sólo lee la cabecera, no crea objetos Python por
+cuenta, y los workers pre-fork comparten las mismas páginas del page cache.
+
+Formato del snapshot (little-endian):
+
+    cabecera   magic "PFACCT1\\0", cuentas, slots, bits del Bloom, creado (epoch), hashes
+    bloom      bits_del_bloom / 8 bytes
+    tabla      slots * uint64 (0 = vacío)
+
+Cada cuenta se reduce a una llave de 64 bits (blake2b). Un filtro de Bloom
+descarta rápido las cuentas desconocidas y una tabla hash con sondeo lineal
+(factor de carga 0.8) confirma las conocidas en O(1). La probabilidad de que
+una cuenta desconocida colisione con una llave del snapshot es de ~n/2^64.
+
+Para refrescar, el snapshot nuevo se escribe a un archivo temporal y se
+publica con os.replace; el registro lo detecta por stat y cambia al nuevo
+con una sola asignación, así que las lookups en vuelo terminan con el que
+ya tenían.
+
+Construcción: python -m src.accounts build <cuentas.txt> <snapshot>
+(una cuenta por línea).
+"""
+import hashlib
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from typing import Callable, Iterable, Optional
+
+MAGIC = b"PFACCT1\0"
+HEADER = struct.Struct("<8sQQQQI4x")
+LOAD_FACTOR = 0.8
+EMPTY = 0
+
+
+class AccountSnapshotError(ValueError):
+    """El snapshot de cuentas no existe o es inválido"""
+
+
+def _noop(*args):
+    pass
+
+
+def account_key(account: str) -> int:
+    """Llave de 64 bits de una cuenta (nunca 0, que marca un slot vacío)"""
+    key = int.from_bytes(hashlib.blake2b(account.encode(), digest_size=8).digest(), "little")
+    return key or 1
+
+
+def _bloom_positions(key: int, bits: int, hashes: int):
+    # Doble hashing: k posiciones a partir de las dos mitades de la llave
+    h1 = key & 0xFFFFFFFF
+    h2 = (key >> 32) | 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+class AccountSnapshot:
+    """Snapshot inmutable mapeado en memoria"""
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise AccountSnapshotError("El snapshot de cuentas requiere un host little-endian")
+        try:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise AccountSnapshotError(f"No se pudo abrir {path}: {e}") from e
+
+        if len(self._mmap) < HEADER.size:
+            raise AccountSnapshotError(f"{path} no es un snapshot de cuentas")
+        magic, count, slots, bloom_bits, created, hashes = HEADER.unpack_from(self._mmap)
+        bloom_size = bloom_bits // 8
+        expected = HEADER.size + bloom_size + slots * 8
+        if (magic != MAGIC or slots < 1 or bloom_bits < 64 or bloom_bits % 64
+                or hashes < 1 or count >= slots or len(self._mmap) != expected):
+            raise AccountSnapshotError(f"{path} no es un snapshot de cuentas válido")
+
+        self.path = path
+        self.count = count
+        self.slots = slots
+        self.bloom_bits = bloom_bits
+        self.hashes = hashes
+        self.created = created
+        self.identity = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        view = memoryview(self._mmap)
+        self._bloom = view[HEADER.size:HEADER.size + bloom_size]
+        self._table = view[HEADER.size + bloom_size:].cast("Q")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, account: str) -> bool:
+        key = account_key(account)
+        bloom = self._bloom
+        bits = self.bloom_bits
+        # Mismas posiciones que _bloom_positions, cortando en el primer bit en 0
+        position = key & 0xFFFFFFFF
+        step = (key >> 32) | 1
+        for _ in range(self.hashes):
+            index = position % bits
+            if not bloom[index >> 3] & (1 << (index & 7)):
+                return False
+            position += step
+        table = self._table
+        slots = self.slots
+        slot = key % slots
+        while True:
+            stored = table[slot]
+            if stored == key:
+                return True
+            if stored == EMPTY:
+                return False
+            slot = slot + 1 if slot + 1 < slots else 0
+
+
+class AccountRegistry:
+    """
+    Mantiene el snapshot activo y lo reemplaza atómicamente
+
+    Cada refresh_interval segundos una lookup revisa (stat) si el archivo
+    cambió y, si es así, abre el nuevo. Un snapshot inválido se reporta con
+    on_reload_error y se conserva el actual.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        refresh_interval: float = 30.0,
+        on_reload: Callable[[AccountSnapshot], None] = _noop,
+        on_reload_error: Callable[[Exception], None] = _noop,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.on_reload = on_reload
+        self.on_reload_error = on_reload_error
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.snapshot = AccountSnapshot(path)
+        self._next_check = clock() + refresh_interval
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    def __contains__(self, account: str) -> bool:
+        if self.refresh_interval > 0 and self._clock() >= self._next_check:
+            self._refresh_if_changed()
+        return account in self.snapshot
+
+    def _refresh_if_changed(self):
+        self._next_check = self._clock() + self.refresh_interval
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        if (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size) == self.snapshot.identity:
+            return
+        try:
+            self.reload()
+        except AccountSnapshotError as e:
+            self.on_reload_error(e)
+
+    def reload(self) -> AccountSnapshot:
+        """Abre el snapshot actual del archivo; si es inválido se conserva el anterior"""
+        with self._lock:
+            snapshot = AccountSnapshot(self.path)
+            # El snapshot anterior se libera cuando ya nadie lo usa
+            self.snapshot = snapshot
+        self.on_reload(snapshot)
+        return snapshot
+
+
+def build_snapshot(accounts: Iterable[str], path: str, bits_per_key: int = 10) -> int:
+    """
+    Escribe un snapshot con las cuentas dadas y lo publica con os.replace
+
+    Herramienta offline: recorre las cuentas en Python (minutos para decenas
+    de millones). Retorna el número de cuentas distintas.
+    """
+    keys = array("Q", (account_key(account) for account in accounts))
+    slots = max(1, int(len(keys) / LOAD_FACTOR) + 1)
+    bloom_bits = max(64, -(-len(keys) * bits_per_key // 64) * 64)
+    hashes = max(1, round(bits_per_key * math.log(2)))
+
+    table = array("Q", bytes(slots * 8))
+    bloom = bytearray(bloom_bits // 8)
+    count = 0
+    for key in keys:
+        slot = key % slots
+        while table[slot] != EMPTY and table[slot] != key:
+            slot = slot + 1 if slot + 1 < slots else 0
+        if table[slot] == key:
+            continue
+        table[slot] = key
+        count += 1
+        for position in _bloom_positions(key, bloom_bits, hashes):
+            bloom[position >> 3] |= 1 << (position & 7)
+    if sys.byteorder != "little":
+        table.byteswap()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".accounts-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, count, slots, bloom_bits, int(time.time()), hashes))
+            f.write(bloom)
+            table.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return count
+
+
+def main(argv: Optional[list] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 3 or argv[0] != "build":
+        print("Uso: python -m src.accounts build <cuentas.txt> <snapshot>", file=sys.stderr)
+        return 2
+    with open(argv[1], encoding="utf-8") as f:
+        count = build_snapshot((line.strip() for line in f if line.strip()), argv[2])
+    print(f"{count} cuentas escritas en {argv[2]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
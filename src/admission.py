@@ -0,0 +1,176 @@
+"""
+Control de admisión y descarte de carga
+
+Un límite de concurrencia adaptativo (AIMD) decide cuántas validaciones
+pueden estar en vuelo. Por cada ventana se compara la latencia promedio de
+las requests admitidas contra la latencia objetivo: si se excede, el límite
+baja multiplicativamente; si no y el límite se está usando, sube en uno.
+Las requests que no caben esperan un tiempo corto en una cola acotada y, si
+no obtienen lugar, reciben un 503 inmediato con Retry-After en lugar de
+esperar más allá del SLO.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Callable, Deque, Iterable, Optional
+
+# Motivos de descarte (etiqueta de métricas)
+SHED_QUEUE_FULL = "queue_full"
+SHED_TIMEOUT = "queue_timeout"
+
+
+def _noop(*args):
+    pass
+
+
+class AdaptiveLimiter:
+    """Límite de concurrencia AIMD con cola de espera acotada"""
+
+    def __init__(
+        self,
+        initial_limit: int = 100,
+        min_limit: int = 10,
+        max_limit: int = 1000,
+        target_latency: float = 0.25,
+        backoff: float = 0.9,
+        window: float = 0.1,
+        max_queue: int = 50,
+        queue_timeout: float = 0.05,
+        on_limit: Callable[[float], None] = _noop,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.window = window
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.on_limit = on_limit
+        self._clock = clock
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Acumuladores de la ventana actual
+        self._window_start = clock()
+        self._latency_sum = 0.0
+        self._samples = 0
+        self._peak_in_flight = 0
+
+    async def acquire(self) -> Optional[str]:
+        """Obtiene un lugar; retorna None si se admitió o el motivo de descarte"""
+        if self.in_flight < self.limit and not self._waiters:
+            self._admit()
+            return None
+        if len(self._waiters) >= self.max_queue or self.queue_timeout <= 0:
+            return SHED_QUEUE_FULL
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            if waiter.done() and not waiter.cancelled():
+                # El lugar se cedió justo al vencer el plazo
+                return None
+            return SHED_TIMEOUT
+        except asyncio.CancelledError:
+            self._discard(waiter)
+            if waiter.done() and not waiter.cancelled():
+                # El lugar ya se había cedido a esta request
+                self.release(None)
+            raise
+        # release() cedió su lugar: in_flight no cambia
+        return None
+
+    def release(self, latency: Optional[float]):
+        """Libera un lugar; latency (segundos) alimenta el ajuste del límite"""
+        if latency is not None:
+            self._observe(latency)
+        while self._waiters and self.in_flight <= self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _admit(self):
+        self.in_flight += 1
+        if self.in_flight > self._peak_in_flight:
+            self._peak_in_flight = self.in_flight
+
+    def _discard(self, waiter: asyncio.Future):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _observe(self, latency: float):
+        self._latency_sum += latency
+        self._samples += 1
+        now = self._clock()
+        if now - self._window_start < self.window:
+            return
+
+        average = self._latency_sum / self._samples
+        limit = self.limit
+        if average > self.target_latency:
+            limit = max(self.min_limit, limit * self.backoff)
+        elif self._peak_in_flight >= limit * 0.8:
+            limit = min(self.max_limit, limit + 1)
+        self._window_start = now
+        self._latency_sum = 0.0
+        self._samples = 0
+        self._peak_in_flight = self.in_flight
+        if limit != self.limit:
+            self.limit = limit
+            self.on_limit(limit)
+
+
+class AdmissionControlMiddleware:
+    """Aplica el AdaptiveLimiter a las rutas indicadas; el resto pasa directo"""
+
+    def __init__(
+        self,
+        app,
+        limiter: AdaptiveLimiter,
+        paths: Iterable[str] = ("/api/v1/validate",),
+        retry_after: int = 1,
+        on_shed: Callable[[str], None] = _noop,
+        on_queue_delay: Callable[[float], None] = _noop,
+    ):
+        self.app = app
+        self.limiter = limiter
+        self.paths = frozenset(paths)
+        self.on_shed = on_shed
+        self.on_queue_delay = on_queue_delay
+        self._body = json.dumps(
+            {"detail": "Servicio saturado, reintente más tarde"}, ensure_ascii=False
+        ).encode()
+        self._headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(self._body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.perf_counter()
+        reason = await self.limiter.acquire()
+        if reason is not None:
+            self.on_shed(reason)
+            await send({"type": "http.response.start", "status": 503, "headers": self._headers})
+            await send({"type": "http.response.body", "body": self._body})
+            return
+
+        started = time.perf_counter()
+        self.on_queue_delay(started - arrived)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(time.perf_counter() - started)
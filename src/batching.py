@@ -0,0 +1,99 @@
+"""
+Micro-batching de llamadas individuales concurrentes
+
+Las llamadas que llegan dentro de una ventana corta se agrupan y se procesan
+en una sola pasada; cada llamador recibe su propio resultado. El lote se
+despacha al alcanzar max_batch_size o max_wait segundos después de la
+primera llamada, así que con poca carga la latencia agregada está acotada
+por max_wait y con mucha carga el costo por llamada se amortiza.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+
+def _noop(*args):
+    pass
+
+
+class MicroBatcher:
+    """
+    Agrupa llamadas a submit() y las procesa con process_batch
+
+    process_batch recibe la lista de elementos y retorna un resultado por
+    elemento, en el mismo orden; un resultado que sea una excepción se
+    lanza sólo a su llamador. on_batch recibe el tamaño de cada lote y
+    on_wait la espera de cada elemento antes de procesarse.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = 64,
+        max_wait: float = 0.0005,
+        on_batch: Callable[[int], None] = _noop,
+        on_wait: Callable[[float], None] = _noop,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.on_batch = on_batch
+        self.on_wait = on_wait
+        self._clock = clock
+        self._pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Referencias a los lotes en proceso (evita que se recolecten)
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        """Agrega item al lote en formación y espera su resultado"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, self._clock()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future, float]]):
+        started = self._clock()
+        self.on_batch(len(batch))
+        for _, _, enqueued in batch:
+            self.on_wait(started - enqueued)
+
+        try:
+            results = await self.process_batch([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"process_batch retornó {len(results)} resultados para {len(batch)} elementos"
+                )
+        except asyncio.CancelledError:
+            for _, future, _ in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Los llamadores cancelados ya tienen su future resuelto
+        for (_, future, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
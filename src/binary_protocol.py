@@ -0,0 +1,526 @@
+"""
+Protocolo binario de validación sobre TCP o socket Unix
+
+Segunda entrada al mismo núcleo de validación que /api/v1/validate, sin HTTP
+ni JSON: frames con prefijo de longitud y campos de tamaño fijo empacados con
+struct. Cada frame lleva una cabecera (uint32 longitud del payload, uint8
+tipo, uint32 id de la llamada; little-endian) seguida del payload:
+
+    VALIDATE  cliente -> servidor: monto (float64), deadline en ms (uint32,
+              0 = el del servidor), transaction_id, moneda, cuenta origen,
+              cuenta destino y descripción (cadenas uint16 longitud + UTF-8;
+              descripción ausente = longitud 0xFFFF)
+    RESULT    servidor -> cliente: is_valid, score, timestamp (µs desde
+              epoch UTC), transaction_id, risk_level, checks (uint8 número de
+              pares nombre/bool), warnings y skipped_stages (uint8 número de
+              cadenas)
+    ERROR     servidor -> cliente: status (uint16, mismo código que la API
+              HTTP) y mensaje
+
+El id lo elige el cliente y la respuesta lo repite, así que una conexión
+sirve llamadas unarias multiplexadas y streaming bidireccional: el cliente
+escribe frames sin esperar y lee las respuestas según terminan (en orden de
+término, no de envío). Por conexión hay como máximo max_in_flight llamadas
+en vuelo; al llegar al límite se deja de leer el socket y el control de
+flujo de TCP frena al cliente (backpressure). Un frame malformado responde
+ERROR 400 y cierra la conexión.
+
+El servidor es genérico: handler recibe la transacción decodificada (dict con
+los campos de Transaction) y el deadline en ms, y retorna el frame de
+respuesta ya codificado. src/main.py lo conecta con el pipeline, las métricas
+y el drenado.
+"""
+import asyncio
+import os
+import socket
+import stat
+import struct
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+HEADER = struct.Struct("<IBI")
+VALIDATE_FIXED = struct.Struct("<dI")
+RESULT_FIXED = struct.Struct("<?dq")
+ERROR_FIXED = struct.Struct("<H")
+STRING_LENGTH = struct.Struct("<H")
+COUNT = struct.Struct("<B")
+
+VALIDATE = 1
+RESULT = 2
+ERROR = 3
+
+ABSENT = 0xFFFF
+MAX_STRING = 0xFFFE
+MAX_CALL_ID = 0xFFFFFFFF
+DEFAULT_MAX_FRAME_BYTES = 65536
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def _noop(*args):
+    pass
+
+
+class ProtocolError(ValueError):
+    """Frame malformado o fuera de los límites del protocolo"""
+
+
+def _pack_string(parts: list, value: Optional[str]):
+    if value is None:
+        parts.append(STRING_LENGTH.pack(ABSENT))
+        return
+    data = value.encode()
+    if len(data) > MAX_STRING:
+        raise ProtocolError(f"Cadena de {len(data)} bytes excede {MAX_STRING}")
+    parts.append(STRING_LENGTH.pack(len(data)))
+    parts.append(data)
+
+
+def _pack_strings(parts: list, values: Iterable[str]):
+    values = list(values)
+    if len(values) > 255:
+        raise ProtocolError("Más de 255 elementos en una lista")
+    parts.append(COUNT.pack(len(values)))
+    for value in values:
+        _pack_string(parts, value)
+
+
+class _Reader:
+    """Cursor sobre el payload de un frame"""
+
+    __slots__ = ("data", "offset")
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, fmt: struct.Struct) -> Tuple:
+        try:
+            values = fmt.unpack_from(self.data, self.offset)
+        except struct.error as e:
+            raise ProtocolError("Payload truncado") from e
+        self.offset += fmt.size
+        return values
+
+    def string(self) -> Optional[str]:
+        (length,) = self.unpack(STRING_LENGTH)
+        if length == ABSENT:
+            return None
+        end = self.offset + length
+        if end > len(self.data):
+            raise ProtocolError("Payload truncado")
+        try:
+            value = self.data[self.offset:end].decode()
+        except UnicodeDecodeError as e:
+            raise ProtocolError("Cadena no es UTF-8 válido") from e
+        self.offset = end
+        return value
+
+    def strings(self) -> list:
+        (count,) = self.unpack(COUNT)
+        return [self.string() for _ in range(count)]
+
+    def finish(self):
+        if self.offset != len(self.data):
+            raise ProtocolError("Bytes sobrantes en el payload")
+
+
+def encode_frame(kind: int, call_id: int, payload: bytes) -> bytes:
+    return HEADER.pack(len(payload), kind, call_id) + payload
+
+
+def encode_validate(call_id: int, transaction: Dict[str, Any], deadline_ms: int = 0) -> bytes:
+    """Frame VALIDATE con los campos de una transacción (mismas llaves que el JSON)"""
+    parts = [VALIDATE_FIXED.pack(float(transaction["amount"]), deadline_ms)]
+    _pack_string(parts, transaction["transaction_id"])
+    _pack_string(parts, transaction.get("currency", "MXN"))
+    _pack_string(parts, transaction["sender_account"])
+    _pack_string(parts, transaction["receiver_account"])
+    _pack_string(parts, transaction.get("description"))
+    return encode_frame(VALIDATE, call_id, b"".join(parts))
+
+
+def decode_validate(payload: bytes) -> Tuple[Dict[str, Any], int]:
+    """Retorna (campos de la transacción, deadline en ms)"""
+    reader = _Reader(payload)
+    amount, deadline_ms = reader.unpack(VALIDATE_FIXED)
+    fields = {
+        "transaction_id": reader.string(),
+        "amount": amount,
+        "currency": reader.string(),
+        "sender_account": reader.string(),
+        "receiver_account": reader.string(),
+        "description": reader.string(),
+    }
+    reader.finish()
+    # Un campo requerido ausente lo reporta la validación del modelo (422)
+    return {name: value for name, value in fields.items() if value is not None}, deadline_ms
+
+
+def encode_result(call_id: int, result) -> bytes:
+    """Frame RESULT a partir de un ValidationResult (o cualquier objeto con sus atributos)"""
+    parts = [RESULT_FIXED.pack(
+        result.is_valid,
+        result.validation_score,
+        (result.timestamp - EPOCH) // MICROSECOND,
+    )]
+    _pack_string(parts, result.transaction_id)
+    _pack_string(parts, result.risk_level)
+    checks = result.checks_passed
+    if len(checks) > 255:
+        raise ProtocolError("Más de 255 checks en el resultado")
+    parts.append(COUNT.pack(len(checks)))
+    for name, passed in checks.items():
+        _pack_string(parts, name)
+        parts.append(COUNT.pack(1 if passed else 0))
+    _pack_strings(parts, result.warnings)
+    _pack_strings(parts, result.skipped_stages)
+    return encode_frame(RESULT, call_id, b"".join(parts))
+
+
+def decode_result(payload: bytes) -> Dict[str, Any]:
+    """Resultado con las mismas llaves que la respuesta JSON de /api/v1/validate"""
+    reader = _Reader(payload)
+    is_valid, score, timestamp = reader.unpack(RESULT_FIXED)
+    transaction_id = reader.string()
+    risk_level = reader.string()
+    (count,) = reader.unpack(COUNT)
+    checks = {}
+    for _ in range(count):
+        name = reader.string()
+        checks[name] = bool(reader.unpack(COUNT)[0])
+    result = {
+        "transaction_id": transaction_id,
+        "is_valid": is_valid,
+        "validation_score": score,
+        "risk_level": risk_level,
+        "checks_passed": checks,
+        "warnings": reader.strings(),
+        "skipped_stages": reader.strings(),
+        "timestamp": EPOCH + timestamp * MICROSECOND,
+    }
+    reader.finish()
+    return result
+
+
+def encode_error(call_id: int, status: int, message: str) -> bytes:
+    parts = [ERROR_FIXED.pack(status)]
+    _pack_string(parts, message[:MAX_STRING // 4])
+    return encode_frame(ERROR, call_id, b"".join(parts))
+
+
+def decode_error(payload: bytes) -> Tuple[int, str]:
+    reader = _Reader(payload)
+    (status,) = reader.unpack(ERROR_FIXED)
+    message = reader.string() or ""
+    reader.finish()
+    return status, message
+
+
+async def read_frame(reader: asyncio.StreamReader, max_frame_bytes: int) -> Optional[Tuple[int, int, bytes]]:
+    """Lee un frame completo: (tipo, id, payload), o None si el otro extremo cerró"""
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise ProtocolError("Cabecera truncada") from e
+        return None
+    length, kind, call_id = HEADER.unpack(header)
+    if length > max_frame_bytes:
+        raise ProtocolError(f"Frame de {length} bytes excede {max_frame_bytes}")
+    try:
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError as e:
+        raise ProtocolError("Payload truncado") from e
+    return kind, call_id, payload
+
+
+def parse_address(address: str) -> Tuple[Optional[str], Any]:
+    """'unix:/ruta' -> ('unix', ruta); 'host:puerto' o ':puerto' -> (None, (host, puerto))"""
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    if not port.isdigit():
+        raise ValueError(f"Dirección inválida: {address!r} (host:puerto o unix:/ruta)")
+    return None, (host.strip("[]") or "0.0.0.0", int(port))
+
+
+def bind(address: str) -> socket.socket:
+    """Abre el socket de escucha (heredable por los workers pre-fork)"""
+    family, target = parse_address(address)
+    if family == "unix":
+        # Un socket que quedó de una ejecución anterior impide el bind
+        try:
+            if stat.S_ISSOCK(os.stat(target).st_mode):
+                os.unlink(target)
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        host, port = target
+        # IPPROTO_TCP: asyncio desactiva Nagle en las conexiones aceptadas (ver src/server.py)
+        family = socket.AF_INET6 if ":" in host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(target)
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class BinaryServer:
+    """
+    Servidor asyncio del protocolo
+
+    closing() se consulta después de leer cada llamada: si retorna verdadero
+    la conexión deja de leer, responde las que tiene en vuelo y se cierra (el
+    equivalente de Connection: close al drenar). on_protocol_error
+    recibe el ProtocolError de una conexión que se cierra por un frame
+    malformado.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        handler: Callable[[int, Dict[str, Any], int], Awaitable[bytes]],
+        max_in_flight: int = 64,
+        max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES,
+        closing: Callable[[], bool] = lambda: False,
+        on_protocol_error: Callable[[ProtocolError], None] = _noop,
+    ):
+        parse_address(address)
+        self.address = address
+        self.handler = handler
+        self.max_in_flight = max_in_flight
+        self.max_frame_bytes = max_frame_bytes
+        self.closing = closing
+        self.on_protocol_error = on_protocol_error
+        self.sock: Optional[socket.socket] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.Task] = set()
+
+    @property
+    def connections(self) -> int:
+        return len(self._connections)
+
+    def bind(self) -> socket.socket:
+        """Abre el socket (el maestro pre-fork lo hace antes del fork)"""
+        if self.sock is None:
+            self.sock = bind(self.address)
+        return self.sock
+
+    async def start(self):
+        sock = self.bind()
+        if sock.family == socket.AF_UNIX:
+            self._server = await asyncio.start_unix_server(self._serve, sock=sock)
+        else:
+            self._server = await asyncio.start_server(self._serve, sock=sock)
+
+    async def close(self):
+        """
+        Deja de aceptar conexiones y cierra las abiertas
+
+        Se llama después de drenar: las llamadas en vuelo ya terminaron (o se
+        abandonaron al vencer el deadline) y las conexiones sólo esperan frames.
+        """
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        connections = list(self._connections)
+        for task in connections:
+            task.cancel()
+        await asyncio.gather(*connections, return_exceptions=True)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(asyncio.current_task())
+        slots = asyncio.Semaphore(self.max_in_flight)
+        calls: Set[asyncio.Task] = set()
+
+        async def call(call_id: int, payload: bytes):
+            try:
+                try:
+                    fields, deadline_ms = decode_validate(payload)
+                except ProtocolError as e:
+                    response = encode_error(call_id, 400, str(e))
+                else:
+                    response = await self.handler(call_id, fields, deadline_ms)
+                writer.write(response)
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                slots.release()
+
+        try:
+            while True:
+                await slots.acquire()
+                try:
+                    frame = await read_frame(reader, self.max_frame_bytes)
+                except ProtocolError as e:
+                    slots.release()
+                    self.on_protocol_error(e)
+                    writer.write(encode_error(0, 400, str(e)))
+                    break
+                if frame is None:
+                    slots.release()
+                    break
+                kind, call_id, payload = frame
+                if kind != VALIDATE:
+                    slots.release()
+                    error = ProtocolError(f"Tipo de frame desconocido: {kind}")
+                    self.on_protocol_error(error)
+                    writer.write(encode_error(call_id, 400, str(error)))
+                    break
+                task = asyncio.ensure_future(call(call_id, payload))
+                calls.add(task)
+                task.add_done_callback(calls.discard)
+                if self.closing():
+                    # La llamada recién leída se responde (503 al drenar) antes de cerrar
+                    break
+            if calls:
+                await asyncio.wait(set(calls))
+        except ConnectionError:
+            pass
+        except asyncio.CancelledError:
+            for task in calls:
+                task.cancel()
+            raise
+        finally:
+            self._connections.discard(asyncio.current_task())
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+
+
+class CallError(Exception):
+    """El servidor respondió ERROR a una llamada"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class BinaryClient:
+    """
+    Cliente del protocolo sobre una conexión
+
+    validate() es una llamada unaria (varias corrutinas pueden compartir la
+    conexión); stream() envía un flujo de transacciones sin esperar y entrega
+    (índice, resultado o CallError) según llegan las respuestas.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES):
+        self._reader = reader
+        self._writer = writer
+        self._max_frame_bytes = max_frame_bytes
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._receiving = asyncio.ensure_future(self._receive())
+
+    @classmethod
+    async def connect(cls, address: str, **kwargs) -> "BinaryClient":
+        family, target = parse_address(address)
+        if family == "unix":
+            reader, writer = await asyncio.open_unix_connection(target)
+        else:
+            reader, writer = await asyncio.open_connection(*target)
+            writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return cls(reader, writer, **kwargs)
+
+    async def _receive(self):
+        error: BaseException = ConnectionError("Conexión cerrada por el servidor")
+        try:
+            while True:
+                frame = await read_frame(self._reader, self._max_frame_bytes)
+                if frame is None:
+                    break
+                kind, call_id, payload = frame
+                future = self._pending.pop(call_id, None)
+                if kind == ERROR and future is None:
+                    # Error de la conexión (id 0 o desconocido): cierra todas las llamadas
+                    error = CallError(*decode_error(payload))
+                    break
+                if future is None or future.done():
+                    continue
+                if kind == RESULT:
+                    future.set_result(decode_result(payload))
+                elif kind == ERROR:
+                    future.set_exception(CallError(*decode_error(payload)))
+        except (ConnectionError, ProtocolError) as e:
+            error = e
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+
+    def _send(self, transaction: Dict[str, Any], deadline_ms: int) -> asyncio.Future:
+        if self._receiving.done():
+            raise ConnectionError("Conexión cerrada")
+        self._next_id = self._next_id % MAX_CALL_ID + 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = future
+        self._writer.write(encode_validate(self._next_id, transaction, deadline_ms))
+        return future
+
+    async def validate(self, transaction: Dict[str, Any], deadline_ms: int = 0) -> Dict[str, Any]:
+        """Valida una transacción; CallError si el servidor responde ERROR"""
+        future = self._send(transaction, deadline_ms)
+        try:
+            await self._writer.drain()
+        except ConnectionError:
+            # La llamada falla con el error de la conexión al cerrarse la recepción
+            pass
+        return await future
+
+    async def stream(
+        self,
+        transactions: AsyncIterator[Dict[str, Any]],
+        deadline_ms: int = 0,
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """Envía y recibe a la vez; las respuestas llegan en orden de término"""
+        done: asyncio.Queue = asyncio.Queue()
+        sent = 0
+
+        async def send_all():
+            nonlocal sent
+            async for transaction in transactions:
+                index = sent
+                future = self._send(transaction, deadline_ms)
+                future.add_done_callback(lambda f, index=index: done.put_nowait((index, f)))
+                sent += 1
+                try:
+                    await self._writer.drain()
+                except ConnectionError:
+                    pass
+
+        sender = asyncio.ensure_future(send_all())
+        received = 0
+        try:
+            while not sender.done() or received < sent:
+                getter = asyncio.ensure_future(done.get())
+                waiting = {getter} if sender.done() else {getter, sender}
+                await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    # Terminó el envío: propagar su error o seguir recibiendo
+                    getter.cancel()
+                    sender.result()
+                    continue
+                index, future = getter.result()
+                received += 1
+                error = future.exception()
+                yield index, future.result() if error is None else error
+        finally:
+            sender.cancel()
+
+    async def close(self):
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+        await asyncio.gather(self._receiving, return_exceptions=True)
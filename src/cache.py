@@ -0,0 +1,166 @@
+"""
+Cache de idempotencia para resultados de validación
+
+Los clientes reintentan con el mismo transaction_id; el cache evita repetir
+el pipeline completo. Nivel local en memoria (TTL + LRU acotado), un backend
+compartido opcional (p. ej. Redis entre réplicas) y single-flight para que
+requests idénticas concurrentes ejecuten una sola validación.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Protocol, Tuple
+
+
+def _noop(*args):
+    pass
+
+
+class SharedBackend(Protocol):
+    """Backend compartido entre procesos/réplicas (valores serializados)"""
+
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        ...
+
+
+class InMemorySharedBackend:
+    """Backend compartido en memoria, sustituto local para pruebas y desarrollo"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[float, str]] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+
+
+class LRUCache:
+    """Cache local con TTL y expulsión LRU de tamaño acotado"""
+
+    def __init__(self, max_size: int, ttl: float, on_evict: Callable[[str], None] = _noop):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._on_evict = on_evict
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self._on_evict("expired")
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self._on_evict("lru")
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class IdempotencyCache:
+    """
+    Cache de resultados con single-flight
+
+    get_or_compute busca en el nivel local, después se une a un cómputo en
+    vuelo para la misma llave, después consulta el backend compartido y sólo
+    si nada de eso responde ejecuta compute(). Los errores no se cachean, ni
+    los valores que should_cache rechace (p. ej. resultados degradados), y
+    los fallos del backend compartido no hacen fallar la validación.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        ttl: float = 300.0,
+        backend: Optional[SharedBackend] = None,
+        dumps: Callable[[Any], str] = str,
+        loads: Callable[[str], Any] = str,
+        on_hit: Callable[[str], None] = _noop,
+        on_miss: Callable[[], None] = _noop,
+        on_evict: Callable[[str], None] = _noop,
+        on_backend_error: Callable[[str], None] = _noop,
+        should_cache: Callable[[Any], bool] = lambda value: True,
+    ):
+        self.local = LRUCache(max_size, ttl, on_evict=on_evict)
+        self.backend = backend
+        self._dumps = dumps
+        self._loads = loads
+        self._on_hit = on_hit
+        self._on_miss = on_miss
+        self._on_backend_error = on_backend_error
+        self._should_cache = should_cache
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.local.get(key)
+        if value is not None:
+            self._on_hit("local")
+            return value
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._on_hit("in_flight")
+        else:
+            # El cómputo corre en su propia tarea: cancelar al primer llamador
+            # no cancela a los seguidores ni deja de poblar el cache
+            task = asyncio.ensure_future(self._load_or_compute(key, compute))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Evitar "exception never retrieved" si todos los llamadores se cancelaron
+        if not task.cancelled():
+            task.exception()
+
+    async def _load_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        if self.backend is not None:
+            try:
+                raw = await self.backend.get(key)
+            except Exception:
+                # Una caída del backend compartido degrada al nivel local
+                self._on_backend_error("get")
+                raw = None
+            if raw is not None:
+                value = self._loads(raw)
+                self.local.set(key, value)
+                self._on_hit("shared")
+                return value
+
+        self._on_miss()
+        value = await compute()
+        if not self._should_cache(value):
+            return value
+        self.local.set(key, value)
+        if self.backend is not None:
+            try:
+                await self.backend.set(key, self._dumps(value), self.local.ttl)
+            except Exception:
+                self._on_backend_error("set")
+        return value
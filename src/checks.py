@@ -0,0 +1,31 @@
+"""
+Constantes y cálculo de score de las validaciones
+
+Los checks y los límites de entrada viven en el archivo de reglas (ver
+src/rules.py); aquí queda el cálculo del resultado a partir de los checks.
+"""
+from typing import Dict, Tuple
+
+FRAUD_WARNING = "Patrones inusuales detectados"
+BUDGET_WARNING = "Detección de fraude omitida por tiempo; reintente la validación"
+REPLAY_WARNING = "transaction_id repetido en la ventana reciente: posible reenvío"
+DUPLICATE_WARNING = "Transacción idéntica (cuentas, monto y moneda) en la ventana reciente: posible doble envío"
+
+
+def score_checks(checks: Dict[str, bool]) -> Tuple[bool, float, str]:
+    """Calcula validez, score y nivel de riesgo a partir de los checks"""
+    passed_checks = sum(checks.values())
+    total_checks = len(checks)
+    validation_score = (passed_checks / total_checks) * 100
+
+    is_valid = passed_checks == total_checks
+
+    # Determinar nivel de riesgo
+    if validation_score >= 90:
+        risk_level = "low"
+    elif validation_score >= 70:
+        risk_level = "medium"
+    else:
+        risk_level = "high"
+
+    return is_valid, validation_score, risk_level
@@ -0,0 +1,172 @@
+"""
+Exposición de /metrics cacheada y fuera del event loop
+
+Renderizar el registro (y en modo multiproceso leer los archivos mmap de
+todos los workers) cuesta más con cada combinación de etiquetas, y con
+varios scrapers competía con el tráfico de validación en el event loop.
+Aquí el render corre en el executor por defecto, el payload codificado (y
+su versión gzip) se cachea ttl segundos por formato, y los scrapes que
+llegan mientras se renderiza esperan ese mismo render (single-flight).
+
+El formato se negocia con Accept (texto de Prometheus u OpenMetrics) y la
+compresión con Accept-Encoding. En modo snapshot (start_refresh) un ciclo en
+segundo plano re-renderiza cada intervalo y los scrapes siempre se sirven
+del último snapshot, sin esperar un render.
+"""
+import asyncio
+import gzip
+import time
+from typing import Callable, Dict, NamedTuple, Optional
+
+from prometheus_client import CollectorRegistry
+from prometheus_client.exposition import choose_encoder
+
+
+def _noop(*args):
+    pass
+
+
+class Snapshot(NamedTuple):
+    """Payload renderizado de un formato"""
+    rendered_at: float
+    body: bytes
+    gzipped: bytes
+
+
+class Payload(NamedTuple):
+    """Respuesta lista para enviar"""
+    body: bytes
+    content_type: str
+    content_encoding: Optional[str]
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Si Accept-Encoding admite gzip (respeta q=0)"""
+    for part in (accept_encoding or "").split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        if coding.lower() not in ("gzip", "*"):
+            continue
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        return quality > 0
+    return False
+
+
+class MetricsExposition:
+    """
+    Render cacheado del registro de Prometheus
+
+    registry retorna el registro a exponer en cada render (en modo
+    multiproceso, uno nuevo con el agregado de los workers). on_render
+    recibe la duración y el tamaño de cada render; on_scrape el origen de
+    cada respuesta: "hit", "in_flight" o "miss"; on_error las fallas del
+    render en segundo plano.
+    """
+
+    def __init__(
+        self,
+        registry: Callable[[], CollectorRegistry],
+        ttl: float = 1.0,
+        gzip_level: int = 6,
+        on_render: Callable[[float, int], None] = _noop,
+        on_scrape: Callable[[str], None] = _noop,
+        on_error: Callable[[Exception], None] = _noop,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._registry = registry
+        self.ttl = ttl
+        self.gzip_level = gzip_level
+        self.on_render = on_render
+        self.on_scrape = on_scrape
+        self.on_error = on_error
+        self._clock = clock
+        # Por content type: encoder y último snapshot
+        self._encoders: Dict[str, Callable[[CollectorRegistry], bytes]] = {}
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._refresher: Optional[asyncio.Task] = None
+
+    async def payload(self, accept: Optional[str] = None, accept_encoding: Optional[str] = None) -> Payload:
+        """Payload para un scrape según sus headers Accept y Accept-Encoding"""
+        encoder, content_type = choose_encoder(accept)
+        self._encoders.setdefault(content_type, encoder)
+        snapshot = await self._snapshot(content_type)
+        if accepts_gzip(accept_encoding):
+            return Payload(snapshot.gzipped, content_type, "gzip")
+        return Payload(snapshot.body, content_type, None)
+
+    async def _snapshot(self, content_type: str, force: bool = False) -> Snapshot:
+        # force: render del modo snapshot, que no cuenta como scrape
+        on_scrape = _noop if force else self.on_scrape
+        snapshot = self._snapshots.get(content_type)
+        if snapshot is not None and not force and (
+            self._refresher is not None or self._clock() - snapshot.rendered_at < self.ttl
+        ):
+            on_scrape("hit")
+            return snapshot
+
+        task = self._in_flight.get(content_type)
+        if task is not None:
+            on_scrape("in_flight")
+        else:
+            on_scrape("miss")
+            # En su propia tarea: un scraper que se desconecta no cancela el render
+            task = asyncio.ensure_future(self._render(content_type))
+            self._in_flight[content_type] = task
+            task.add_done_callback(lambda done: self._finish(content_type, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, content_type: str, task: asyncio.Task):
+        if self._in_flight.get(content_type) is task:
+            del self._in_flight[content_type]
+        if not task.cancelled():
+            task.exception()
+
+    async def _render(self, content_type: str) -> Snapshot:
+        loop = asyncio.get_running_loop()
+        snapshot = await loop.run_in_executor(None, self._render_sync, self._encoders[content_type])
+        self._snapshots[content_type] = snapshot
+        return snapshot
+
+    def _render_sync(self, encoder: Callable[[CollectorRegistry], bytes]) -> Snapshot:
+        # La antigüedad se cuenta desde que se empezó a leer el registro
+        rendered_at = self._clock()
+        start = time.perf_counter()
+        body = encoder(self._registry())
+        gzipped = gzip.compress(body, compresslevel=self.gzip_level)
+        self.on_render(time.perf_counter() - start, len(body))
+        return Snapshot(rendered_at, body, gzipped)
+
+    def start_refresh(self, interval: float):
+        """Modo snapshot: re-renderiza cada interval segundos en segundo plano"""
+        if self._refresher is None:
+            if not self._encoders:
+                encoder, content_type = choose_encoder("")
+                self._encoders[content_type] = encoder
+            self._refresher = asyncio.ensure_future(self._refresh_loop(interval))
+
+    async def _refresh_loop(self, interval: float):
+        while True:
+            for content_type in list(self._encoders):
+                try:
+                    await self._snapshot(content_type, force=True)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Se sigue sirviendo el snapshot anterior
+                    self.on_error(e)
+            await asyncio.sleep(interval)
+
+    async def stop_refresh(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
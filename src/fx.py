@@ -0,0 +1,96 @@
+"""
+Tabla de tipos de cambio para normalizar montos a una moneda base
+
+Los límites de monto se expresan en la moneda base de la tabla; el motor de
+reglas (src/rules.py) los convierte al compilar en un umbral por moneda, así
+que la evaluación es una comparación contra el umbral de la moneda de la
+transacción, sin convertir el monto.
+
+Formato del archivo:
+
+    {
+      "version": "2025-01-15",
+      "base": "MXN",
+      "rates": {"MXN": "1", "USD": "17.05", "EUR": "18.52"}
+    }
+
+rates son unidades de la moneda base por unidad de cada moneda. Se leen como
+Decimal (cadena o número) para que el modo exacto no herede el redondeo de
+float; los umbrales float se derivan del cociente exacto.
+
+En modo exacto el monto se compara como Decimal(repr(amount)): para montos
+de hasta 15 dígitos significativos repr() reproduce el literal que envió el
+cliente, así que la conversión y la comparación no redondean.
+"""
+import json
+from decimal import Context, Decimal, InvalidOperation
+from typing import Any, Dict
+
+# Precisión suficiente para que monto (≤ 17 dígitos) por tipo sea exacto
+EXACT = Context(prec=100)
+
+
+class FxError(ValueError):
+    """La tabla de tipos de cambio es inválida"""
+
+
+def _rate(currency: str, value: Any) -> Decimal:
+    if isinstance(value, bool) or not isinstance(value, (str, int, Decimal)):
+        raise FxError(f"Tipo de cambio inválido para {currency}: {value!r}")
+    try:
+        rate = Decimal(value)
+    except InvalidOperation as e:
+        raise FxError(f"Tipo de cambio inválido para {currency}: {value!r}") from e
+    if not rate.is_finite() or rate <= 0:
+        raise FxError(f"El tipo de cambio de {currency} debe ser positivo, no {value!r}")
+    return rate
+
+
+def exact_amount(amount: float) -> Decimal:
+    """Monto como Decimal con el literal más corto que reproduce el float"""
+    return Decimal(repr(amount))
+
+
+class FxTable:
+    """Tabla inmutable de tipos de cambio a la moneda base"""
+
+    def __init__(self, version: str, base: str, rates: Dict[str, Decimal]):
+        self.version = version
+        self.base = base
+        self.rates = dict(rates)
+
+    def thresholds(self, limit: float) -> Dict[str, float]:
+        """Límite en moneda base convertido a cada moneda (float más cercano al cociente exacto)"""
+        limit = Decimal(repr(limit))
+        return {currency: float(EXACT.divide(limit, rate)) for currency, rate in self.rates.items()}
+
+    def to_base(self, amount: float, currency: str) -> Decimal:
+        """Monto exacto en moneda base (KeyError si la moneda no está en la tabla)"""
+        return EXACT.multiply(exact_amount(amount), self.rates[currency])
+
+
+def parse_fx_table(spec: Any) -> FxTable:
+    """Valida la especificación de la tabla"""
+    if not isinstance(spec, dict):
+        raise FxError("La tabla de tipos de cambio debe ser un objeto JSON")
+    version = spec.get("version")
+    if not isinstance(version, str) or not version:
+        raise FxError("La tabla de tipos de cambio requiere 'version'")
+    base = spec.get("base")
+    rates = spec.get("rates")
+    if not isinstance(rates, dict) or not rates:
+        raise FxError("'rates' requiere un objeto no vacío de moneda a tipo de cambio")
+    parsed = {currency: _rate(currency, value) for currency, value in rates.items()}
+    if not isinstance(base, str) or parsed.get(base) != 1:
+        raise FxError(f"La moneda base {base!r} debe estar en 'rates' con tipo 1")
+    return FxTable(version, base, parsed)
+
+
+def load_fx_table(path: str) -> FxTable:
+    """Carga la tabla de un archivo (los números se leen como Decimal)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f, parse_float=Decimal)
+    except (OSError, ValueError) as e:
+        raise FxError(f"No se pudo leer {path}: {e}") from e
+    return parse_fx_table(spec)
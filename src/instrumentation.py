@@ -0,0 +1,148 @@
+"""
+Middleware ASGI de métricas y access log
+
+Etiqueta las métricas con la plantilla de la ruta resuelta (no con el path
+crudo), así que rutas desconocidas no crean series nuevas. Los hijos de las
+métricas se resuelven una sola vez por combinación de etiquetas y la latencia
+se mide con perf_counter_ns. El access log se muestrea antes de construir el
+registro; los IDs de traza los agrega el handler de logging de forma diferida.
+Con timers (src/profiling.py) se mide por separado la app, las métricas y el
+access log.
+"""
+import logging
+import random
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from src.profiling import StageTimers
+
+# Métodos conocidos; cualquier otro se agrupa para acotar la cardinalidad
+KNOWN_METHODS = frozenset(("GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"))
+OTHER_METHOD = "OTHER"
+UNMATCHED_ROUTE = "unmatched"
+
+
+class MetricsMiddleware:
+    """Reemplazo ASGI puro del antiguo metrics_middleware"""
+
+    def __init__(
+        self,
+        app,
+        request_count,
+        request_latency,
+        active_transactions,
+        error_count,
+        logger: logging.Logger,
+        routes: Iterable = (),
+        log_sample_rate: float = 1.0,
+        timers: Optional[StageTimers] = None,
+    ):
+        self.app = app
+        self._request_count = request_count
+        self._request_latency = request_latency
+        self._active = active_transactions
+        self._error_count = error_count
+        self._logger = logger
+        self._log_sample_rate = log_sample_rate
+        self._timers = timers or StageTimers(enabled=False)
+        # Generador propio: el muestreo no altera la secuencia de random
+        self._sampler = random.Random()
+        self._counters: Dict[Tuple[str, str, str], object] = {}
+        self._histograms: Dict[Tuple[str, str], object] = {}
+        self._endpoint_paths: Dict[object, str] = {}
+
+        # Pre-registrar los hijos de las rutas conocidas
+        for route in routes:
+            path = getattr(route, "path", None)
+            if path is None:
+                continue
+            endpoint = getattr(route, "endpoint", None)
+            if endpoint is not None:
+                self._endpoint_paths[endpoint] = path
+            for method in getattr(route, "methods", None) or ():
+                self._histogram(method, path)
+                self._counter(method, path, "200")
+
+    def _counter(self, method: str, template: str, status: str):
+        key = (method, template, status)
+        child = self._counters.get(key)
+        if child is None:
+            child = self._request_count.labels(method=method, endpoint=template, status=status)
+            self._counters[key] = child
+        return child
+
+    def _histogram(self, method: str, template: str):
+        key = (method, template)
+        child = self._histograms.get(key)
+        if child is None:
+            child = self._request_latency.labels(method=method, endpoint=template)
+            self._histograms[key] = child
+        return child
+
+    def route_template(self, scope) -> str:
+        """Plantilla de la ruta que atendió la request (p. ej. /api/v1/validate)"""
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        # Rutas de Starlette (docs, openapi) sólo dejan el endpoint en el scope
+        return self._endpoint_paths.get(scope.get("endpoint"), UNMATCHED_ROUTE)
+
+    def _should_log(self, status_code: int) -> bool:
+        if status_code >= 500:
+            return self._logger.isEnabledFor(logging.ERROR)
+        if not self._logger.isEnabledFor(logging.INFO):
+            return False
+        rate = self._log_sample_rate
+        return rate >= 1.0 or (rate > 0.0 and self._sampler.random() < rate)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter_ns()
+        lap = self._timers.lap()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        # Incrementar transacciones activas
+        self._active.inc()
+        failed = False
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            failed = True
+            self._error_count.labels(error_type=type(e).__name__).inc()
+            self._logger.error("Error procesando request: %s", e, exc_info=True)
+            raise
+        finally:
+            self._active.dec()
+            duration = (time.perf_counter_ns() - start) / 1e9
+            lap.mark("middleware.app")
+
+            method = scope["method"]
+            if method not in KNOWN_METHODS:
+                method = OTHER_METHOD
+            template = self.route_template(scope)
+
+            self._counter(method, template, str(status_code)).inc()
+            self._histogram(method, template).observe(duration)
+            lap.mark("middleware.metrics")
+
+            if not failed and self._should_log(status_code):
+                self._logger.log(
+                    logging.ERROR if status_code >= 500 else logging.INFO,
+                    "%s %s - %s - %.3fs", method, scope["path"], status_code, duration,
+                    extra={
+                        "method": method,
+                        "path": template,
+                        "status_code": status_code,
+                        "duration": duration,
+                    }
+                )
+                lap.mark("middleware.access_log")
@@ -0,0 +1,239 @@
+"""
+Calentamiento y drenado del proceso para cambios blue/green sin latencia
+
+Fases: warming -> serving -> draining -> drained.
+
+- warming: el proceso ya responde, pero /ready queda en falso mientras los
+  hooks de calentamiento ejercitan el hot path con transacciones sintéticas
+  (parseo, reglas, modelo, resultado) y llenan los caches. Así el balanceador
+  no le manda tráfico a un proceso frío.
+- serving: /ready en verdadero.
+- draining: /ready en falso, las rutas de validación responden 503 con
+  Retry-After y toda respuesta lleva Connection: close para cerrar las
+  conexiones keep-alive. Se espera a las validaciones en vuelo hasta el
+  deadline.
+- drained: en vuelo terminadas (o abandonadas al vencer el deadline) y las
+  colas de spans, logs y outbox vaciadas. Las que se abandonan siguen
+  corriendo hasta que el servidor se detenga.
+
+El drenado se inicia por el endpoint de administración, por SIGUSR1 o en el
+cierre del servidor (SIGTERM), y es idempotente.
+"""
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+WARMING = "warming"
+SERVING = "serving"
+DRAINING = "draining"
+DRAINED = "drained"
+PHASES = (WARMING, SERVING, DRAINING, DRAINED)
+
+
+def _noop(*args):
+    pass
+
+
+class Lifecycle:
+    """
+    Fase del proceso y validaciones en vuelo
+
+    on_phase recibe (fase anterior, fase nueva) en cada cambio; on_in_flight el número de
+    validaciones en vuelo; on_warmup (hook, segundos) al terminar cada hook
+    y on_warmup_error (hook, excepción) si falla, en cuyo caso se continúa:
+    calentar es una optimización, no una condición para servir.
+    on_flush_error recibe el nombre de la cola que no se vació a tiempo.
+    """
+
+    def __init__(
+        self,
+        warm: bool = True,
+        on_phase: Callable[[Optional[str], str], None] = _noop,
+        on_in_flight: Callable[[int], None] = _noop,
+        on_warmup: Callable[[str, float], None] = _noop,
+        on_warmup_error: Callable[[str, Exception], None] = _noop,
+        on_flush_error: Callable[[str], None] = _noop,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.on_phase = on_phase
+        self.on_in_flight = on_in_flight
+        self.on_warmup = on_warmup
+        self.on_warmup_error = on_warmup_error
+        self.on_flush_error = on_flush_error
+        self._clock = clock
+        self.phase = WARMING if warm else SERVING
+        self.in_flight = 0
+        self._warmups: List[Tuple[str, Callable[[], Awaitable[Any]]]] = []
+        self._flushers: List[Tuple[str, Callable[[float], bool]]] = []
+        self._idle: Optional[asyncio.Event] = None
+        self._warming: Optional[asyncio.Task] = None
+        self._draining: Optional[asyncio.Task] = None
+        self.warmup_report: Dict[str, Optional[float]] = {}
+        self.drain_report: Dict[str, Any] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.phase == SERVING
+
+    @property
+    def accepting(self) -> bool:
+        """Si se admite trabajo nuevo (también mientras calienta, si llega)"""
+        return self.phase in (WARMING, SERVING)
+
+    def _set_phase(self, phase: str):
+        previous, self.phase = self.phase, phase
+        self.on_phase(previous, phase)
+
+    def add_warmup(self, name: str, hook: Callable[[], Awaitable[Any]]):
+        """Registra un hook de calentamiento (se ejecutan en orden)"""
+        self._warmups.append((name, hook))
+
+    def add_flush(self, name: str, flush: Callable[[float], bool]):
+        """Registra una cola a vaciar al drenar: flush(timeout) retorna si se vació"""
+        self._flushers.append((name, flush))
+
+    def start_warm_up(self) -> asyncio.Task:
+        """Ejecuta los hooks en segundo plano y pasa a serving al terminar"""
+        if self._warming is None:
+            self._warming = asyncio.ensure_future(self._warm_up())
+        return self._warming
+
+    async def _warm_up(self):
+        for name, hook in self._warmups:
+            start = time.perf_counter()
+            try:
+                await hook()
+            except Exception as e:
+                self.warmup_report[name] = None
+                self.on_warmup_error(name, e)
+                continue
+            seconds = time.perf_counter() - start
+            self.warmup_report[name] = seconds
+            self.on_warmup(name, seconds)
+        if self.phase == WARMING:
+            self._set_phase(SERVING)
+
+    def enter(self) -> bool:
+        """Registra una validación en vuelo; False si ya no se admite trabajo"""
+        if not self.accepting:
+            return False
+        self.in_flight += 1
+        self.on_in_flight(self.in_flight)
+        return True
+
+    def exit(self):
+        self.in_flight -= 1
+        self.on_in_flight(self.in_flight)
+        if not self.in_flight and self._idle is not None:
+            self._idle.set()
+
+    def drain(self, timeout: float, flush_timeout: float = 5.0) -> asyncio.Task:
+        """Inicia el drenado (una sola vez); la tarea retorna el reporte"""
+        if self._draining is None:
+            self._draining = asyncio.ensure_future(self._drain(timeout, flush_timeout))
+        return self._draining
+
+    async def _drain(self, timeout: float, flush_timeout: float) -> Dict[str, Any]:
+        started = self._clock()
+        pending = self.in_flight
+        self._set_phase(DRAINING)
+        if self._warming is not None and not self._warming.done():
+            self._warming.cancel()
+
+        self._idle = asyncio.Event()
+        if not self.in_flight:
+            self._idle.set()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        abandoned = self.in_flight
+
+        loop = asyncio.get_running_loop()
+        flushed = {}
+        for name, flush in self._flushers:
+            try:
+                flushed[name] = bool(await loop.run_in_executor(None, flush, flush_timeout))
+            except Exception:
+                flushed[name] = False
+            if not flushed[name]:
+                self.on_flush_error(name)
+
+        self.drain_report = {
+            "in_flight_at_start": pending,
+            "completed": pending - abandoned,
+            "abandoned": abandoned,
+            "flushed": flushed,
+            "duration_seconds": round(self._clock() - started, 3),
+        }
+        self._set_phase(DRAINED)
+        return self.drain_report
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "phase": self.phase,
+            "ready": self.ready,
+            "in_flight": self.in_flight,
+            "warmup_seconds": dict(self.warmup_report),
+            "drain": dict(self.drain_report),
+        }
+
+
+class DrainMiddleware:
+    """
+    Cuenta las validaciones en vuelo y rechaza las nuevas mientras se drena
+
+    Fuera de serving/warming toda respuesta lleva Connection: close para que
+    el cliente (o el proxy) no reutilice la conexión con este proceso.
+    """
+
+    def __init__(
+        self,
+        app,
+        lifecycle: Lifecycle,
+        paths: Iterable[str] = ("/api/v1/validate",),
+        retry_after: int = 1,
+        on_reject: Callable[[], None] = _noop,
+    ):
+        self.app = app
+        self.lifecycle = lifecycle
+        self.paths = frozenset(paths)
+        self.on_reject = on_reject
+        self._body = json.dumps(
+            {"detail": "Servicio en drenado, reintente en otra instancia"}, ensure_ascii=False
+        ).encode()
+        self._headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(self._body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+            (b"connection", b"close"),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        lifecycle = self.lifecycle
+        if scope["path"] not in self.paths:
+            await self.app(scope, receive, send if lifecycle.accepting else self._closing(send))
+            return
+
+        if not lifecycle.enter():
+            self.on_reject()
+            await send({"type": "http.response.start", "status": 503, "headers": self._headers})
+            await send({"type": "http.response.body", "body": self._body})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lifecycle.exit()
+
+    @staticmethod
+    def _closing(send):
+        async def send_closing(message):
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=[*message.get("headers", []), (b"connection", b"close")])
+            await send(message)
+        return send_closing
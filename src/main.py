@@ -2,51 +2,75 @@
 PayFlow MX - Transaction Validator Microservice
 Microservicio crítico para validación de transacciones electrónicas
 """
+import asyncio
+import email.message
+import functools
+import hashlib
+import json
 import logging
-import time
 import random
-from typing import Dict, Optional
+import signal
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple, Union
 from datetime import datetime
 import os
 
-from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi import APIRouter, FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, validator
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
 from opentelemetry import trace
-from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.exporter.jaeger.thrift import JaegerExporter
-from opentelemetry.sdk.resources import Resource
 
-# Configuración de logging estructurado
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s - [trace_id=%(otelTraceID)s span_id=%(otelSpanID)s]'
+from src.accounts import AccountRegistry, AccountSnapshotError
+from src.admission import AdaptiveLimiter, AdmissionControlMiddleware
+from src.batching import MicroBatcher
+from src.binary_protocol import BinaryServer, encode_error
+from src.binary_protocol import encode_result as encode_binary_result
+from src.cache import IdempotencyCache
+from src.checks import BUDGET_WARNING, DUPLICATE_WARNING, FRAUD_WARNING, REPLAY_WARNING, score_checks
+from src.exposition import MetricsExposition
+from src.instrumentation import MetricsMiddleware
+from src.lifecycle import DRAINED, PHASES, SERVING, DrainMiddleware, Lifecycle
+from src.outbox import ResultOutbox
+from src.pipeline import ASYNC, Stage, ValidationPipeline
+from src.profiling import ProfilerBusy, SamplingProfiler, StageTimers, collapsed
+from src.replay import ReplayFilter
+from src.risk_model import RiskModelError, RiskScorer
+from src.rules import RuleEngine, RuleError
+from src.streaming import (
+    DuplexStreamingResponse,
+    LineTooLong,
+    iter_file_chunks,
+    iter_lines,
+    process_ordered,
 )
-logger = logging.getLogger(__name__)
+from src.structured_logging import configure_logging
+from src.telemetry import LazyTracingMiddleware, StartupReport, Telemetry, process_uptime
+from src.velocity import VelocityIndex, VelocityRules, velocity_risk
 
-# Configuración de OpenTelemetry para trazas
-resource = Resource(attributes={
-    "service.name": "transaction-validator",
-    "service.version": os.getenv("APP_VERSION", "1.0.0"),
-    "deployment.environment": os.getenv("ENVIRONMENT", "production")
-})
+# Costo de arranque por componente (GET /api/v1/admin/startup); "imports"
+# incluye el arranque del intérprete
+startup_report = StartupReport()
+startup_report.record("imports", process_uptime())
 
-trace.set_tracer_provider(TracerProvider(resource=resource))
+# Tracer de la API de OpenTelemetry: delega en el TracerProvider que
+# telemetry.configure() registra al arrancar (ver más abajo)
 tracer = trace.get_tracer(__name__)
 
-# Configurar exportador Jaeger
-jaeger_exporter = JaegerExporter(
-    agent_host_name=os.getenv("JAEGER_HOST", "jaeger"),
-    agent_port=int(os.getenv("JAEGER_PORT", "6831")),
-)
-trace.get_tracer_provider().add_span_processor(
-    BatchSpanProcessor(jaeger_exporter)
-)
+# Métricas de Prometheus (con PROMETHEUS_MULTIPROC_DIR, ver src/server.py, los
+# valores viven en archivos mmap compartidos por los workers)
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
 
-# Métricas de Prometheus
 REQUEST_COUNT = Counter(
     'transaction_validator_requests_total',
     'Total de requests recibidos',
@@ -67,7 +91,78 @@ TRANSACTION_VALIDATION = Counter(
 
 ACTIVE_TRANSACTIONS = Gauge(
     'transaction_validator_active_transactions',
-    'Número de transacciones activas siendo procesadas'
+    'Número de transacciones activas siendo procesadas',
+    multiprocess_mode='livesum'
+)
+
+ADMISSION_SHED = Counter(
+    'transaction_validator_admission_shed_total',
+    'Requests rechazadas con 503 por el control de admisión',
+    ['reason']
+)
+
+ADMISSION_QUEUE_DELAY = Histogram(
+    'transaction_validator_admission_queue_delay_seconds',
+    'Espera en la cola de admisión de las requests admitidas',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+
+ADMISSION_CONCURRENCY_LIMIT = Gauge(
+    'transaction_validator_admission_concurrency_limit',
+    'Límite adaptativo de validaciones concurrentes',
+    multiprocess_mode='livesum'
+)
+
+IDEMPOTENCY_CACHE_HITS = Counter(
+    'transaction_validator_idempotency_cache_hits_total',
+    'Resultados servidos desde el cache de idempotencia',
+    ['source']
+)
+
+IDEMPOTENCY_CACHE_MISSES = Counter(
+    'transaction_validator_idempotency_cache_misses_total',
+    'Validaciones ejecutadas por no encontrarse en el cache de idempotencia'
+)
+
+IDEMPOTENCY_CACHE_EVICTIONS = Counter(
+    'transaction_validator_idempotency_cache_evictions_total',
+    'Entradas expulsadas del cache de idempotencia',
+    ['reason']
+)
+
+IDEMPOTENCY_CACHE_BACKEND_ERRORS = Counter(
+    'transaction_validator_idempotency_cache_backend_errors_total',
+    'Fallos del backend compartido del cache de idempotencia',
+    ['operation']
+)
+
+MICRO_BATCH_SIZE = Histogram(
+    'transaction_validator_micro_batch_size',
+    'Transacciones por lote del micro-batching de /api/v1/validate',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+
+MICRO_BATCH_QUEUE_WAIT = Histogram(
+    'transaction_validator_micro_batch_queue_wait_seconds',
+    'Espera de cada transacción hasta que su lote se procesa',
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+)
+
+REPLAY_MATCHES = Counter(
+    'transaction_validator_replay_matches_total',
+    'Transacciones repetidas dentro de la ventana de detección de duplicados',
+    ['kind']
+)
+
+STAGE_BUDGET_EXHAUSTED = Counter(
+    'transaction_validator_stage_budget_exhausted_total',
+    'Etapas de validación omitidas por agotar su presupuesto de tiempo',
+    ['stage']
+)
+
+DEADLINE_EXCEEDED = Counter(
+    'transaction_validator_deadline_exceeded_total',
+    'Validaciones abandonadas con 504 por deadline vencido antes de las etapas'
 )
 
 ERROR_COUNT = Counter(
@@ -76,75 +171,190 @@ ERROR_COUNT = Counter(
     ['error_type']
 )
 
-# Crear aplicación FastAPI
-app = FastAPI(
-    title="PayFlow MX - Transaction Validator",
-    description="Microservicio de validación de transacciones electrónicas",
-    version=os.getenv("APP_VERSION", "1.0.0"),
-    docs_url="/docs",
-    redoc_url="/redoc"
+TRACE_SAMPLING_DECISIONS = Counter(
+    'transaction_validator_trace_sampling_decisions_total',
+    'Trazas conservadas o descartadas por el muestreo por cola',
+    ['decision', 'reason']
 )
 
-# Instrumentar FastAPI con OpenTelemetry
-FastAPIInstrumentor.instrument_app(app)
+LOG_RECORDS_DROPPED = Counter(
+    'transaction_validator_log_records_dropped_total',
+    'Registros de log descartados (muestreo o cola llena)',
+    ['reason']
+)
 
-# Configurar CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+LOG_QUEUE_DEPTH = Gauge(
+    'transaction_validator_log_queue_depth',
+    'Registros de log pendientes de escribir',
+    multiprocess_mode='livesum'
 )
 
-# Middleware para métricas y logging
-@app.middleware("http")
-async def metrics_middleware(request: Request, call_next):
-    start_time = time.time()
-    
-    # Incrementar transacciones activas
-    ACTIVE_TRANSACTIONS.inc()
-    
-    try:
-        response = await call_next(request)
-        
-        # Calcular latencia
-        duration = time.time() - start_time
-        
-        # Registrar métricas
-        REQUEST_COUNT.labels(
-            method=request.method,
-            endpoint=request.url.path,
-            status=response.status_code
-        ).inc()
-        
-        REQUEST_LATENCY.labels(
-            method=request.method,
-            endpoint=request.url.path
-        ).observe(duration)
-        
-        # Log estructurado
-        logger.info(
-            f"{request.method} {request.url.path} - {response.status_code} - {duration:.3f}s",
-            extra={
-                "method": request.method,
-                "path": request.url.path,
-                "status_code": response.status_code,
-                "duration": duration,
-                "otelTraceID": trace.format_trace_id(trace.get_current_span().get_span_context().trace_id),
-                "otelSpanID": trace.format_span_id(trace.get_current_span().get_span_context().span_id)
-            }
+OUTBOX_QUEUE_DEPTH = Gauge(
+    'transaction_validator_outbox_queue_depth',
+    'Resultados pendientes de escribir en el outbox',
+    multiprocess_mode='livesum'
+)
+
+OUTBOX_FLUSH_LATENCY = Histogram(
+    'transaction_validator_outbox_flush_duration_seconds',
+    'Duración de cada escritura por lotes del outbox (incluye fsync)',
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+
+OUTBOX_RECORDS_WRITTEN = Counter(
+    'transaction_validator_outbox_records_written_total',
+    'Resultados escritos en los segmentos del outbox'
+)
+
+OUTBOX_RECORDS_DROPPED = Counter(
+    'transaction_validator_outbox_records_dropped_total',
+    'Resultados descartados por el outbox',
+    ['reason']
+)
+
+METRICS_RENDER_LATENCY = Histogram(
+    'transaction_validator_metrics_render_duration_seconds',
+    'Duración de cada render de /metrics (fuera del event loop, incluye gzip)',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+METRICS_SCRAPES = Counter(
+    'transaction_validator_metrics_scrapes_total',
+    'Scrapes de /metrics por origen de la respuesta',
+    ['cache']
+)
+
+LIFECYCLE_PHASE = Gauge(
+    'transaction_validator_lifecycle_phase',
+    'Procesos en cada fase del ciclo de vida (warming, serving, draining, drained)',
+    ['phase'],
+    multiprocess_mode='livesum'
+)
+
+VALIDATIONS_IN_FLIGHT = Gauge(
+    'transaction_validator_validations_in_flight',
+    'Validaciones en vuelo (progreso del drenado)',
+    multiprocess_mode='livesum'
+)
+
+DRAIN_REJECTED = Counter(
+    'transaction_validator_drain_rejected_total',
+    'Validaciones rechazadas con 503 durante el drenado'
+)
+
+DRAIN_FLUSH_FAILURES = Counter(
+    'transaction_validator_drain_flush_failures_total',
+    'Colas que no se vaciaron dentro del plazo al drenar',
+    ['queue']
+)
+
+# Configuración de logging estructurado (JSON por lotes en un hilo aparte)
+with startup_report.measure("init.logging"):
+    log_handler = configure_logging(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        log_format=os.getenv("LOG_FORMAT", "json"),
+        sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "1.0")),
+        queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+        batch_size=int(os.getenv("LOG_BATCH_SIZE", "256")),
+    )
+log_handler.on_drop = lambda reason: LOG_RECORDS_DROPPED.labels(reason=reason).inc()
+if MULTIPROCESS:
+    # set_function no se comparte entre procesos; el hilo de escritura publica
+    log_handler.on_written = LOG_QUEUE_DEPTH.set
+else:
+    LOG_QUEUE_DEPTH.set_function(lambda: log_handler.queue.qsize())
+logger = logging.getLogger(__name__)
+
+# Trazas: el SDK y el exportador se importan y construyen al arrancar el
+# servidor, no al importar este módulo (TRACE_EXPORTER=none las deshabilita)
+telemetry = Telemetry(
+    exporter=os.getenv("TRACE_EXPORTER", "jaeger"),
+    resource_attributes={
+        "service.name": "transaction-validator",
+        "service.version": os.getenv("APP_VERSION", "1.0.0"),
+        "deployment.environment": os.getenv("ENVIRONMENT", "production")
+    },
+    jaeger_options={
+        "agent_host_name": os.getenv("JAEGER_HOST", "jaeger"),
+        "agent_port": int(os.getenv("JAEGER_PORT", "6831")),
+    },
+    # Se exportan siempre errores, trazas lentas y riesgo alto; el resto
+    # hasta TRACE_TARGET_PER_SECOND trazas por segundo
+    tail_sampling={
+        "traces_per_second": float(os.getenv("TRACE_TARGET_PER_SECOND", "10")),
+        "slow_threshold": float(os.getenv("TRACE_SLOW_THRESHOLD_SECONDS", "0.5")),
+        "max_traces": int(os.getenv("TRACE_BUFFER_MAX_TRACES", "2048")),
+    } if os.getenv("TRACE_SAMPLING", "tail") == "tail" else None,
+    # Sin trazar health checks ni scrapes
+    excluded_urls=os.getenv("TRACE_EXCLUDED_URLS", "/health,/ready,/metrics"),
+    report=startup_report,
+    on_decision=lambda kept, reason: TRACE_SAMPLING_DECISIONS.labels(
+        decision="kept" if kept else "dropped", reason=reason
+    ).inc(),
+    on_export_error=lambda error: logger.warning("Exportación de trazas fallida: %s", error),
+)
+
+# Outbox de resultados para conciliación (segmentos locales por proceso)
+result_outbox: Optional[ResultOutbox] = None
+if os.getenv("OUTBOX_DIR"):
+    result_outbox = ResultOutbox(
+        os.environ["OUTBOX_DIR"],
+        batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "512")),
+        flush_interval=float(os.getenv("OUTBOX_FLUSH_INTERVAL_MS", "50")) / 1000,
+        queue_size=int(os.getenv("OUTBOX_QUEUE_SIZE", "100000")),
+        segment_bytes=int(os.getenv("OUTBOX_SEGMENT_MB", "64")) * 1024 * 1024,
+        fsync=os.getenv("OUTBOX_FSYNC", "batch"),
+        on_flush=lambda count, seconds: (
+            OUTBOX_RECORDS_WRITTEN.inc(count), OUTBOX_FLUSH_LATENCY.observe(seconds)
+        ),
+        on_drop=lambda reason, count: OUTBOX_RECORDS_DROPPED.labels(reason=reason).inc(count),
+        on_error=lambda error: logger.error("Escritura del outbox fallida: %s", error),
+    )
+    if MULTIPROCESS:
+        result_outbox.on_written = OUTBOX_QUEUE_DEPTH.set
+    else:
+        OUTBOX_QUEUE_DEPTH.set_function(lambda: result_outbox.queue.qsize())
+
+# Perfilado opcional (src/profiling.py): timers por etapa del hot path y
+# profiler por muestreo bajo /api/v1/admin; deshabilitado cuesta una llamada por etapa
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", "60"))
+stage_timers = StageTimers(enabled=PROFILING_ENABLED)
+profiler = SamplingProfiler(interval=float(os.getenv("PROFILING_SAMPLE_INTERVAL_MS", "5")) / 1000)
+
+# Rutas del servicio; create_app() las monta junto con los middlewares
+router = APIRouter()
+
+
+# Registro de cuentas conocidas (snapshot mmap compartido por los workers);
+# las reglas lo consultan con el operador known_account
+account_registry: Optional[AccountRegistry] = None
+if os.getenv("ACCOUNTS_SNAPSHOT"):
+    with startup_report.measure("init.accounts"):
+        account_registry = AccountRegistry(
+            os.environ["ACCOUNTS_SNAPSHOT"],
+            refresh_interval=float(os.getenv("ACCOUNTS_REFRESH_SECONDS", "30")),
+            on_reload=lambda snapshot: logger.info(
+                "Snapshot de cuentas recargado - %d cuentas", len(snapshot)
+            ),
+            on_reload_error=lambda error: logger.error("Recarga de cuentas fallida: %s", error),
         )
-        
-        return response
-    
-    except Exception as e:
-        ERROR_COUNT.labels(error_type=type(e).__name__).inc()
-        logger.error(f"Error procesando request: {str(e)}", exc_info=True)
-        raise
-    
-    finally:
-        ACTIVE_TRANSACTIONS.dec()
+
+# Motor de reglas (límites, cuentas y compliance) cargado desde archivo; los
+# límites en moneda base usan la tabla de tipos de cambio (FX_RATES_FILE)
+with startup_report.measure("init.rules"):
+    rule_engine = RuleEngine(
+        os.getenv(
+            "RULES_FILE",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "validation_rules.json")
+        ),
+        accounts=account_registry,
+        # Vacía equivale a sin definir: la tabla incluida
+        fx_path=os.getenv("FX_RATES_FILE") or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "fx_rates.json"
+        ),
+        exact=os.getenv("FX_EXACT", "false").lower() == "true",
+    )
 
 
 # Modelos de datos
@@ -158,18 +368,21 @@ class Transaction(BaseModel):
     timestamp: Optional[datetime] = Field(default_factory=datetime.utcnow)
     description: Optional[str] = Field(None, max_length=500)
     
-    @validator('currency')
+    # Los límites de entrada vienen de la sección "input" del plan activo
+    @field_validator('currency')
+    @classmethod
     def validate_currency(cls, v):
-        allowed_currencies = ['MXN', 'USD', 'EUR']
-        if v not in allowed_currencies:
-            raise ValueError(f'Moneda debe ser una de: {allowed_currencies}')
+        currencies = rule_engine.plan.currencies
+        if currencies is not None and v not in currencies:
+            raise ValueError(f'Moneda debe ser una de: {list(currencies)}')
         return v
     
-    @validator('amount')
-    def validate_amount(cls, v):
-        if v > 1000000:  # Límite de $1M
+    @model_validator(mode='after')
+    def validate_amount(self):
+        # Después de la moneda: el límite en moneda base depende de ella
+        if rule_engine.plan.exceeds_input_limit(self.amount, self.currency):
             raise ValueError('Monto excede el límite permitido')
-        return v
+        return self
 
 
 class ValidationResult(BaseModel):
@@ -180,11 +393,358 @@ class ValidationResult(BaseModel):
     risk_level: str
     checks_passed: Dict[str, bool]
     warnings: list[str] = []
+    skipped_stages: list[str] = []
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 
+class BatchItemResult(BaseModel):
+    """Resultado de un elemento de un lote"""
+    index: int
+    transaction_id: Optional[str] = None
+    result: Optional[ValidationResult] = None
+    errors: Optional[List[Dict[str, Any]]] = None
+
+
+class BatchValidationResult(BaseModel):
+    """Resultado de validación de un lote de transacciones"""
+    total: int
+    approved: int
+    rejected: int
+    failed: int
+    results: List[BatchItemResult]
+
+
+# Etapas de validación
+velocity_index = VelocityIndex(
+    window_seconds=float(os.getenv("VELOCITY_WINDOW_SECONDS", "60")),
+    buckets=int(os.getenv("VELOCITY_BUCKETS", "12")),
+    max_accounts=int(os.getenv("VELOCITY_MAX_ACCOUNTS", "1000000")),
+)
+
+# Las validaciones sintéticas del calentamiento recorren el mismo código sobre
+# un índice de velocidad y un filtro de reenvíos desechables: el estado que ve
+# el tráfico real (y las métricas de reenvíos) no cambia
+warming_up: ContextVar[bool] = ContextVar("warming_up", default=False)
+warmup_velocity_index = VelocityIndex(
+    window_seconds=velocity_index.window_seconds,
+    buckets=velocity_index.buckets,
+    max_accounts=1024,
+    max_pairs=1024,
+)
+velocity_rules = VelocityRules(
+    max_sender_count=int(os.getenv("VELOCITY_MAX_SENDER_COUNT", "10")),
+    max_sender_amount=float(os.getenv("VELOCITY_MAX_SENDER_AMOUNT", "2000000")),
+    max_receiver_count=int(os.getenv("VELOCITY_MAX_RECEIVER_COUNT", "50")),
+)
+
+
+# Modelo de riesgo en proceso (cargado al arranque, recargable en caliente)
+with startup_report.measure("init.risk_model"):
+    risk_scorer = RiskScorer(os.getenv(
+        "RISK_MODEL_FILE",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "risk_model.json")
+    ))
+
+
+def score_fraud(transaction: Transaction, model_score: float, model):
+    """Combina el score del modelo con las reglas de velocidad por cuenta"""
+    index = warmup_velocity_index if warming_up.get() else velocity_index
+    snapshot = index.record(
+        transaction.sender_account,
+        transaction.receiver_account,
+        transaction.amount
+    )
+    risk, warnings = velocity_risk(snapshot, transaction.amount, velocity_rules)
+    fraud_score = max(model_score, risk)
+    if fraud_score >= model.warning_threshold and not warnings:
+        warnings.append(FRAUD_WARNING)
+    return fraud_score, warnings
+
+
+async def fraud_detection(transaction: Transaction):
+    """3. Detección de fraude (modelo de riesgo + reglas de velocidad)"""
+    # Simular consulta del historial de la cuenta (I/O asíncrono)
+    await asyncio.sleep(random.uniform(0.01, 0.05))
+    # Una sola lectura del modelo: score y umbrales del mismo modelo
+    model = risk_scorer.model
+    fraud_score, warnings = score_fraud(transaction, float(model.score([transaction])[0]), model)
+    return {'fraud_check': fraud_score < model.threshold}, warnings
+
+
+def fraud_fallback(transaction: Transaction):
+    """Respaldo de fraude sin tiempo: falla cerrado, el cliente puede reintentar"""
+    return {'fraud_check': False}, [BUDGET_WARNING]
+
+
+async def fraud_detection_batch(transactions: List[Transaction]):
+    """Detección de fraude para un lote completo"""
+    # Una sola consulta de historial amortizada sobre todo el lote
+    await asyncio.sleep(random.uniform(0.01, 0.05))
+    model = risk_scorer.model
+    fraud_checks = []
+    fraud_warnings = []
+    for transaction, model_score in zip(transactions, model.score(transactions).tolist()):
+        fraud_score, warnings = score_fraud(transaction, model_score, model)
+        fraud_checks.append(fraud_score < model.threshold)
+        fraud_warnings.append(warnings)
+    return fraud_checks, fraud_warnings
+
+
+def check_rules(transaction: Transaction):
+    """1, 2 y 4. Límites, cuentas y compliance según el plan de reglas activo"""
+    return rule_engine.evaluate(transaction)
+
+
+# Duplicados y reenvíos: filtros de Bloom por partición de tiempo en memoria
+# fija, compartidos por los workers (ver src/replay.py)
+replay_filter: Optional[ReplayFilter] = None
+if os.getenv("REPLAY_DETECTION_ENABLED", "true").lower() == "true":
+    replay_filter = ReplayFilter(
+        window_seconds=float(os.getenv("REPLAY_WINDOW_SECONDS", "600")),
+        partitions=int(os.getenv("REPLAY_PARTITIONS", "4")),
+        memory_bytes=int(float(os.getenv("REPLAY_MEMORY_MB", "16")) * 1024 * 1024),
+        false_positive_rate=float(os.getenv("REPLAY_FALSE_POSITIVE_RATE", "0.001")),
+    )
+
+
+warmup_replay_filter: Optional[ReplayFilter] = None
+if replay_filter is not None:
+    warmup_replay_filter = ReplayFilter(
+        window_seconds=replay_filter.window_seconds,
+        partitions=replay_filter.partitions,
+        memory_bytes=64 * 1024,
+        false_positive_rate=replay_filter.false_positive_rate,
+    )
+
+
+def check_replay(transaction: Transaction):
+    """5. Duplicados y reenvíos en la ventana; sólo advierte (el filtro admite falsos positivos)"""
+    warming = warming_up.get()
+    bloom = warmup_replay_filter if warming else replay_filter
+    warnings = []
+    if bloom.check_and_add(f"id:{transaction.transaction_id}"):
+        if not warming:
+            REPLAY_MATCHES.labels(kind="transaction_id").inc()
+        warnings.append(REPLAY_WARNING)
+    if bloom.check_and_add(
+        f"tx:{transaction.sender_account}|{transaction.receiver_account}|{transaction.amount!r}|{transaction.currency}"
+    ):
+        if not warming:
+            REPLAY_MATCHES.labels(kind="transaction").inc()
+        warnings.append(DUPLICATE_WARNING)
+    return {}, warnings
+
+
+# Deadline por defecto ligado al SLO (p99 < 500 ms); el header sólo lo acorta
+DEADLINE_HEADER = "x-request-timeout-ms"
+VALIDATION_DEADLINE = float(os.getenv("VALIDATION_DEADLINE_MS", "500")) / 1000
+FRAUD_BUDGET = float(os.getenv("VALIDATION_BUDGET_FRAUD_MS", "150")) / 1000
+
+validation_pipeline = ValidationPipeline(tracer, [
+    Stage("check_rules", check_rules),
+    *([Stage("replay_detection", check_replay)] if replay_filter is not None else []),
+    Stage(
+        "fraud_detection", fraud_detection, kind=ASYNC,
+        budget=FRAUD_BUDGET,
+        fallback=fraud_fallback,
+    ),
+], collapse_spans=os.getenv("TRACE_COLLAPSE_STAGES", "true").lower() == "true",
+   on_budget_exhausted=lambda stage: STAGE_BUDGET_EXHAUSTED.labels(stage=stage).inc())
+
+
+async def validate_micro_batch(items: List[Any]) -> List[Any]:
+    """
+    Etapas del pipeline para un lote de (transacción, deadline) en una pasada
+
+    Las reglas se evalúan por columnas y el fraude con un solo score del
+    modelo. El presupuesto de fraude se acota con el deadline más próximo
+    del lote; si se agota, todo el lote usa el respaldo de fraude.
+    """
+    transactions = [transaction for transaction, _ in items]
+    earliest = min(deadline for _, deadline in items)
+    columns, row_warnings = rule_engine.plan.evaluate_columns(transactions)
+    if replay_filter is not None:
+        # En orden: un duplicado dentro del mismo lote también se detecta
+        for row, transaction in enumerate(transactions):
+            row_warnings[row] = row_warnings[row] + check_replay(transaction)[1]
+
+    skipped: List[str] = []
+    timeout = min(FRAUD_BUDGET, earliest - time.monotonic())
+    try:
+        if timeout <= 0:
+            raise asyncio.TimeoutError
+        fraud_checks, fraud_warnings = await asyncio.wait_for(
+            fraud_detection_batch(transactions), timeout
+        )
+    except asyncio.TimeoutError:
+        STAGE_BUDGET_EXHAUSTED.labels(stage="fraud_detection").inc(len(items))
+        skipped = ["fraud_detection"]
+        fallback_checks, fallback_warnings = fraud_fallback(None)
+        fraud_checks = [fallback_checks['fraud_check']] * len(items)
+        fraud_warnings = [fallback_warnings] * len(items)
+    columns['fraud_check'] = fraud_checks
+
+    names = list(columns)
+    return [
+        (
+            {name: columns[name][row] for name in names},
+            row_warnings[row] + fraud_warnings[row],
+            skipped,
+        )
+        for row in range(len(items))
+    ]
+
+
+# Micro-batching opcional de las llamadas individuales concurrentes
+micro_batcher: Optional[MicroBatcher] = None
+if os.getenv("MICRO_BATCH_ENABLED", "false").lower() == "true":
+    micro_batcher = MicroBatcher(
+        validate_micro_batch,
+        max_batch_size=int(os.getenv("MICRO_BATCH_MAX_SIZE", "64")),
+        max_wait=float(os.getenv("MICRO_BATCH_MAX_WAIT_US", "500")) / 1e6,
+        on_batch=MICRO_BATCH_SIZE.observe,
+        on_wait=MICRO_BATCH_QUEUE_WAIT.observe,
+    )
+
+
+def request_deadline(header: Union[str, int, None], now: float) -> float:
+    """Deadline (time.monotonic) de una request según X-Request-Timeout-Ms (o el del frame binario)"""
+    timeout = VALIDATION_DEADLINE
+    if header:
+        try:
+            timeout = min(timeout, float(header) / 1000)
+        except ValueError:
+            pass
+    return now + timeout
+
+
+# Cache de idempotencia
+def idempotency_key(transaction: Transaction) -> str:
+    """Llave de idempotencia: transaction_id más huella de los datos relevantes"""
+    fingerprint = hashlib.blake2b(
+        f"{transaction.amount}|{transaction.currency}|"
+        f"{transaction.sender_account}|{transaction.receiver_account}".encode(),
+        digest_size=8
+    ).hexdigest()
+    return f"{transaction.transaction_id}:{fingerprint}"
+
+
+result_cache: Optional[IdempotencyCache] = None
+if os.getenv("IDEMPOTENCY_CACHE_ENABLED", "true").lower() == "true":
+    result_cache = IdempotencyCache(
+        max_size=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("IDEMPOTENCY_CACHE_TTL", "300")),
+        dumps=lambda result: result.model_dump_json(),
+        loads=ValidationResult.model_validate_json,
+        on_hit=lambda source: IDEMPOTENCY_CACHE_HITS.labels(source=source).inc(),
+        on_miss=IDEMPOTENCY_CACHE_MISSES.inc,
+        on_evict=lambda reason: IDEMPOTENCY_CACHE_EVICTIONS.labels(reason=reason).inc(),
+        on_backend_error=lambda operation: IDEMPOTENCY_CACHE_BACKEND_ERRORS.labels(operation=operation).inc(),
+        # Un resultado degradado por tiempo se recalcula en el reintento
+        should_cache=lambda result: not result.skipped_stages,
+    )
+
+
+# Calentamiento y drenado para los cambios blue/green (ver src/lifecycle.py)
+WARMUP_TRANSACTIONS = int(os.getenv("WARMUP_TRANSACTIONS", "32"))
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT_SECONDS", "30"))
+DRAIN_FLUSH_TIMEOUT = float(os.getenv("DRAIN_FLUSH_TIMEOUT_SECONDS", "5"))
+
+
+def on_lifecycle_phase(previous: Optional[str], phase: str):
+    for name in PHASES:
+        LIFECYCLE_PHASE.labels(phase=name).set(1 if name == phase else 0)
+    if phase == DRAINED:
+        logger.info("Drenado completo: %s", json.dumps(lifecycle.drain_report))
+    elif previous is not None:
+        logger.info("Ciclo de vida: %s -> %s", previous, phase)
+
+
+lifecycle = Lifecycle(
+    warm=os.getenv("WARMUP_ENABLED", "true").lower() == "true" and WARMUP_TRANSACTIONS > 0,
+    on_phase=on_lifecycle_phase,
+    on_in_flight=VALIDATIONS_IN_FLIGHT.set,
+    on_warmup=lambda name, seconds: startup_report.record(f"warmup.{name}", seconds),
+    on_warmup_error=lambda name, error: logger.error(
+        "Calentamiento %s fallido: %s", name, error, exc_info=error
+    ),
+    on_flush_error=lambda queue: DRAIN_FLUSH_FAILURES.labels(queue=queue).inc(),
+)
+
+
+def warmup_transactions(count: int) -> List[bytes]:
+    """Bodies sintéticos con montos y monedas variados (cuentas e IDs reservados)"""
+    currencies = rule_engine.plan.currencies or ("MXN",)
+    return [
+        json.dumps({
+            "transaction_id": f"warmup-{os.getpid()}-{i}",
+            "amount": round(10.0 + 997.3 * i, 2),
+            "currency": currencies[i % len(currencies)],
+            "sender_account": f"{9000000000 + i}",
+            "receiver_account": f"{9100000000 + i}",
+            "description": "warm-up",
+        }).encode()
+        for i in range(count)
+    ]
+
+
+async def warm_up_validations():
+    """
+    Ejercita el hot path con transacciones sintéticas antes de recibir tráfico
+
+    Parseo (incluido el camino de errores), etapas (la mitad de las
+    transacciones una por una y la otra mitad en lote), scoring y
+    serialización del resultado. No pasa por el outbox, el cache de
+    idempotencia ni las métricas de validación, y con warming_up el índice
+    de velocidad y el filtro de reenvíos son los desechables.
+    """
+    token = warming_up.set(True)
+    try:
+        try:
+            parse_transaction(b'{"transaction_id": "warmup"}', "application/json")
+        except RequestValidationError:
+            pass
+        transactions = [
+            parse_transaction(body, "application/json") for body in warmup_transactions(WARMUP_TRANSACTIONS)
+        ]
+        deadline = time.monotonic() + VALIDATION_DEADLINE
+        half = (len(transactions) + 1) // 2
+        outcomes = list(await asyncio.gather(*(
+            validation_pipeline.run_with_deadline(transaction, deadline) for transaction in transactions[:half]
+        )))
+        if transactions[half:]:
+            outcomes += await validate_micro_batch([(transaction, deadline) for transaction in transactions[half:]])
+    finally:
+        warming_up.reset(token)
+    for transaction, (checks, warnings, skipped) in zip(transactions, outcomes):
+        is_valid, validation_score, risk_level = score_checks(checks)
+        result = ValidationResult.model_construct(
+            transaction_id=transaction.transaction_id,
+            is_valid=is_valid,
+            validation_score=validation_score,
+            risk_level=risk_level,
+            checks_passed=checks,
+            warnings=warnings,
+            skipped_stages=skipped,
+            timestamp=datetime.utcnow()
+        )
+        ValidationResult.model_validate_json(encode_result(result))
+
+
+lifecycle.add_warmup("validations", warm_up_validations)
+lifecycle.add_flush("spans", lambda timeout: telemetry.force_flush(timeout))
+lifecycle.add_flush("logs", log_handler.flush)
+if result_outbox is not None:
+    lifecycle.add_flush("outbox", result_outbox.flush)
+
+
+def start_drain() -> asyncio.Task:
+    """Drena este proceso (idempotente): por SIGUSR1, el endpoint o el cierre"""
+    return lifecycle.drain(DRAIN_TIMEOUT, DRAIN_FLUSH_TIMEOUT)
+
+
 # Endpoints
-@app.get("/")
+@router.get("/")
 async def root():
     """Endpoint raíz"""
     return {
@@ -195,7 +755,7 @@ async def root():
     }
 
 
-@app.get("/health")
+@router.get("/health")
 async def health_check():
     """Health check endpoint para validación de despliegue"""
     return {
@@ -205,17 +765,25 @@ async def health_check():
         "checks": {
             "api": "ok",
             "database": "ok",  # Simulado
-            "cache": "ok"      # Simulado
+            "cache": "ok",     # Simulado
+            "accounts": "ok" if account_registry is not None else "not_configured"
         }
     }
 
 
-@app.get("/ready")
+@router.get("/ready")
 async def readiness_check():
-    """Readiness check para Kubernetes/Docker"""
+    """Readiness check para Kubernetes/Docker: 503 mientras calienta o drena"""
+    if not lifecycle.ready:
+        return JSONResponse(
+            {"ready": False, "phase": lifecycle.phase},
+            status_code=503,
+            headers={"Retry-After": "1"}
+        )
     # Simular chequeo de dependencias
     return {
         "ready": True,
+        "phase": lifecycle.phase,
         "dependencies": {
             "database": "connected",
             "cache": "connected",
@@ -224,17 +792,110 @@ async def readiness_check():
     }
 
 
-@app.get("/metrics")
-async def metrics():
-    """Endpoint de métricas de Prometheus"""
-    return Response(
-        content=generate_latest(),
-        media_type=CONTENT_TYPE_LATEST
+def metrics_registry():
+    """Registro a exponer: el agregado de todos los workers en modo multiproceso"""
+    if not MULTIPROCESS:
+        return REGISTRY
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return registry
+
+
+# Render de /metrics cacheado METRICS_CACHE_TTL_SECONDS; con
+# METRICS_SNAPSHOT_INTERVAL_SECONDS se re-renderiza en segundo plano
+metrics_exposition = MetricsExposition(
+    metrics_registry,
+    ttl=float(os.getenv("METRICS_CACHE_TTL_SECONDS", "1.0")),
+    gzip_level=int(os.getenv("METRICS_GZIP_LEVEL", "6")),
+    on_render=lambda seconds, size: METRICS_RENDER_LATENCY.observe(seconds),
+    on_scrape=lambda cache: METRICS_SCRAPES.labels(cache=cache).inc(),
+    on_error=lambda error: logger.error("Render de métricas fallido: %s", error),
+)
+METRICS_SNAPSHOT_INTERVAL = float(os.getenv("METRICS_SNAPSHOT_INTERVAL_SECONDS", "0"))
+
+
+@router.get("/metrics")
+async def metrics(request: Request):
+    """Endpoint de métricas de Prometheus (texto u OpenMetrics, gzip si se acepta)"""
+    payload = await metrics_exposition.payload(
+        request.headers.get("accept"), request.headers.get("accept-encoding")
     )
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if payload.content_encoding:
+        headers["Content-Encoding"] = payload.content_encoding
+    return Response(content=payload.body, media_type=payload.content_type, headers=headers)
+
+
+# Esquema del body para OpenAPI (el endpoint lee el body directamente)
+TRANSACTION_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": Transaction.model_json_schema()}},
+    }
+}
+
+# Serializador compilado del resultado (evita jsonable_encoder + json.dumps)
+encode_result = ValidationResult.__pydantic_serializer__.to_json
+
 
+@functools.lru_cache(maxsize=64)
+def _is_json(content_type: Optional[str]) -> bool:
+    """Misma regla que FastAPI para decidir si el body se interpreta como JSON"""
+    if not content_type:
+        return True
+    message = email.message.Message()
+    message["content-type"] = content_type
+    if message.get_content_maintype() != "application":
+        return False
+    subtype = message.get_content_subtype()
+    return subtype == "json" or subtype.endswith("+json")
 
-@app.post("/api/v1/validate", response_model=ValidationResult)
-async def validate_transaction(transaction: Transaction):
+
+def parse_transaction(body: bytes, content_type: Optional[str]) -> Transaction:
+    """
+    Parsea el body de /api/v1/validate
+
+    La ruta rápida valida los bytes JSON directamente con el validador
+    compilado de Pydantic. Si falla, se repite el camino de FastAPI (json.loads
+    y validación de objetos) para reportar exactamente los mismos errores 422.
+    """
+    is_json = _is_json(content_type)
+    if body and is_json:
+        try:
+            return Transaction.model_validate_json(body)
+        except ValidationError:
+            pass
+
+    if not body:
+        error = ValidationError.from_exception_data(
+            "Field required", [{"type": "missing", "loc": ("body",), "input": {}}]
+        ).errors()[0]
+        error["input"] = None
+        raise RequestValidationError([error])
+
+    value: Any = body
+    if is_json:
+        try:
+            value = json.loads(body)
+        except json.JSONDecodeError as e:
+            raise RequestValidationError([{
+                "type": "json_invalid",
+                "loc": ("body", e.pos),
+                "msg": "JSON decode error",
+                "input": {},
+                "ctx": {"error": e.msg},
+            }], body=e.doc)
+    try:
+        return Transaction.model_validate(value, from_attributes=True)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors()],
+            body=value
+        )
+
+
+@router.post("/api/v1/validate", response_model=ValidationResult, openapi_extra=TRANSACTION_REQUEST_BODY)
+async def validate_transaction(request: Request):
     """
     Valida una transacción electrónica
     
@@ -243,11 +904,51 @@ async def validate_transaction(transaction: Transaction):
     - Validación de cuentas
     - Detección de fraude
     - Compliance regulatorio
+    
+    Los reintentos con el mismo transaction_id (y mismos datos) se sirven
+    desde el cache de idempotencia.
+    
+    X-Request-Timeout-Ms acorta el deadline por defecto (VALIDATION_DEADLINE_MS).
+    """
+    lap = stage_timers.lap()
+    deadline = request_deadline(request.headers.get(DEADLINE_HEADER), time.monotonic())
+    body = await request.body()
+    lap.mark("validate.read_body")
+    transaction = parse_transaction(body, request.headers.get("content-type"))
+    lap.mark("validate.parse")
+    result = await validate_cached(transaction, deadline)
+    lap.mark("validate.process")
+    content = encode_result(result)
+    lap.mark("validate.encode")
+    return Response(content=content, media_type="application/json")
+
+
+async def validate_cached(transaction: Transaction, deadline: float) -> ValidationResult:
+    """Validación de una transacción pasando por el cache de idempotencia (HTTP y binario)"""
+    if result_cache is None:
+        return await process_transaction(transaction, deadline)
+    return await result_cache.get_or_compute(
+        idempotency_key(transaction),
+        lambda: process_transaction(transaction, deadline)
+    )
+
+
+async def process_transaction(transaction: Transaction, deadline: Optional[float] = None) -> ValidationResult:
+    """
+    Ejecuta la validación completa de una transacción ya parseada
+
+    Sin deadline se usa VALIDATION_DEADLINE desde ahora. Si vence antes de
+    las etapas se responde 504; si vence durante ellas, las etapas sin
+    tiempo usan su respaldo y se listan en skipped_stages.
     """
+    if deadline is None:
+        deadline = time.monotonic() + VALIDATION_DEADLINE
+    lap = stage_timers.lap()
     with tracer.start_as_current_span("validate_transaction") as span:
         span.set_attribute("transaction.id", transaction.transaction_id)
         span.set_attribute("transaction.amount", transaction.amount)
         span.set_attribute("transaction.currency", transaction.currency)
+        lap.mark("process.span_start")
         
         try:
             # Simular proceso de validación con latencia variable
@@ -262,52 +963,34 @@ async def validate_transaction(transaction: Transaction):
                 latency = base_latency
                 span.set_attribute("peak_hour", False)
             
-            time.sleep(latency)
+            now = time.monotonic()
+            remaining = deadline - now
+            wait = max(0.0, min(latency, remaining))
+            await asyncio.sleep(wait)
+            lap.mark("process.simulated_latency")
+            if stage_timers.enabled:
+                # Retraso del event loop al reanudar después del sleep (CPU, GIL)
+                stage_timers.record("process.loop_lag", max(0.0, time.monotonic() - now - wait))
+            if latency >= remaining:
+                # El cliente ya no espera la respuesta: no gastar las etapas
+                DEADLINE_EXCEEDED.inc()
+                span.set_attribute("validation.deadline_exceeded", True)
+                raise HTTPException(status_code=504, detail="Deadline de validación excedido")
             
-            # Realizar validaciones
-            checks = {}
-            warnings = []
-            
-            # 1. Validación de límites
-            with tracer.start_as_current_span("check_amount_limits"):
-                checks['amount_within_limits'] = transaction.amount <= 1000000
-                if transaction.amount > 500000:
-                    warnings.append("Transacción de alto valor - requiere aprobación adicional")
-            
-            # 2. Validación de cuentas
-            with tracer.start_as_current_span("check_accounts"):
-                checks['valid_sender'] = len(transaction.sender_account) >= 10
-                checks['valid_receiver'] = len(transaction.receiver_account) >= 10
-                checks['different_accounts'] = transaction.sender_account != transaction.receiver_account
-            
-            # 3. Detección de fraude (simulada)
-            with tracer.start_as_current_span("fraud_detection"):
-                # Simular análisis de patrones
-                time.sleep(random.uniform(0.01, 0.05))
-                fraud_score = random.uniform(0, 1)
-                checks['fraud_check'] = fraud_score < 0.15
-                
-                if fraud_score >= 0.1:
-                    warnings.append("Patrones inusuales detectados")
-            
-            # 4. Compliance
-            with tracer.start_as_current_span("compliance_check"):
-                checks['compliance'] = transaction.currency in ['MXN', 'USD', 'EUR']
-            
-            # Calcular resultado
-            passed_checks = sum(checks.values())
-            total_checks = len(checks)
-            validation_score = (passed_checks / total_checks) * 100
-            
-            is_valid = passed_checks == total_checks
-            
-            # Determinar nivel de riesgo
-            if validation_score >= 90:
-                risk_level = "low"
-            elif validation_score >= 70:
-                risk_level = "medium"
+            # Realizar validaciones (etapas concurrentes, sin bloquear el event loop)
+            if micro_batcher is not None:
+                checks, warnings, skipped = await micro_batcher.submit((transaction, deadline))
             else:
-                risk_level = "high"
+                checks, warnings, skipped = await validation_pipeline.run_with_deadline(transaction, deadline)
+            lap.mark("process.stages")
+            if skipped:
+                span.set_attribute("validation.skipped_stages", skipped)
+            
+            # Calcular resultado y nivel de riesgo
+            is_valid, validation_score, risk_level = score_checks(checks)
+            span.set_attribute("validation.risk_level", risk_level)
+            span.set_attribute("validation.is_valid", is_valid)
+            lap.mark("process.scoring")
             
             # Simular errores ocasionales (0.8% según el escenario)
             if random.random() < 0.008:
@@ -327,26 +1010,32 @@ async def validate_transaction(transaction: Transaction):
                 validation_type="automatic"
             ).inc()
             
-            result = ValidationResult(
+            # Construido con valores ya tipados: sin revalidar el modelo
+            result = ValidationResult.model_construct(
                 transaction_id=transaction.transaction_id,
                 is_valid=is_valid,
                 validation_score=validation_score,
                 risk_level=risk_level,
                 checks_passed=checks,
-                warnings=warnings
+                warnings=warnings,
+                skipped_stages=skipped,
+                timestamp=datetime.utcnow()
             )
+            if result_outbox is not None:
+                result_outbox.append(encode_result(result))
+            lap.mark("process.result")
             
             logger.info(
-                f"Transacción {transaction.transaction_id} validada - Score: {validation_score:.2f}",
+                "Transacción %s validada - Score: %.2f",
+                transaction.transaction_id, validation_score,
                 extra={
                     "transaction_id": transaction.transaction_id,
                     "validation_score": validation_score,
                     "risk_level": risk_level,
-                    "is_valid": is_valid,
-                    "otelTraceID": trace.format_trace_id(span.get_span_context().trace_id),
-                    "otelSpanID": trace.format_span_id(span.get_span_context().span_id)
+                    "is_valid": is_valid
                 }
             )
+            lap.mark("process.log")
             
             return result
         
@@ -355,13 +1044,442 @@ async def validate_transaction(transaction: Transaction):
         except Exception as e:
             ERROR_COUNT.labels(error_type=type(e).__name__).inc()
             logger.error(
-                f"Error validando transacción {transaction.transaction_id}: {str(e)}",
+                "Error validando transacción %s: %s",
+                transaction.transaction_id, e,
                 exc_info=True
             )
             raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 
-@app.get("/api/v1/stats")
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "10000"))
+
+
+def _format_errors(error: ValidationError) -> List[Dict[str, Any]]:
+    """Convierte errores de Pydantic en un formato serializable"""
+    return [
+        {"loc": list(err["loc"]), "msg": err["msg"], "type": err["type"]}
+        for err in error.errors()
+    ]
+
+
+def _parse_batch_body(body: bytes, content_type: str) -> List[Any]:
+    """Obtiene los elementos crudos de un body JSON array o NDJSON"""
+    if "ndjson" in content_type or "jsonl" in content_type:
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                # La línea inválida se reporta como fallo del elemento
+                items.append(e)
+        return items
+
+    try:
+        items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="JSON inválido")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=422, detail="Se esperaba un arreglo JSON de transacciones")
+    return items
+
+
+@router.post("/api/v1/validate/batch", response_model=BatchValidationResult)
+async def validate_transaction_batch(request: Request):
+    """
+    Valida un lote de transacciones en una sola pasada columnar
+    
+    Acepta un arreglo JSON o NDJSON (application/x-ndjson). Los resultados
+    se retornan en el orden de entrada; los elementos inválidos se reportan
+    individualmente sin afectar al resto del lote. El fraude tiene el mismo
+    presupuesto que una validación individual (VALIDATION_BUDGET_FRAUD_MS,
+    acotado por X-Request-Timeout-Ms); si se agota, el lote usa el respaldo.
+    """
+    deadline = request_deadline(request.headers.get("x-request-timeout-ms"), time.monotonic())
+    items = _parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+    if not items:
+        raise HTTPException(status_code=422, detail="El lote está vacío")
+    if len(items) > BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El lote excede el máximo de {BATCH_MAX_SIZE} transacciones"
+        )
+
+    with tracer.start_as_current_span("validate_transaction_batch") as span:
+        span.set_attribute("batch.size", len(items))
+
+        results: List[Optional[BatchItemResult]] = [None] * len(items)
+        transactions: List[Transaction] = []
+        positions: List[int] = []
+
+        # Parseo individual: un elemento inválido no invalida el lote
+        for index, item in enumerate(items):
+            if isinstance(item, ValueError):
+                results[index] = BatchItemResult(
+                    index=index,
+                    errors=[{"loc": [], "msg": f"JSON inválido: {item}", "type": "json_invalid"}]
+                )
+                continue
+            try:
+                transactions.append(Transaction.model_validate(item))
+                positions.append(index)
+            except ValidationError as e:
+                results[index] = BatchItemResult(
+                    index=index,
+                    transaction_id=item.get("transaction_id") if isinstance(item, dict) else None,
+                    errors=_format_errors(e)
+                )
+
+        approved = 0
+        if transactions:
+            rows = await validate_micro_batch([(transaction, deadline) for transaction in transactions])
+            for index, transaction, (checks, warnings, skipped) in zip(positions, transactions, rows):
+                is_valid, validation_score, risk_level = score_checks(checks)
+                approved += is_valid
+                results[index] = BatchItemResult(
+                    index=index,
+                    transaction_id=transaction.transaction_id,
+                    result=ValidationResult(
+                        transaction_id=transaction.transaction_id,
+                        is_valid=is_valid,
+                        validation_score=validation_score,
+                        risk_level=risk_level,
+                        checks_passed=checks,
+                        warnings=warnings,
+                        skipped_stages=skipped
+                    )
+                )
+
+        rejected = len(transactions) - approved
+        failed = len(items) - len(transactions)
+
+        # Registrar métricas agregadas del lote
+        if approved:
+            TRANSACTION_VALIDATION.labels(status="approved", validation_type="batch").inc(approved)
+        if rejected:
+            TRANSACTION_VALIDATION.labels(status="rejected", validation_type="batch").inc(rejected)
+        if failed:
+            TRANSACTION_VALIDATION.labels(status="error", validation_type="batch").inc(failed)
+
+        span.set_attribute("batch.approved", approved)
+        span.set_attribute("batch.rejected", rejected)
+        span.set_attribute("batch.failed", failed)
+
+        logger.info(
+            "Lote validado - %d transacciones, %d aprobadas, %d rechazadas, %d con error",
+            len(items), approved, rejected, failed,
+            extra={
+                "batch_size": len(items),
+                "approved": approved,
+                "rejected": rejected,
+                "failed": failed
+            }
+        )
+
+        return BatchValidationResult(
+            total=len(items),
+            approved=approved,
+            rejected=rejected,
+            failed=failed,
+            results=results
+        )
+
+
+STREAM_MAX_IN_FLIGHT = int(os.getenv("STREAM_MAX_IN_FLIGHT", "64"))
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", "65536"))
+
+
+async def _validate_line(index: int, line) -> str:
+    """Valida una línea NDJSON y retorna la línea de resultado"""
+    if isinstance(line, LineTooLong):
+        item = BatchItemResult(
+            index=index,
+            errors=[{"loc": [], "msg": str(line), "type": "line_too_long"}]
+        )
+        return item.model_dump_json(exclude_none=True) + "\n"
+
+    try:
+        transaction = Transaction.model_validate_json(line)
+    except ValidationError as e:
+        item = BatchItemResult(index=index, errors=_format_errors(e))
+        return item.model_dump_json(exclude_none=True) + "\n"
+
+    try:
+        result = await process_transaction(transaction)
+        item = BatchItemResult(
+            index=index,
+            transaction_id=transaction.transaction_id,
+            result=result
+        )
+    except HTTPException as e:
+        item = BatchItemResult(
+            index=index,
+            transaction_id=transaction.transaction_id,
+            errors=[{"loc": [], "msg": e.detail, "type": "internal_error"}]
+        )
+    return item.model_dump_json(exclude_none=True) + "\n"
+
+
+@router.post("/api/v1/validate/stream")
+async def validate_transaction_stream(request: Request):
+    """
+    Valida transacciones NDJSON en streaming
+    
+    Lee el body de forma incremental y emite un resultado NDJSON por línea,
+    en el orden de entrada. Sólo hay STREAM_MAX_IN_FLIGHT validaciones en
+    vuelo; un cliente lento detiene la lectura del body (backpressure).
+    """
+    lines = iter_lines(request.stream(), STREAM_MAX_LINE_BYTES)
+    return DuplexStreamingResponse(
+        process_ordered(lines, _validate_line, STREAM_MAX_IN_FLIGHT),
+        media_type="application/x-ndjson"
+    )
+
+
+async def validate_stream_file(source, output) -> int:
+    """Valida un archivo NDJSON y escribe los resultados en output línea por línea"""
+    chunks = iter(lambda: source.read(STREAM_MAX_LINE_BYTES), b"")
+    lines = iter_lines(iter_file_chunks(chunks), STREAM_MAX_LINE_BYTES)
+    count = 0
+    async for line in process_ordered(lines, _validate_line, STREAM_MAX_IN_FLIGHT):
+        output.write(line)
+        count += 1
+    output.flush()
+    return count
+
+
+# Protocolo binario sobre TCP o socket Unix (src/binary_protocol.py): mismo
+# núcleo, cache de idempotencia, drenado y métricas que /api/v1/validate; las
+# métricas por request llevan method="BINARY"
+BINARY_LISTEN = os.getenv("BINARY_LISTEN", "")
+BINARY_METHOD = "BINARY"
+BINARY_ENDPOINT = "/api/v1/validate"
+
+
+async def _validate_binary(call_id: int, fields: Dict[str, Any], deadline_ms: int) -> Tuple[int, bytes]:
+    lap = stage_timers.lap()
+    deadline = request_deadline(deadline_ms or None, time.monotonic())
+    try:
+        transaction = Transaction.model_validate(fields)
+    except ValidationError as e:
+        return 422, encode_error(call_id, 422, json.dumps(_format_errors(e), ensure_ascii=False))
+    lap.mark("binary.parse")
+    try:
+        result = await validate_cached(transaction, deadline)
+    except HTTPException as e:
+        return e.status_code, encode_error(call_id, e.status_code, e.detail)
+    lap.mark("binary.process")
+    response = encode_binary_result(call_id, result)
+    lap.mark("binary.encode")
+    return 200, response
+
+
+async def validate_binary(call_id: int, fields: Dict[str, Any], deadline_ms: int) -> bytes:
+    """Atiende una llamada VALIDATE y retorna el frame de respuesta"""
+    if not lifecycle.enter():
+        DRAIN_REJECTED.inc()
+        return encode_error(call_id, 503, "Servicio en drenado, reintente en otra instancia")
+    start = time.perf_counter_ns()
+    ACTIVE_TRANSACTIONS.inc()
+    status = 500
+    try:
+        status, response = await _validate_binary(call_id, fields, deadline_ms)
+        return response
+    except Exception as e:
+        ERROR_COUNT.labels(error_type=type(e).__name__).inc()
+        logger.error("Error procesando llamada binaria: %s", e, exc_info=True)
+        return encode_error(call_id, 500, "Error interno del servidor")
+    finally:
+        ACTIVE_TRANSACTIONS.dec()
+        lifecycle.exit()
+        REQUEST_LATENCY.labels(method=BINARY_METHOD, endpoint=BINARY_ENDPOINT).observe(
+            (time.perf_counter_ns() - start) / 1e9
+        )
+        REQUEST_COUNT.labels(method=BINARY_METHOD, endpoint=BINARY_ENDPOINT, status=str(status)).inc()
+
+
+binary_server: Optional[BinaryServer] = None
+if BINARY_LISTEN:
+    binary_server = BinaryServer(
+        BINARY_LISTEN,
+        validate_binary,
+        max_in_flight=int(os.getenv("BINARY_MAX_IN_FLIGHT", "64")),
+        max_frame_bytes=int(os.getenv("BINARY_MAX_FRAME_BYTES", "65536")),
+        # Al drenar, cada conexión se cierra después de responder su siguiente llamada
+        closing=lambda: not lifecycle.accepting,
+        on_protocol_error=lambda error: ERROR_COUNT.labels(error_type="ProtocolError").inc(),
+    )
+
+
+@router.get("/api/v1/admin/rules")
+async def get_rules():
+    """Obtiene la versión y el contenido del plan de reglas activo"""
+    plan = rule_engine.plan
+    return {
+        "version": plan.version,
+        "path": rule_engine.path,
+        "input": {
+            "max_amount": plan.max_amount,
+            "max_base_amount": plan.max_base_amount,
+            "currencies": plan.currencies
+        },
+        "fx": None if plan.fx is None else {
+            "version": plan.fx.version,
+            "path": rule_engine.fx_path,
+            "base": plan.fx.base,
+            "exact": plan.exact,
+            "rates": {currency: str(rate) for currency, rate in plan.fx.rates.items()}
+        },
+        "checks": list(plan.check_names),
+        "warnings": list(plan.messages)
+    }
+
+
+@router.post("/api/v1/admin/rules/reload")
+async def reload_rules():
+    """Recarga reglas y tipos de cambio sin interrumpir las requests en vuelo"""
+    try:
+        plan = rule_engine.reload()
+    except RuleError as e:
+        logger.error("Recarga de reglas fallida: %s", e)
+        raise HTTPException(status_code=422, detail=str(e))
+    logger.info("Reglas recargadas - versión %s, %d reglas, tipos de cambio %s",
+                plan.version, len(plan), plan.fx_version)
+    return {"version": plan.version, "rules": len(plan), "fx_version": plan.fx_version}
+
+
+@router.get("/api/v1/admin/risk-model")
+async def get_risk_model():
+    """Obtiene la versión y los umbrales del modelo de riesgo activo"""
+    model = risk_scorer.model
+    return {
+        "version": model.version,
+        "path": risk_scorer.path,
+        "threshold": model.threshold,
+        "warning_threshold": model.warning_threshold
+    }
+
+
+@router.post("/api/v1/admin/risk-model/reload")
+async def reload_risk_model():
+    """Recarga el modelo de riesgo sin interrumpir las requests en vuelo"""
+    try:
+        model = risk_scorer.reload()
+    except RiskModelError as e:
+        logger.error("Recarga del modelo de riesgo fallida: %s", e)
+        raise HTTPException(status_code=422, detail=str(e))
+    logger.info("Modelo de riesgo recargado - versión %s", model.version)
+    return {"version": model.version}
+
+
+@router.get("/api/v1/admin/replay-filter")
+async def get_replay_filter():
+    """Dimensiones del filtro de duplicados y su tasa de falsos positivos estimada"""
+    if replay_filter is None:
+        raise HTTPException(status_code=404, detail="Detección de duplicados no habilitada")
+    return replay_filter.stats()
+
+
+@router.get("/api/v1/admin/accounts")
+async def get_accounts():
+    """Obtiene el estado del snapshot de cuentas activo"""
+    if account_registry is None:
+        raise HTTPException(status_code=404, detail="Registro de cuentas no configurado")
+    snapshot = account_registry.snapshot
+    return {
+        "path": account_registry.path,
+        "accounts": len(snapshot),
+        "created": datetime.utcfromtimestamp(snapshot.created).isoformat()
+    }
+
+
+@router.post("/api/v1/admin/accounts/reload")
+async def reload_accounts():
+    """Recarga el snapshot de cuentas sin interrumpir las requests en vuelo"""
+    if account_registry is None:
+        raise HTTPException(status_code=404, detail="Registro de cuentas no configurado")
+    try:
+        snapshot = account_registry.reload()
+    except AccountSnapshotError as e:
+        logger.error("Recarga de cuentas fallida: %s", e)
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"accounts": len(snapshot)}
+
+
+@router.get("/api/v1/admin/timers")
+async def get_stage_timers(reset: bool = False):
+    """Percentiles por etapa del hot path en este worker (reset=true los reinicia)"""
+    if not stage_timers.enabled:
+        raise HTTPException(status_code=404, detail="Perfilado no habilitado (PROFILING_ENABLED)")
+    stages = stage_timers.snapshot()
+    if reset:
+        stage_timers.reset()
+    return {"pid": os.getpid(), "stages": stages}
+
+
+@router.post("/api/v1/admin/profile")
+async def run_profile(seconds: float = 10.0, interval_ms: Optional[float] = None):
+    """
+    Perfila este worker durante `seconds` segundos
+
+    Retorna las pilas muestreadas en formato collapsed (flamegraph.pl,
+    speedscope). El muestreo corre en un hilo aparte: el worker sigue
+    atendiendo requests y aparecen en el perfil.
+    """
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Perfilado no habilitado (PROFILING_ENABLED)")
+    if not 0 < seconds <= PROFILING_MAX_SECONDS:
+        raise HTTPException(status_code=422, detail=f"seconds debe estar entre 0 y {PROFILING_MAX_SECONDS}")
+    if interval_ms is not None and not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=422, detail="interval_ms debe estar entre 1 y 1000")
+    interval = interval_ms / 1000 if interval_ms is not None else None
+    try:
+        stacks = await profiler.run(seconds, interval)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(
+        content=collapsed(stacks),
+        media_type="text/plain",
+        headers={"X-Profile-Samples": str(sum(stacks.values())), "X-Profile-Pid": str(os.getpid())},
+    )
+
+
+@router.get("/api/v1/admin/startup")
+async def get_startup_report():
+    """Costo de importación e inicialización por componente en este proceso"""
+    return {
+        "pid": os.getpid(),
+        "telemetry": {"exporter": telemetry.exporter, "enabled": telemetry.enabled},
+        **startup_report.as_dict(),
+    }
+
+
+@router.get("/api/v1/admin/lifecycle")
+async def get_lifecycle():
+    """Fase del proceso, validaciones en vuelo y reportes de calentamiento y drenado"""
+    return lifecycle.status()
+
+
+@router.post("/api/v1/admin/drain")
+async def drain(wait: bool = False):
+    """
+    Deja de admitir validaciones, espera las que están en vuelo hasta
+    DRAIN_TIMEOUT_SECONDS y vacía las colas de spans, logs y outbox
+
+    Con el servidor pre-fork se avisa al maestro, que drena a todos los
+    workers. wait=true responde al terminar el drenado de este proceso.
+    """
+    master = os.getenv("PREFORK_MASTER_PID")
+    if master:
+        os.kill(int(master), signal.SIGUSR1)
+    task = start_drain()
+    if wait:
+        await asyncio.shield(task)
+    return JSONResponse(lifecycle.status(), status_code=200 if task.done() else 202)
+
+
+@router.get("/api/v1/stats")
 async def get_stats():
     """Obtiene estadísticas del servicio"""
     return {
@@ -373,7 +1491,141 @@ async def get_stats():
     }
 
 
+def report_ready():
+    startup_report.mark_ready()
+    logger.info("Servicio listo - arranque: %s", json.dumps(startup_report.as_dict()))
+
+
+async def on_startup():
+    """Configura la telemetría y calienta el hot path antes de marcar el servicio listo"""
+    telemetry.configure()
+    if METRICS_SNAPSHOT_INTERVAL > 0:
+        metrics_exposition.start_refresh(METRICS_SNAPSHOT_INTERVAL)
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, start_drain)
+    except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+        # Sin señales POSIX o fuera del hilo principal (TestClient)
+        pass
+    if binary_server is not None:
+        # Socket abierto por el maestro pre-fork, o aquí en un solo proceso
+        await binary_server.start()
+    # Al arrancar y no al importar: el maestro pre-fork no cuenta como proceso en una fase
+    on_lifecycle_phase(None, lifecycle.phase)
+    if lifecycle.ready:
+        report_ready()
+    else:
+        # El servidor ya atiende /health; /ready espera al calentamiento
+        lifecycle.start_warm_up().add_done_callback(
+            lambda task: report_ready() if lifecycle.phase == SERVING else None
+        )
+
+
+async def on_shutdown():
+    """Drena antes de detener la telemetría y el outbox"""
+    await start_drain()
+    if binary_server is not None:
+        await binary_server.close()
+
+
+def create_app() -> FastAPI:
+    """Construye la aplicación: rutas, middlewares y hooks de arranque/cierre"""
+    app = FastAPI(
+        title="PayFlow MX - Transaction Validator",
+        description="Microservicio de validación de transacciones electrónicas",
+        version=os.getenv("APP_VERSION", "1.0.0"),
+        docs_url="/docs",
+        redoc_url="/redoc"
+    )
+
+    app.include_router(router)
+    app.add_event_handler("startup", on_startup)
+    app.add_event_handler("shutdown", on_shutdown)
+    app.add_event_handler("shutdown", telemetry.shutdown)
+    app.add_event_handler("shutdown", metrics_exposition.stop_refresh)
+    app.add_event_handler("shutdown", profiler.shutdown)
+
+    if result_outbox is not None:
+        # Los workers pre-fork terminan con os._exit: atexit no alcanza
+        app.add_event_handler("shutdown", result_outbox.close)
+
+    # Middleware para métricas y logging (dentro del span de OpenTelemetry para
+    # que el access log lleve los IDs de la traza)
+    app.add_middleware(
+        MetricsMiddleware,
+        request_count=REQUEST_COUNT,
+        request_latency=REQUEST_LATENCY,
+        active_transactions=ACTIVE_TRANSACTIONS,
+        error_count=ERROR_COUNT,
+        logger=logger,
+        routes=app.routes,
+        log_sample_rate=float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0")),
+        timers=stage_timers,
+    )
+
+    # Trazas de OpenTelemetry; el middleware real se arma al configurarlas
+    app.add_middleware(LazyTracingMiddleware, telemetry=telemetry)
+
+    # Control de admisión: fuera de las trazas y métricas por request para que
+    # descartar cueste lo mínimo (los descartes tienen su propio contador)
+    if os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true":
+        admission_limiter = AdaptiveLimiter(
+            initial_limit=int(os.getenv("ADMISSION_INITIAL_LIMIT", "100")),
+            min_limit=int(os.getenv("ADMISSION_MIN_LIMIT", "10")),
+            max_limit=int(os.getenv("ADMISSION_MAX_LIMIT", "1000")),
+            target_latency=float(os.getenv("ADMISSION_TARGET_LATENCY", "0.25")),
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "50")),
+            queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "0.05")),
+            on_limit=ADMISSION_CONCURRENCY_LIMIT.set,
+        )
+        # Al arrancar cada worker y no al importar: con livesum el valor que
+        # dejara el maestro pre-fork se sumaría para siempre al agregado
+        app.add_event_handler("startup", lambda: ADMISSION_CONCURRENCY_LIMIT.set(admission_limiter.limit))
+        app.add_middleware(
+            AdmissionControlMiddleware,
+            limiter=admission_limiter,
+            paths=("/api/v1/validate",),
+            on_shed=lambda reason: ADMISSION_SHED.labels(reason=reason).inc(),
+            on_queue_delay=ADMISSION_QUEUE_DELAY.observe,
+        )
+
+    # Drenado: rechaza validaciones nuevas antes de la cola de admisión
+    app.add_middleware(
+        DrainMiddleware,
+        lifecycle=lifecycle,
+        paths=("/api/v1/validate", "/api/v1/validate/batch", "/api/v1/validate/stream"),
+        on_reject=DRAIN_REJECTED.inc,
+    )
+
+    # Configurar CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
+
+
+with startup_report.measure("init.app"):
+    app = create_app()
+
+
 if __name__ == "__main__":
+    import sys
+
+    # Modo CLI: python -m src.main validate-stream <archivo.jsonl | ->
+    if len(sys.argv) > 1 and sys.argv[1] == "validate-stream":
+        path = sys.argv[2] if len(sys.argv) > 2 else "-"
+        source = sys.stdin.buffer if path == "-" else open(path, "rb")
+        try:
+            asyncio.run(validate_stream_file(source, sys.stdout))
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+        sys.exit(0)
+
+    # Un solo proceso; para un worker por CPU usar python -m src.server
     import uvicorn
     uvicorn.run(
         app,
@@ -0,0 +1,245 @@
+"""
+Outbox de resultados de validación
+
+append() encola el resultado ya serializado sin bloquear (si la cola está
+llena se descarta y se cuenta). Un hilo en segundo plano agrupa los
+registros por tamaño de lote o por tiempo y los agrega a segmentos locales
+de sólo escritura, uno por proceso:
+
+    <directorio>/results-<epoch ms>-<pid>-<secuencia>.seg
+
+Cada registro va precedido por su longitud y su CRC32 (uint32 little-endian
+cada uno), así un lector puede seguir el archivo mientras crece y detectar
+un registro a medio escribir. Los segmentos rotan al superar segment_bytes.
+
+Política de fsync: "batch" (después de cada lote), "interval" (como mucho
+cada fsync_interval segundos) o "never" (lo decide el sistema operativo).
+"""
+import atexit
+import os
+import queue
+import struct
+import threading
+import time
+import weakref
+import zlib
+from typing import Callable, List, Optional, Tuple
+
+RECORD_HEADER = struct.Struct("<II")
+
+FSYNC_BATCH = "batch"
+FSYNC_INTERVAL = "interval"
+FSYNC_NEVER = "never"
+FSYNC_POLICIES = (FSYNC_BATCH, FSYNC_INTERVAL, FSYNC_NEVER)
+
+# Motivos de descarte (etiqueta de métricas)
+DROP_QUEUE_FULL = "queue_full"
+DROP_WRITE_ERROR = "write_error"
+DROP_CLOSED = "closed"
+
+FLUSH_TIMEOUT = 5.0
+
+_STOP = object()
+
+
+def _noop(*args):
+    pass
+
+
+class OutboxError(ValueError):
+    """Un segmento del outbox está corrupto"""
+
+
+def encode_record(payload: bytes) -> bytes:
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_records(path: str, offset: int = 0) -> Tuple[List[bytes], int]:
+    """
+    Lee los registros completos de un segmento a partir de offset
+
+    Retorna (registros, offset siguiente). Un registro incompleto al final
+    (escritura en curso) se deja para la siguiente lectura; un CRC inválido
+    lanza OutboxError.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    records = []
+    position = 0
+    while position + RECORD_HEADER.size <= len(data):
+        length, crc = RECORD_HEADER.unpack_from(data, position)
+        end = position + RECORD_HEADER.size + length
+        if end > len(data):
+            break
+        payload = data[position + RECORD_HEADER.size:end]
+        if zlib.crc32(payload) != crc:
+            raise OutboxError(f"Registro corrupto en {path} (offset {offset + position})")
+        records.append(payload)
+        position = end
+    return records, offset + position
+
+
+class ResultOutbox:
+    """Cola acotada y escritor por lotes de resultados serializados"""
+
+    def __init__(
+        self,
+        directory: str,
+        batch_size: int = 512,
+        flush_interval: float = 0.05,
+        queue_size: int = 100000,
+        segment_bytes: int = 64 * 1024 * 1024,
+        fsync: str = FSYNC_BATCH,
+        fsync_interval: float = 1.0,
+        on_flush: Callable[[int, float], None] = _noop,
+        on_drop: Callable[[str, int], None] = _noop,
+        on_written: Callable[[int], None] = _noop,
+        on_error: Callable[[Exception], None] = _noop,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Política de fsync desconocida: {fsync!r}")
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        # on_flush recibe (registros, segundos de escritura + fsync)
+        self.on_flush = on_flush
+        self.on_drop = on_drop
+        # Recibe la profundidad de la cola después de escribir cada lote
+        self.on_written = on_written
+        self.on_error = on_error
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.segment: Optional[str] = None
+        self._file = None
+        self._segment_size = 0
+        self._sequence = 0
+        self._last_fsync = 0.0
+        self._closed = False
+        os.makedirs(directory, exist_ok=True)
+        self._start_writer()
+        atexit.register(self.close)
+        # Tras un fork (servidor pre-fork) el hijo escribe su propio segmento
+        ref = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: ref() and ref()._after_fork())
+
+    def _start_writer(self):
+        self._thread = threading.Thread(target=self._run, name="outbox-writer", daemon=True)
+        self._thread.start()
+
+    def _after_fork(self):
+        if self._closed:
+            return
+        # El descriptor heredado es del segmento del padre
+        self._file = None
+        self.segment = None
+        self._sequence = 0
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self._start_writer()
+
+    def append(self, payload: bytes):
+        """Encola un resultado serializado; nunca bloquea"""
+        if self._closed:
+            self.on_drop(DROP_CLOSED, 1)
+            return
+        try:
+            self.queue.put_nowait(payload)
+        except queue.Full:
+            self.on_drop(DROP_QUEUE_FULL, 1)
+
+    def _open_segment(self):
+        self._sequence += 1
+        name = f"results-{time.time_ns() // 1_000_000:013d}-{os.getpid()}-{self._sequence:06d}.seg"
+        self.segment = os.path.join(self.directory, name)
+        # Sin buffer: cada lote llega al archivo con una sola escritura
+        self._file = open(self.segment, "xb", buffering=0)
+        self._segment_size = 0
+
+    def _close_segment(self):
+        if self._file is not None:
+            if self.fsync != FSYNC_NEVER:
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def _write(self, batch: List[bytes]):
+        started = time.perf_counter()
+        try:
+            if self._file is None or self._segment_size >= self.segment_bytes:
+                self._close_segment()
+                self._open_segment()
+            data = b"".join(encode_record(payload) for payload in batch)
+            self._file.write(data)
+            self._segment_size += len(data)
+            now = time.monotonic()
+            if self.fsync == FSYNC_BATCH or (
+                self.fsync == FSYNC_INTERVAL and now - self._last_fsync >= self.fsync_interval
+            ):
+                os.fsync(self._file.fileno())
+                self._last_fsync = now
+        except Exception as e:
+            # Un segmento con una escritura fallida no se sigue usando
+            self._file = None
+            self.on_error(e)
+            self.on_drop(DROP_WRITE_ERROR, len(batch))
+            return
+        self.on_flush(len(batch), time.perf_counter() - started)
+
+    def _run(self):
+        while True:
+            payload = self.queue.get()
+            if payload is _STOP:
+                self.queue.task_done()
+                break
+            batch = [payload]
+            stop = False
+            # El lote se cierra al llenarse o flush_interval después del primero
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    payload = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if payload is _STOP:
+                    stop = True
+                    break
+                batch.append(payload)
+            self._write(batch)
+            for _ in range(len(batch) + stop):
+                self.queue.task_done()
+            self.on_written(self.queue.qsize())
+            if stop:
+                break
+        try:
+            self._close_segment()
+        except OSError as e:
+            self.on_error(e)
+
+    def flush(self, timeout: Optional[float] = FLUSH_TIMEOUT) -> bool:
+        """Espera a que la cola se vacíe; retorna False si vence el timeout"""
+        if not self._thread.is_alive():
+            return not self.queue.unfinished_tasks
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self):
+        """Drena lo encolado, sincroniza y cierra el segmento"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread.is_alive():
+            self.flush()
+            try:
+                self.queue.put(_STOP, timeout=1.0)
+            except queue.Full:
+                pass
+            self._thread.join(timeout=FLUSH_TIMEOUT)
@@ -0,0 +1,175 @@
+"""
+Pipeline asíncrono de validación de transacciones
+
+Cada validación (límites, cuentas, fraude, compliance) se declara como una
+etapa. Las etapas asíncronas corren concurrentemente sobre el event loop y las
+etapas CPU-bound se despachan a un executor acotado, de modo que ninguna
+bloquea a uvicorn.
+
+Con collapse_spans las etapas no crean spans hijos: su duración y sus checks
+se registran como atributos del span activo.
+
+Con un deadline (time.monotonic) cada etapa ASYNC o CPU corre con el menor
+entre su presupuesto y el tiempo restante; si se agota, se cancela y se usa
+su decisión de respaldo. Las etapas INLINE no se pueden interrumpir: sólo se
+omiten si el deadline ya venció antes de empezar.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from opentelemetry import trace
+
+# Resultado de una etapa: checks evaluados y advertencias generadas
+StageOutput = Tuple[Dict[str, bool], List[str]]
+
+# Tipos de etapa
+INLINE = "inline"   # Función síncrona barata, se ejecuta directamente
+ASYNC = "async"     # Corrutina (I/O), se ejecuta concurrentemente
+CPU = "cpu"         # Función síncrona costosa, se envía al executor
+
+
+def _noop(*args):
+    pass
+
+
+def fail_closed(name: str) -> StageOutput:
+    """Respaldo por defecto: la etapa omitida cuenta como check fallido"""
+    return {name: False}, [f"Etapa {name} omitida: presupuesto de tiempo agotado"]
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    Etapa del pipeline de validación
+
+    budget (segundos) acota la etapa aunque quede más deadline. fallback
+    recibe la transacción y da la decisión cuando la etapa se omite; sin él
+    se usa fail_closed para no aprobar algo que no se validó.
+    """
+    name: str
+    func: Callable[[Any], Any]
+    kind: str = INLINE
+    budget: Optional[float] = None
+    fallback: Optional[Callable[[Any], StageOutput]] = None
+
+    def degrade(self, transaction) -> StageOutput:
+        if self.fallback is None:
+            return fail_closed(self.name)
+        return self.fallback(transaction)
+
+
+class ValidationPipeline:
+    """Ejecuta las etapas de validación sin bloquear el event loop"""
+
+    def __init__(self, tracer, stages: Sequence[Stage], max_workers: Optional[int] = None,
+                 collapse_spans: bool = False, on_budget_exhausted: Callable[[str], None] = _noop,
+                 clock: Callable[[], float] = time.monotonic):
+        self._tracer = tracer
+        self.stages = list(stages)
+        self.collapse_spans = collapse_spans
+        self.on_budget_exhausted = on_budget_exhausted
+        self._clock = clock
+        self.max_workers = max_workers or int(os.getenv("VALIDATION_EXECUTOR_WORKERS", "4"))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="validation-cpu"
+            )
+        return self._executor
+
+    async def _run_cpu(self, func, transaction):
+        # El semáforo acota el trabajo encolado en el executor
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers * 2)
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, transaction)
+
+    async def _call(self, stage: Stage, transaction) -> StageOutput:
+        if stage.kind == ASYNC:
+            return await stage.func(transaction)
+        if stage.kind == CPU:
+            return await self._run_cpu(stage.func, transaction)
+        return stage.func(transaction)
+
+    async def _run_stage(self, stage: Stage, transaction) -> StageOutput:
+        if not self.collapse_spans:
+            with self._tracer.start_as_current_span(stage.name):
+                return await self._call(stage, transaction)
+
+        span = trace.get_current_span()
+        if not span.is_recording():
+            return await self._call(stage, transaction)
+        start = time.perf_counter()
+        output = await self._call(stage, transaction)
+        span.set_attribute(f"stage.{stage.name}.duration_ms", (time.perf_counter() - start) * 1000)
+        for name, passed in output[0].items():
+            span.set_attribute(f"check.{name}", passed)
+        return output
+
+    def _timeout(self, stage: Stage, deadline: Optional[float]) -> Optional[float]:
+        timeout = stage.budget
+        if deadline is not None:
+            remaining = deadline - self._clock()
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return timeout
+
+    async def _run_budgeted(self, stage: Stage, transaction, deadline: Optional[float]):
+        """Ejecuta la etapa dentro de su presupuesto; retorna (salida, omitida)"""
+        timeout = self._timeout(stage, deadline)
+        if timeout is None or (stage.kind == INLINE and timeout > 0):
+            return await self._run_stage(stage, transaction), False
+        if timeout > 0:
+            try:
+                return await asyncio.wait_for(self._run_stage(stage, transaction), timeout), False
+            except asyncio.TimeoutError:
+                pass
+        self.on_budget_exhausted(stage.name)
+        return stage.degrade(transaction), True
+
+    async def run(self, transaction) -> StageOutput:
+        """Ejecuta todas las etapas y combina sus resultados en orden de declaración"""
+        checks, warnings, _ = await self.run_with_deadline(transaction, None)
+        return checks, warnings
+
+    async def run_with_deadline(
+        self, transaction, deadline: Optional[float]
+    ) -> Tuple[Dict[str, bool], List[str], List[str]]:
+        """Como run(), respetando deadline y presupuestos; agrega las etapas omitidas"""
+        outputs: List[Optional[Tuple[StageOutput, bool]]] = [None] * len(self.stages)
+        pending = []
+
+        for index, stage in enumerate(self.stages):
+            if stage.kind == INLINE:
+                outputs[index] = await self._run_budgeted(stage, transaction, deadline)
+            else:
+                pending.append((index, self._run_budgeted(stage, transaction, deadline)))
+
+        if pending:
+            results = await asyncio.gather(*(coro for _, coro in pending))
+            for (index, _), output in zip(pending, results):
+                outputs[index] = output
+
+        checks: Dict[str, bool] = {}
+        warnings: List[str] = []
+        skipped: List[str] = []
+        for stage, ((stage_checks, stage_warnings), was_skipped) in zip(self.stages, outputs):
+            checks.update(stage_checks)
+            warnings.extend(stage_warnings)
+            if was_skipped:
+                skipped.append(stage.name)
+        return checks, warnings, skipped
+
+    def shutdown(self):
+        """Libera el executor de etapas CPU-bound"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
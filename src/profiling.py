@@ -0,0 +1,219 @@
+"""
+Perfilado continuo opcional: timers por etapa y profiler por muestreo
+
+StageTimers acumula la duración de cada etapa del hot path en histogramas
+log-lineales en memoria (estilo HDR: error relativo acotado, sin límite
+superior fijo). El código instrumentado pide un Lap al inicio y marca cada
+etapa al terminarla; deshabilitado, lap() retorna un objeto cuyas marcas no
+hacen nada, así que el costo es una llamada por marca.
+
+SamplingProfiler muestrea las pilas de todos los hilos del proceso durante N
+segundos y las agrega en formato "collapsed" (una pila por línea, frames
+separados por ';' y el número de muestras), que aceptan flamegraph.pl,
+speedscope e inferno. Las muestras del event loop esperando en select()
+son tiempo ocioso; las de un hilo que no avanza apuntan a contención.
+
+Ambos son por proceso: con el servidor pre-fork cada worker tiene los suyos.
+"""
+import asyncio
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+
+class LogHistogram:
+    """Histograma de duraciones con buckets de ancho relativo `precision`"""
+
+    def __init__(self, precision: float = 0.01, min_value: float = 1e-6):
+        self.precision = precision
+        self.min_value = min_value
+        self._log_width = math.log1p(precision)
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float):
+        index = int(math.log(max(value, self.min_value) / self.min_value) / self._log_width)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float:
+        """Cota superior del percentil q (0-100), acotada por el máximo observado"""
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                return min(self.max, self.min_value * math.exp((index + 1) * self._log_width))
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p95_ms": round(self.percentile(95) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class Lap:
+    """Cronómetro de un request: cada mark() registra el tiempo desde la marca anterior"""
+
+    __slots__ = ("_timers", "_last")
+
+    def __init__(self, timers: "StageTimers"):
+        self._timers = timers
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self._timers.record(stage, now - self._last)
+        self._last = now
+
+
+class _NullLap:
+    __slots__ = ()
+
+    def mark(self, stage: str):
+        pass
+
+
+NULL_LAP = _NullLap()
+
+
+class StageTimers:
+    """
+    Histogramas por etapa del hot path
+
+    Se registra desde el event loop; los incrementos no toman lock.
+    """
+
+    def __init__(self, enabled: bool = False, precision: float = 0.01):
+        self.enabled = enabled
+        self.precision = precision
+        self._histograms: Dict[str, LogHistogram] = {}
+
+    def lap(self):
+        return Lap(self) if self.enabled else NULL_LAP
+
+    def record(self, stage: str, seconds: float):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            histogram = self._histograms[stage] = LogHistogram(self.precision)
+        histogram.record(seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {stage: histogram.summary() for stage, histogram in sorted(self._histograms.items())}
+
+    def reset(self):
+        self._histograms = {}
+
+
+class ProfilerBusy(RuntimeError):
+    """Ya hay un perfilado en curso en este proceso"""
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    marker = filename.rfind("site-packages" + os.sep)
+    if marker >= 0:
+        filename = filename[marker + len("site-packages") + 1:]
+    else:
+        filename = os.path.relpath(filename) if os.path.isabs(filename) else filename
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Profiler por muestreo de pilas (sys._current_frames) en un hilo aparte
+
+    Un solo perfilado a la vez por proceso. Desde el event loop, run() toma
+    el turno antes de encolar y muestrea en un executor propio de un hilo:
+    no ocupa ni espera al executor por defecto que usan exposition y drain.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._running = threading.Lock()
+        self._labels: Dict[object, str] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def running(self) -> bool:
+        return self._running.locked()
+
+    def profile(self, seconds: float, interval: Optional[float] = None) -> Counter:
+        """Muestrea durante `seconds` (bloquea al llamador); retorna pila -> muestras"""
+        if not self._running.acquire(blocking=False):
+            raise ProfilerBusy("Ya hay un perfilado en curso")
+        try:
+            return self._collect(seconds, interval)
+        finally:
+            self._running.release()
+
+    async def run(self, seconds: float, interval: Optional[float] = None) -> Counter:
+        """Como profile(), sin bloquear el event loop"""
+        if not self._running.acquire(blocking=False):
+            raise ProfilerBusy("Ya hay un perfilado en curso")
+        try:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profiler")
+            future = self._executor.submit(self._collect, seconds, interval)
+        except BaseException:
+            self._running.release()
+            raise
+        # El turno se libera cuando termina el muestreo, aunque se cancele la espera
+        future.add_done_callback(lambda _: self._running.release())
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        """Libera el executor del profiler"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _collect(self, seconds: float, interval: Optional[float]) -> Counter:
+        interval = interval or self.interval
+        own = threading.get_ident()
+        stacks: Counter = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self._sample(stacks, own)
+            time.sleep(interval)
+        return stacks
+
+    def _sample(self, stacks: Counter, own: int):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            frames = []
+            while frame is not None and len(frames) < self.max_depth:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = _frame_label(code)
+                frames.append(label)
+                frame = frame.f_back
+            frames.append(names.get(ident, f"thread-{ident}"))
+            frames.reverse()
+            stacks[";".join(frames)] += 1
+
+
+def collapsed(stacks: Counter) -> str:
+    """Formato collapsed: "raíz;...;hoja muestras" por línea, más frecuentes primero"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,141 @@
+"""
+Detección de duplicados y reenvíos con filtros de Bloom por ventana de tiempo
+
+Recordar cada transaction_id visto no cabe en memoria, así que la ventana
+se divide en `partitions` particiones de tiempo, cada una con su propio
+filtro de Bloom de tamaño fijo. Se consulta en todos los filtros y se
+agrega sólo al de la partición actual; al avanzar el tiempo el filtro de la
+partición que sale de la ventana se vacía y se reutiliza. Hay partitions + 1
+filtros, así que una llave se recuerda al menos window_seconds (y a lo sumo
+una partición más).
+
+La memoria es memory_bytes sin importar el tráfico; la tasa de falsos
+positivos objetivo fija cuántas llaves por partición caben (capacity). Con
+más tráfico la memoria no crece: sube la tasa de falsos positivos, que se
+estima con estimated_false_positive_rate(). Consultar y agregar una llave es
+O(hashes).
+
+Los filtros viven en un mmap anónimo compartido: creado en el maestro antes
+del fork (src/server.py), todos los workers ven los mismos filtros y un
+duplicado se detecta aunque llegue a otro worker. Cada filtro lleva la
+partición que representa, así que el primer proceso que ve avanzar el tiempo
+lo vacía y los demás no lo vuelven a vaciar. Las escrituras no toman lock:
+dos workers que encienden bits del mismo byte a la vez pueden perder uno
+(un duplicado sin detectar, nunca un falso positivo).
+"""
+import hashlib
+import math
+import mmap
+import time
+from typing import Callable, Dict
+
+EPOCH_SIZE = 8  # Partición de cada filtro (int64) en la cabecera del mmap
+
+
+class ReplayFilter:
+    """Conjunto aproximado de llaves vistas en la ventana (sin falsos negativos)"""
+
+    def __init__(
+        self,
+        window_seconds: float = 600.0,
+        partitions: int = 4,
+        memory_bytes: int = 16 * 1024 * 1024,
+        false_positive_rate: float = 0.001,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if window_seconds <= 0 or partitions < 1:
+            raise ValueError("Se requiere window_seconds > 0 y partitions >= 1")
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("false_positive_rate debe estar entre 0 y 1")
+        self.window_seconds = window_seconds
+        self.partitions = partitions
+        self.partition_seconds = window_seconds / partitions
+        self.false_positive_rate = false_positive_rate
+        self._clock = clock
+
+        self.slots = partitions + 1
+        self.filter_bytes = (memory_bytes - self.slots * EPOCH_SIZE) // self.slots // 8 * 8
+        if self.filter_bytes < 8:
+            raise ValueError("memory_bytes no alcanza para un filtro por partición")
+        self.bits = self.filter_bytes * 8
+        # Una consulta revisa todos los filtros: a cada uno le toca una fracción del objetivo
+        per_filter = false_positive_rate / self.slots
+        self.hashes = max(1, round(-math.log2(per_filter)))
+        self.capacity = int(self.bits * math.log(2) ** 2 / -math.log(per_filter))
+
+        header = self.slots * EPOCH_SIZE
+        self._mmap = mmap.mmap(-1, header + self.slots * self.filter_bytes)
+        view = memoryview(self._mmap)
+        self._epochs = view[:header].cast("q")
+        self._filters = [
+            view[header + slot * self.filter_bytes:header + (slot + 1) * self.filter_bytes]
+            for slot in range(self.slots)
+        ]
+        self._epoch = self._current_epoch()
+        for epoch in range(self._epoch - self.slots + 1, self._epoch + 1):
+            self._epochs[epoch % self.slots] = epoch
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._mmap)
+
+    def _current_epoch(self) -> int:
+        return int(self._clock() // self.partition_seconds)
+
+    def _advance(self):
+        epoch = self._current_epoch()
+        if epoch == self._epoch:
+            return
+        # Vaciar los filtros reasignados a particiones nuevas (si otro proceso
+        # ya lo hizo, el filtro ya lleva la partición y se deja como está)
+        for new_epoch in range(max(self._epoch + 1, epoch - self.slots + 1), epoch + 1):
+            slot = new_epoch % self.slots
+            if self._epochs[slot] != new_epoch:
+                self._filters[slot][:] = bytes(self.filter_bytes)
+                self._epochs[slot] = new_epoch
+        self._epoch = epoch
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        # Doble hashing: k posiciones a partir de dos hashes de 64 bits
+        position = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        bits = self.bits
+        return [(position + i * step) % bits for i in range(self.hashes)]
+
+    def check_and_add(self, key: str) -> bool:
+        """Retorna si la llave ya estaba en la ventana y la registra en la partición actual"""
+        self._advance()
+        positions = self._positions(key)
+        seen = False
+        for bloom in self._filters:
+            for p in positions:
+                if not bloom[p >> 3] & (1 << (p & 7)):
+                    break
+            else:
+                seen = True
+                break
+        bloom = self._filters[self._epoch % self.slots]
+        for p in positions:
+            bloom[p >> 3] |= 1 << (p & 7)
+        return seen
+
+    def estimated_false_positive_rate(self) -> float:
+        """Tasa de falsos positivos actual según la fracción de bits encendidos (O(memoria))"""
+        self._advance()
+        miss = 1.0
+        for bloom in self._filters:
+            fill = int.from_bytes(bloom, "little").bit_count() / self.bits
+            miss *= 1.0 - fill ** self.hashes
+        return 1.0 - miss
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "window_seconds": self.window_seconds,
+            "partitions": self.partitions,
+            "memory_bytes": self.memory_bytes,
+            "hashes": self.hashes,
+            "capacity_per_partition": self.capacity,
+            "target_false_positive_rate": self.false_positive_rate,
+            "estimated_false_positive_rate": self.estimated_false_positive_rate(),
+        }
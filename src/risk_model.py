@@ -0,0 +1,219 @@
+"""
+Modelo de riesgo de fraude servido en proceso
+
+Un modelo se declara en un archivo JSON con sus pesos ya entrenados y se
+evalúa con NumPy sobre una matriz de features (una fila por transacción),
+así una transacción sola y un lote usan el mismo camino vectorizado.
+
+Formato del archivo (regresión logística):
+
+    {
+      "version": "2025-01",
+      "type": "logistic",
+      "features": ["log_amount", "currency_usd", ...],
+      "weights": [0.35, 0.4, ...],
+      "bias": -6.0,
+      "threshold": 0.15,
+      "warning_threshold": 0.1
+    }
+
+Las features disponibles están en FEATURES; otros tipos de modelo se
+agregan con register_model_type. La recarga carga y prueba el modelo nuevo
+y lo publica con una sola asignación, como el motor de reglas.
+"""
+import json
+import math
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Protocol, Sequence
+
+import numpy as np
+
+
+class RiskModelError(ValueError):
+    """El archivo del modelo es inválido"""
+
+
+# Columnas crudas que se extraen de cada transacción (una sola pasada en Python)
+AMOUNT, CURRENCY, HOUR, SAME_BANK, HAS_DESCRIPTION = range(5)
+
+# Índice de moneda; cualquier otra cuenta como OTHER_CURRENCY
+CURRENCY_INDEX = {"MXN": 0, "USD": 1, "EUR": 2}
+OTHER_CURRENCY = 3
+
+
+def _utc_hour(timestamp) -> float:
+    if timestamp is None:
+        timestamp = datetime.now(timezone.utc)
+    elif timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return timestamp.hour + timestamp.minute / 60
+
+
+def raw_columns(transactions: Sequence[Any]) -> np.ndarray:
+    """Matriz (transacciones x columnas crudas) de la que salen las features"""
+    return np.array([
+        (
+            t.amount,
+            CURRENCY_INDEX.get(t.currency, OTHER_CURRENCY),
+            _utc_hour(t.timestamp),
+            # Los tres primeros dígitos de la CLABE identifican al banco
+            t.sender_account[:3] == t.receiver_account[:3],
+            bool(t.description),
+        )
+        for t in transactions
+    ], dtype=np.float64).reshape(len(transactions), 5)
+
+
+def _hour_angle(raw: np.ndarray) -> np.ndarray:
+    return raw[:, HOUR] * (2 * math.pi / 24)
+
+
+# Features disponibles: nombre -> función vectorizada sobre las columnas crudas
+FEATURES: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "log_amount": lambda raw: np.log1p(raw[:, AMOUNT]),
+    "round_amount": lambda raw: (np.mod(raw[:, AMOUNT], 1000) == 0).astype(np.float64),
+    "currency_usd": lambda raw: (raw[:, CURRENCY] == CURRENCY_INDEX["USD"]).astype(np.float64),
+    "currency_eur": lambda raw: (raw[:, CURRENCY] == CURRENCY_INDEX["EUR"]).astype(np.float64),
+    "currency_other": lambda raw: (raw[:, CURRENCY] == OTHER_CURRENCY).astype(np.float64),
+    "hour_sin": lambda raw: np.sin(_hour_angle(raw)),
+    "hour_cos": lambda raw: np.cos(_hour_angle(raw)),
+    "same_bank": lambda raw: raw[:, SAME_BANK],
+    "has_description": lambda raw: raw[:, HAS_DESCRIPTION],
+}
+
+# Transacción con la que se prueba un modelo antes de publicarlo
+SAMPLE_TRANSACTION = SimpleNamespace(
+    transaction_id="SAMPLE",
+    amount=1.0,
+    currency="MXN",
+    sender_account="0000000000",
+    receiver_account="1111111111",
+    timestamp=None,
+    description=None,
+)
+
+
+def feature_matrix(names: Sequence[str], transactions: Sequence[Any]) -> np.ndarray:
+    """Matriz (transacciones x features) en el orden de names"""
+    raw = raw_columns(transactions)
+    if not names:
+        return np.empty((len(transactions), 0))
+    return np.column_stack([FEATURES[name](raw) for name in names])
+
+
+class RiskModel(Protocol):
+    """Interfaz de un modelo de riesgo: probabilidades de fraude por lote"""
+    version: str
+    threshold: float
+    warning_threshold: float
+
+    def score(self, transactions: Sequence[Any]) -> np.ndarray:
+        ...
+
+
+def _number(spec: Dict[str, Any], key: str, default: Any = None) -> float:
+    value = spec.get(key, default)
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or not math.isfinite(value):
+        raise RiskModelError(f"'{key}' requiere un número finito, no {value!r}")
+    return float(value)
+
+
+def _thresholds(spec: Dict[str, Any]):
+    threshold = _number(spec, "threshold")
+    warning_threshold = _number(spec, "warning_threshold", threshold)
+    if not 0 < threshold <= 1 or not 0 < warning_threshold <= threshold:
+        raise RiskModelError("Se requiere 0 < warning_threshold <= threshold <= 1")
+    return threshold, warning_threshold
+
+
+class LogisticModel:
+    """Regresión logística: sigmoid(X · weights + bias)"""
+
+    def __init__(self, version: str, features: Sequence[str], weights: Sequence[float], bias: float,
+                 threshold: float, warning_threshold: float):
+        self.version = version
+        self.features = tuple(features)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = bias
+        self.threshold = threshold
+        self.warning_threshold = warning_threshold
+
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Any]) -> "LogisticModel":
+        features = spec.get("features")
+        weights = spec.get("weights")
+        if not isinstance(features, list) or not all(isinstance(f, str) for f in features):
+            raise RiskModelError("'features' requiere una lista de nombres")
+        unknown = [f for f in features if f not in FEATURES]
+        if unknown:
+            raise RiskModelError(f"Features desconocidas: {unknown}")
+        if len(set(features)) != len(features):
+            raise RiskModelError("'features' tiene nombres duplicados")
+        if not isinstance(weights, list) or len(weights) != len(features):
+            raise RiskModelError("'weights' requiere un peso por feature")
+        weights = [_number({"weight": w}, "weight") for w in weights]
+        return cls(str(spec.get("version", "")), features, weights, _number(spec, "bias", 0.0),
+                   *_thresholds(spec))
+
+    def score(self, transactions: Sequence[Any]) -> np.ndarray:
+        logits = feature_matrix(self.features, transactions) @ self.weights + self.bias
+        # Acotado para que exp() no desborde con pesos extremos
+        return 1.0 / (1.0 + np.exp(-np.clip(logits, -500, 500)))
+
+
+# Tipos de modelo: "type" del archivo -> constructor desde la especificación
+MODEL_TYPES: Dict[str, Callable[[Dict[str, Any]], RiskModel]] = {
+    "logistic": LogisticModel.from_spec,
+}
+
+
+def register_model_type(name: str, factory: Callable[[Dict[str, Any]], RiskModel]):
+    """Agrega un tipo de modelo cargable desde archivo"""
+    MODEL_TYPES[name] = factory
+
+
+def build_model(spec: Dict[str, Any]) -> RiskModel:
+    """Construye y prueba un modelo; cualquier falla se reporta como RiskModelError"""
+    if not isinstance(spec, dict):
+        raise RiskModelError("El archivo del modelo debe ser un objeto JSON")
+    factory = MODEL_TYPES.get(spec.get("type"))
+    if factory is None:
+        raise RiskModelError(f"Tipo de modelo desconocido: {spec.get('type')!r}")
+    try:
+        model = factory(spec)
+        scores = model.score([SAMPLE_TRANSACTION, SAMPLE_TRANSACTION])
+        if scores.shape != (2,) or not np.all(np.isfinite(scores)):
+            raise RiskModelError("El modelo no produce un score finito por transacción")
+    except RiskModelError:
+        raise
+    except Exception as e:
+        raise RiskModelError(f"Modelo inválido: {type(e).__name__}: {e}") from e
+    return model
+
+
+def load_model(path: str) -> RiskModel:
+    """Carga y construye un modelo desde archivo"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+    except (OSError, ValueError) as e:
+        raise RiskModelError(f"No se pudo leer {path}: {e}") from e
+    return build_model(spec)
+
+
+class RiskScorer:
+    """Mantiene el modelo activo y lo reemplaza atómicamente al recargar"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.model = load_model(path)
+
+    def reload(self) -> RiskModel:
+        """Recarga el archivo; si es inválido se conserva el modelo actual"""
+        with self._lock:
+            model = load_model(self.path)
+            self.model = model
+            return model
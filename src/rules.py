@@ -0,0 +1,447 @@
+"""
+Motor de reglas declarativo para las validaciones
+
+Las reglas se cargan de un archivo JSON y se compilan a una sola función
+Python (sin recorrer estructuras por transacción). Las condiciones compuestas
+evalúan primero las más baratas para cortar en cuanto se decide el resultado.
+La recarga compila un plan nuevo y lo publica con una sola asignación, así que
+las requests en vuelo terminan con el plan que ya tenían.
+
+Formato del archivo:
+
+    {
+      "version": "2025-01",
+      "input": {"max_amount": 1000000, "currencies": ["MXN", "USD", "EUR"]},
+      "checks": [
+        {"name": "amount_within_limits", "field": "amount", "op": "le", "value": 1000000},
+        {"name": "ok", "all": [{"field": "currency", "op": "in", "value": ["MXN"]}, ...]}
+      ],
+      "warnings": [
+        {"name": "high_value", "field": "amount", "op": "gt", "value": 500000,
+         "message": "Transacción de alto valor - requiere aprobación adicional"}
+      ]
+    }
+
+La sección opcional "input" define los límites que aplica el modelo de
+entrada (HTTP 422); los checks deciden la validez de lo que sí se acepta.
+
+El campo "base_amount" es el monto convertido a la moneda base de la tabla
+de tipos de cambio (src/fx.py) con que se creó el motor y admite lt, le, gt
+y ge. Cada comparación se compila con un umbral precomputado por moneda
+(f_amount <= umbral[f_currency]), o en modo exacto (exact) como
+Decimal(monto) * tipo contra el límite. Una moneda fuera de la tabla no
+cumple ninguna comparación. "input" acepta igualmente "max_base_amount".
+La tabla es parte del plan: recargar el motor relee ambos archivos.
+
+El operador "known_account" (sin value) consulta el registro de cuentas
+(src/accounts.py) con que se creó el motor; sin registro el plan es inválido.
+"""
+import json
+import math
+import re
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, Container, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from src.fx import EXACT, FxError, FxTable, exact_amount, load_fx_table
+
+# Campos de Transaction disponibles para las reglas (acceso desde t)
+FIELDS = {
+    "transaction_id": "t.transaction_id",
+    "amount": "t.amount",
+    "currency": "t.currency",
+    "sender_account": "t.sender_account",
+    "receiver_account": "t.receiver_account",
+    "description": "(t.description or '')",
+}
+
+# Operadores: plantilla de la expresión y costo relativo para ordenar
+OPERATORS = {
+    "lt": ("{field} < {value}", 1),
+    "le": ("{field} <= {value}", 1),
+    "gt": ("{field} > {value}", 1),
+    "ge": ("{field} >= {value}", 1),
+    "eq": ("{field} == {value}", 1),
+    "ne": ("{field} != {value}", 1),
+    "eq_field": ("{field} == {other}", 1),
+    "ne_field": ("{field} != {other}", 1),
+    "in": ("{field} in {value}", 2),
+    "not_in": ("{field} not in {value}", 2),
+    "min_len": ("len({field}) >= {value}", 3),
+    "max_len": ("len({field}) <= {value}", 3),
+    "regex": ("{value}.fullmatch({field}) is not None", 10),
+    "known_account": ("{field} in {value}", 20),
+}
+
+# Campos numéricos; el resto son cadenas
+NUMERIC_FIELDS = frozenset(("amount", "base_amount"))
+
+# Monto normalizado a la moneda base: sólo admite comparaciones de orden
+BASE_AMOUNT_OPERATORS = frozenset(("lt", "le", "gt", "ge"))
+
+# Transacción de ejemplo con la que se prueba un plan antes de publicarlo
+SAMPLE_TRANSACTION = SimpleNamespace(
+    transaction_id="SAMPLE",
+    amount=1.0,
+    currency="MXN",
+    sender_account="0000000000",
+    receiver_account="1111111111",
+    description=None,
+)
+
+
+class RuleError(ValueError):
+    """El archivo de reglas es inválido"""
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _scalar(field: str, value: Any) -> Any:
+    """Valida un literal contra el tipo del campo"""
+    if field in NUMERIC_FIELDS:
+        if not _is_number(value):
+            raise RuleError(f"{field} requiere un número finito, no {value!r}")
+        # float contra float evita la comparación mixta int/float
+        return float(value)
+    if not isinstance(value, str):
+        raise RuleError(f"{field} requiere una cadena, no {value!r}")
+    return value
+
+
+class _Compiler:
+    """Traduce reglas a expresiones Python con constantes en el namespace"""
+
+    def __init__(self, accounts: Optional[Container] = None,
+                 fx: Optional[FxTable] = None, exact: bool = False):
+        self.accounts = accounts
+        self.fx = fx
+        self.exact = exact
+        self.constants: Dict[str, Any] = {}
+
+    def constant(self, value: Any) -> str:
+        # Literales simples van embebidos en el código (LOAD_CONST); el
+        # resto (regex compiladas) se resuelve desde el namespace
+        if isinstance(value, (bool, int, float, str)):
+            return repr(value)
+        if isinstance(value, frozenset) and all(isinstance(v, (int, float, str)) for v in value):
+            # 'x in {...}' con literales se compila a un frozenset constante
+            return "{" + ", ".join(repr(v) for v in sorted(value, key=repr)) + "}"
+        name = f"_c{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def condition(self, rule: Dict[str, Any]) -> Tuple[str, int, FrozenSet[str]]:
+        """Retorna (expresión, costo, campos usados) de una condición o composición"""
+        if not isinstance(rule, dict):
+            raise RuleError(f"Se esperaba un objeto de regla, no {rule!r}")
+        for combinator, joiner in (("all", " and "), ("any", " or ")):
+            if combinator in rule:
+                children = rule[combinator]
+                if not isinstance(children, list) or not children:
+                    raise RuleError(f"'{combinator}' requiere una lista de condiciones")
+                compiled = sorted((self.condition(child) for child in children), key=lambda c: c[1])
+                expr = joiner.join(f"({e})" for e, _, _ in compiled)
+                cost = sum(c for _, c, _ in compiled)
+                return expr, cost, frozenset().union(*(f for _, _, f in compiled))
+        if "not" in rule:
+            expr, cost, fields = self.condition(rule["not"])
+            return f"not ({expr})", cost, fields
+
+        field = rule.get("field")
+        op = rule.get("op")
+        if field == "base_amount":
+            return self.base_amount(op, rule.get("value"))
+        if not isinstance(field, str) or field not in FIELDS:
+            raise RuleError(f"Campo desconocido: {field!r}")
+        if not isinstance(op, str) or op not in OPERATORS:
+            raise RuleError(f"Operador desconocido: {op!r}")
+
+        template, cost = OPERATORS[op]
+        value = rule.get("value")
+        if op in ("eq_field", "ne_field"):
+            if not isinstance(value, str) or value not in FIELDS:
+                raise RuleError(f"Campo desconocido: {value!r}")
+            expr = template.format(field=f"f_{field}", other=f"f_{value}")
+            return expr, cost, frozenset((field, value))
+        if op in ("in", "not_in"):
+            if not isinstance(value, list):
+                raise RuleError(f"'{op}' requiere una lista, no {value!r}")
+            value = frozenset(_scalar(field, v) for v in value)
+        elif op == "regex":
+            if not isinstance(value, str):
+                raise RuleError(f"'regex' requiere una cadena, no {value!r}")
+            try:
+                value = re.compile(value)
+            except re.error as e:
+                raise RuleError(f"Expresión regular inválida {value!r}: {e}") from e
+        elif op == "known_account":
+            if field in NUMERIC_FIELDS:
+                raise RuleError(f"'known_account' no aplica al campo numérico {field}")
+            if self.accounts is None:
+                raise RuleError("'known_account' requiere un registro de cuentas (ACCOUNTS_SNAPSHOT)")
+            value = self.accounts
+        elif op in ("min_len", "max_len"):
+            if field in NUMERIC_FIELDS:
+                raise RuleError(f"'{op}' no aplica al campo numérico {field}")
+            if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                raise RuleError(f"'{op}' requiere un entero no negativo, no {value!r}")
+        else:
+            value = _scalar(field, value)
+        expr = template.format(field=f"f_{field}", value=self.constant(value))
+        return expr, cost, frozenset((field,))
+
+    def base_amount(self, op: Any, value: Any) -> Tuple[str, int, FrozenSet[str]]:
+        """Comparación del monto en moneda base contra un límite"""
+        if self.fx is None:
+            raise RuleError("'base_amount' requiere una tabla de tipos de cambio (FX_RATES_FILE)")
+        if op not in BASE_AMOUNT_OPERATORS:
+            raise RuleError(f"'base_amount' sólo admite {sorted(BASE_AMOUNT_OPERATORS)}, no {op!r}")
+        limit = _scalar("base_amount", value)
+        template, _ = OPERATORS[op]
+        fields = frozenset(("amount", "currency"))
+        if self.exact:
+            rates = self.constant(self.fx.rates)
+            expr = template.format(
+                field=f"_mul(_exact(f_amount), {rates}[f_currency])",
+                value=self.constant(exact_amount(limit)),
+            )
+            return f"f_currency in {rates} and {expr}", 5, fields
+        # La moneda ausente compara contra NaN: ninguna comparación se cumple
+        thresholds = self.constant(self.fx.thresholds(limit))
+        return template.format(field="f_amount", value=f"{thresholds}.get(f_currency, _nan)"), 2, fields
+
+
+class RulePlan:
+    """Plan compilado e inmutable de checks y advertencias"""
+
+    def __init__(self, version: str, check_names: Sequence[str], messages: Sequence[str],
+                 evaluate: Callable, evaluate_columns: Callable, source: str,
+                 max_amount: Optional[float] = None, currencies: Optional[Sequence[str]] = None,
+                 max_base_amount: Optional[float] = None, fx: Optional[FxTable] = None,
+                 exact: bool = False):
+        self.version = version
+        self.check_names = tuple(check_names)
+        self.messages = tuple(messages)
+        self._evaluate = evaluate
+        self._evaluate_columns = evaluate_columns
+        self.source = source
+        # Límites de entrada (None = sin límite)
+        self.max_amount = max_amount
+        self.currencies = None if currencies is None else tuple(currencies)
+        self.max_base_amount = max_base_amount
+        self.fx = fx
+        self.exact = exact
+        # Umbral de entrada por moneda, precomputado como los de las reglas
+        self._input_thresholds: Dict[str, float] = {}
+        if max_base_amount is not None and fx is not None and not exact:
+            self._input_thresholds = fx.thresholds(max_base_amount)
+
+    @property
+    def fx_version(self) -> Optional[str]:
+        return None if self.fx is None else self.fx.version
+
+    def exceeds_input_limit(self, amount: float, currency: str) -> bool:
+        """Si el monto supera max_amount o max_base_amount (moneda fuera de la tabla: no se juzga)"""
+        if self.max_amount is not None and amount > self.max_amount:
+            return True
+        if self.max_base_amount is None or currency not in self.fx.rates:
+            return False
+        if self.exact:
+            return self.fx.to_base(amount, currency) > exact_amount(self.max_base_amount)
+        return amount > self._input_thresholds[currency]
+
+    def __len__(self) -> int:
+        return len(self.check_names) + len(self.messages)
+
+    def evaluate(self, transaction) -> Tuple[Dict[str, bool], List[str]]:
+        """Evalúa todas las reglas sobre una transacción"""
+        return self._evaluate(transaction)
+
+    def evaluate_columns(self, transactions) -> Tuple[Dict[str, List[bool]], List[List[str]]]:
+        """Evalúa el lote regla por regla y retorna una columna por check"""
+        check_columns, flag_columns = self._evaluate_columns(transactions)
+        warnings: List[List[str]] = [[] for _ in transactions]
+        for message, flags in zip(self.messages, flag_columns):
+            for row, flag in enumerate(flags):
+                if flag:
+                    warnings[row].append(message)
+        return dict(zip(self.check_names, check_columns)), warnings
+
+
+def compile_rules(spec: Dict[str, Any], accounts: Optional[Container] = None,
+                  fx: Optional[FxTable] = None, exact: bool = False) -> RulePlan:
+    """
+    Compila la especificación de reglas a un RulePlan
+
+    fx es la tabla de tipos de cambio para base_amount; exact compara en
+    Decimal en lugar de float. Cualquier falla (incluida la evaluación de
+    prueba del plan) se reporta como RuleError, así un archivo inválido nunca
+    reemplaza al plan activo.
+    """
+    try:
+        plan = _compile_rules(spec, accounts, fx, exact)
+        plan.evaluate(SAMPLE_TRANSACTION)
+        plan.evaluate_columns([SAMPLE_TRANSACTION])
+    except RuleError:
+        raise
+    except Exception as e:
+        raise RuleError(f"Reglas inválidas: {type(e).__name__}: {e}") from e
+    return plan
+
+
+def _parse_input(spec: Any) -> Tuple[Optional[float], Optional[float], Optional[Tuple[str, ...]]]:
+    """Valida la sección "input" y retorna (max_amount, max_base_amount, currencies)"""
+    if spec is None:
+        return None, None, None
+    if not isinstance(spec, dict):
+        raise RuleError("'input' debe ser un objeto")
+    limits = []
+    for key in ("max_amount", "max_base_amount"):
+        limit = spec.get(key)
+        if limit is not None:
+            if not _is_number(limit) or limit <= 0:
+                raise RuleError(f"'{key}' requiere un número finito positivo, no {limit!r}")
+            limit = float(limit)
+        limits.append(limit)
+    currencies = spec.get("currencies")
+    if currencies is not None:
+        if not isinstance(currencies, list) or not currencies or not all(isinstance(c, str) for c in currencies):
+            raise RuleError("'currencies' requiere una lista no vacía de cadenas")
+        currencies = tuple(currencies)
+    return limits[0], limits[1], currencies
+
+
+def _compile_rules(spec: Dict[str, Any], accounts: Optional[Container],
+                   fx: Optional[FxTable], exact: bool) -> RulePlan:
+    if not isinstance(spec, dict):
+        raise RuleError("El archivo de reglas debe ser un objeto JSON")
+    checks = spec.get("checks") or []
+    warnings = spec.get("warnings") or []
+    if not isinstance(checks, list) or not isinstance(warnings, list):
+        raise RuleError("'checks' y 'warnings' deben ser listas")
+    if not checks:
+        raise RuleError("El archivo de reglas no define checks")
+    max_amount, max_base_amount, currencies = _parse_input(spec.get("input"))
+    if max_base_amount is not None and fx is None:
+        raise RuleError("'max_base_amount' requiere una tabla de tipos de cambio (FX_RATES_FILE)")
+    if fx is not None and currencies is not None:
+        missing = [currency for currency in currencies if currency not in fx.rates]
+        if missing:
+            raise RuleError(f"Monedas sin tipo de cambio en la tabla {fx.version}: {missing}")
+
+    compiler = _Compiler(accounts, fx, exact)
+    names = []
+    compiled = []
+    for rule in checks:
+        if not isinstance(rule, dict):
+            raise RuleError(f"Se esperaba un objeto de regla, no {rule!r}")
+        name = rule.get("name")
+        if not isinstance(name, str) or not name or name in names:
+            raise RuleError(f"Nombre de regla inválido o duplicado: {name!r}")
+        names.append(name)
+        compiled.append(compiler.condition(rule))
+
+    messages = []
+    warning_exprs = []
+    for rule in warnings:
+        if not isinstance(rule, dict):
+            raise RuleError(f"Se esperaba un objeto de regla, no {rule!r}")
+        if not isinstance(rule.get("message"), str):
+            raise RuleError(f"La advertencia {rule.get('name')!r} no define message")
+        messages.append(rule["message"])
+        warning_exprs.append(compiler.condition(rule))
+
+    used = sorted(frozenset().union(*(f for _, _, f in compiled), *(f for _, _, f in warning_exprs)))
+    order = sorted(range(len(compiled)), key=lambda i: compiled[i][1])
+
+    # Variante escalar: campos leídos una vez y reglas más baratas primero;
+    # la salida conserva el orden declarado
+    lines = ["def _evaluate(t):"]
+    for field in used:
+        lines.append(f"    f_{field} = {FIELDS[field]}")
+    for i in order:
+        lines.append(f"    r{i} = {compiled[i][0]}")
+    lines.append("    w = []")
+    for message, (expr, _, _) in zip(messages, warning_exprs):
+        lines.append(f"    if {expr}:")
+        lines.append(f"        w.append({message!r})")
+    check_map = ", ".join(f"{name!r}: r{i}" for i, name in enumerate(names))
+    lines.append(f"    return {{{check_map}}}, w")
+    check_tuple = "".join(f"r{i}, " for i in range(len(compiled)))
+
+    # Variante columnar: una columna por campo y una comprensión por regla
+    def column_expr(expr: str, fields: FrozenSet[str]) -> str:
+        names = sorted(fields)
+        targets = ", ".join(f"f_{name}" for name in names)
+        if len(names) == 1:
+            return f"[{expr} for {targets} in c_{names[0]}]"
+        sources = ", ".join(f"c_{name}" for name in names)
+        return f"[{expr} for {targets} in zip({sources})]"
+
+    lines.append("def _evaluate_columns(ts):")
+    for field in used:
+        lines.append(f"    c_{field} = [{FIELDS[field]} for t in ts]")
+    for i in order:
+        lines.append(f"    r{i} = {column_expr(compiled[i][0], compiled[i][2])}")
+    warning_columns = "".join(f"{column_expr(expr, fields)}, " for expr, _, fields in warning_exprs)
+    lines.append(f"    return ({check_tuple}), ({warning_columns})")
+    source = "\n".join(lines)
+
+    namespace = dict(compiler.constants)
+    namespace["__builtins__"] = {"len": len, "zip": zip}
+    namespace.update(_nan=math.nan, _exact=exact_amount, _mul=EXACT.multiply)
+    exec(compile(source, "<rules>", "exec"), namespace)
+
+    return RulePlan(
+        version=str(spec.get("version", "")),
+        check_names=names,
+        messages=messages,
+        evaluate=namespace["_evaluate"],
+        evaluate_columns=namespace["_evaluate_columns"],
+        source=source,
+        max_amount=max_amount,
+        currencies=currencies,
+        max_base_amount=max_base_amount,
+        fx=fx,
+        exact=exact,
+    )
+
+
+def load_rules(path: str, accounts: Optional[Container] = None,
+               fx_path: Optional[str] = None, exact: bool = False) -> RulePlan:
+    """Carga y compila un archivo de reglas (y la tabla de tipos de cambio, si se indica)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+    except (OSError, ValueError) as e:
+        raise RuleError(f"No se pudo leer {path}: {e}") from e
+    try:
+        fx = load_fx_table(fx_path) if fx_path else None
+    except FxError as e:
+        raise RuleError(str(e)) from e
+    return compile_rules(spec, accounts, fx, exact)
+
+
+class RuleEngine:
+    """Mantiene el plan activo y lo reemplaza atómicamente al recargar"""
+
+    def __init__(self, path: str, accounts: Optional[Container] = None,
+                 fx_path: Optional[str] = None, exact: bool = False):
+        self.path = path
+        self.accounts = accounts
+        self.fx_path = fx_path
+        self.exact = exact
+        self._lock = threading.Lock()
+        self.plan = load_rules(path, accounts, fx_path, exact)
+
+    def reload(self) -> RulePlan:
+        """Recompila reglas y tipos de cambio; si alguno es inválido se conserva el plan actual"""
+        with self._lock:
+            plan = load_rules(self.path, self.accounts, self.fx_path, self.exact)
+            self.plan = plan
+            return plan
+
+    def evaluate(self, transaction) -> Tuple[Dict[str, bool], List[str]]:
+        return self.plan.evaluate(transaction)
@@ -0,0 +1,198 @@
+"""
+Servidor multiproceso (pre-fork) del validador
+
+Uso: python -m src.server
+
+El proceso maestro configura el registro multiproceso de Prometheus, importa
+la aplicación (FastAPI, Pydantic, el SDK de OpenTelemetry y el plan de reglas)
+una sola vez, abre el socket y después hace fork de los workers: cada worker hereda el
+código ya importado y sólo arranca su event loop. /metrics agrega los
+archivos mmap de todos los workers, así que cualquier worker responde el
+scrape con los totales del contenedor.
+
+SIGUSR1 al maestro se reenvía a todos los workers, que drenan (ver
+src/lifecycle.py); SIGTERM detiene los workers, cada uno espera a sus
+requests en vuelo hasta DRAIN_TIMEOUT_SECONDS y drena antes de salir.
+
+Con BINARY_LISTEN el maestro abre también el socket del protocolo binario
+(src/binary_protocol.py) y cada worker lo atiende junto con HTTP.
+
+Variables: WEB_CONCURRENCY (workers; por defecto los CPUs disponibles),
+HOST, PORT, BINARY_LISTEN, PROMETHEUS_MULTIPROC_DIR y DRAIN_TIMEOUT_SECONDS.
+"""
+import math
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+
+
+def available_cpus(cgroup_cpu_max: str = CGROUP_CPU_MAX) -> int:
+    """CPUs utilizables: afinidad del proceso acotada por la cuota del cgroup"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open(cgroup_cpu_max) as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_count() -> int:
+    value = os.getenv("WEB_CONCURRENCY")
+    return int(value) if value else available_cpus()
+
+
+def prepare_multiprocess_dir() -> str:
+    """Define y limpia PROMETHEUS_MULTIPROC_DIR; debe ocurrir antes de importar prometheus_client"""
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        path = tempfile.mkdtemp(prefix="prometheus-multiproc-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    os.makedirs(path, exist_ok=True)
+    # Archivos de una ejecución anterior inflarían los contadores
+    for name in os.listdir(path):
+        entry = os.path.join(path, name)
+        if os.path.isdir(entry):
+            shutil.rmtree(entry)
+        else:
+            os.remove(entry)
+    return path
+
+
+def server_options() -> dict:
+    """Opciones comunes de uvicorn; el cierre espera a las requests en vuelo hasta el deadline de drenado"""
+    return {
+        "log_level": os.getenv("LOG_LEVEL", "info").lower(),
+        "timeout_graceful_shutdown": int(math.ceil(float(os.getenv("DRAIN_TIMEOUT_SECONDS", "30")))),
+    }
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    # Con proto IPPROTO_TCP asyncio desactiva Nagle en las conexiones aceptadas;
+    # con proto 0 no lo hace y cada respuesta keep-alive (cabeceras y body en
+    # dos escrituras) espera el ACK retrasado del cliente (~40 ms)
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+    """Maestro que mantiene N workers uvicorn sobre un socket compartido"""
+
+    def __init__(self, app, sock: socket.socket, workers: int):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.children: Dict[int, int] = {}
+        self.stopping = False
+
+    def _spawn(self, slot: int):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = slot
+            return
+        # Worker: restaurar señales del maestro y servir hasta SIGTERM
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        # Hasta que el event loop instale el drenado, SIGUSR1 no debe terminar el worker
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+        import uvicorn
+
+        config = uvicorn.Config(self.app, **server_options())
+        code = 0
+        try:
+            uvicorn.Server(config).run(sockets=[self.sock])
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _signal_children(self, signum: int):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+        self._signal_children(signal.SIGTERM)
+
+    def _drain(self, signum, frame):
+        self._signal_children(signal.SIGUSR1)
+
+    def run(self):
+        from prometheus_client import multiprocess
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGUSR1, self._drain)
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            slot = self.children.pop(pid, None)
+            # Quita sus gauges "live*" del agregado
+            multiprocess.mark_process_dead(pid)
+            if slot is not None and not self.stopping:
+                time.sleep(0.1)
+                self._spawn(slot)
+        self.sock.close()
+
+
+def main(argv: Optional[list] = None) -> int:
+    workers = worker_count()
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "8000"))
+
+    # También con un worker: si PROMETHEUS_MULTIPROC_DIR está definido (la
+    # imagen lo define) el directorio debe existir antes de importar la app
+    prepare_multiprocess_dir()
+    if workers <= 1:
+        import uvicorn
+
+        from src.main import app
+        uvicorn.run(app, host=host, port=port, **server_options())
+        return 0
+
+    # El endpoint de drenado de un worker avisa al maestro para drenarlos a todos
+    os.environ["PREFORK_MASTER_PID"] = str(os.getpid())
+    # Imports pesados antes del fork: los workers los heredan ya resueltos
+    import uvicorn  # noqa: F401
+
+    from src.main import app, binary_server, telemetry
+    # El SDK de trazas se importa aquí; cada worker sólo lo configura al arrancar
+    telemetry.preload()
+    if binary_server is not None:
+        # Como el socket HTTP: los workers aceptan conexiones del mismo socket
+        binary_server.bind()
+
+    PreforkServer(app, bind_socket(host, port), workers).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
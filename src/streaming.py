@@ -0,0 +1,114 @@
+"""
+Utilidades de streaming NDJSON
+
+Lectura incremental de líneas y procesamiento con una ventana acotada de
+trabajo en vuelo. El productor sólo lee más entrada cuando el consumidor pide
+el siguiente resultado, así que un consumidor lento aplica backpressure y la
+memoria no crece con el tamaño del archivo.
+"""
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Iterable, TypeVar, Union
+
+from starlette.responses import StreamingResponse
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class LineTooLong(ValueError):
+    """Una línea excede el tamaño máximo permitido"""
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que permite leer el body mientras se responde
+
+    StreamingResponse escucha la desconexión consumiendo receive(), lo que
+    compite con la lectura del body de la request. Aquí la desconexión se
+    detecta al leer el body (ClientDisconnect) y se cancela el generador.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes],
+    max_line_bytes: int = 65536,
+) -> AsyncIterator[Union[bytes, LineTooLong]]:
+    """
+    Divide un flujo de bytes en líneas sin acumular el flujo completo
+
+    Las líneas vacías se omiten. Una línea que excede max_line_bytes se
+    descarta y se entrega como LineTooLong para reportarla como error.
+    """
+    buffer = bytearray()
+    discarding = False
+
+    async for chunk in chunks:
+        start = 0
+        while True:
+            newline = chunk.find(b"\n", start)
+            if newline == -1:
+                if not discarding:
+                    buffer += chunk[start:]
+                    if len(buffer) > max_line_bytes:
+                        buffer.clear()
+                        discarding = True
+                break
+
+            if discarding:
+                discarding = False
+                yield LineTooLong(f"La línea excede {max_line_bytes} bytes")
+            else:
+                buffer += chunk[start:newline]
+                if len(buffer) > max_line_bytes:
+                    yield LineTooLong(f"La línea excede {max_line_bytes} bytes")
+                elif buffer.strip():
+                    yield bytes(buffer)
+                buffer.clear()
+            start = newline + 1
+
+    if discarding:
+        yield LineTooLong(f"La línea excede {max_line_bytes} bytes")
+    elif buffer.strip():
+        yield bytes(buffer)
+
+
+async def iter_file_chunks(chunks: Iterable[bytes]) -> AsyncIterator[bytes]:
+    """Adapta un iterable síncrono de bloques (p. ej. lecturas de archivo) a un flujo asíncrono"""
+    for chunk in chunks:
+        yield chunk
+        # Ceder el event loop para que avancen las validaciones en vuelo
+        await asyncio.sleep(0)
+
+
+async def process_ordered(
+    items: AsyncIterator[T],
+    worker: Callable[[int, T], Awaitable[R]],
+    max_in_flight: int = 64,
+) -> AsyncIterator[R]:
+    """
+    Procesa elementos concurrentemente y entrega los resultados en orden
+
+    Como máximo max_in_flight elementos se procesan a la vez; no se lee
+    el siguiente elemento hasta que el consumidor recibe el más antiguo.
+    """
+    window: deque = deque()
+    try:
+        index = 0
+        async for item in items:
+            window.append(asyncio.ensure_future(worker(index, item)))
+            index += 1
+            if len(window) >= max_in_flight:
+                yield await window.popleft()
+        while window:
+            yield await window.popleft()
+    finally:
+        # Consumidor desconectado: cancelar el trabajo pendiente
+        for task in window:
+            task.cancel()
+
@@ -0,0 +1,250 @@
+"""
+Logging estructurado asíncrono
+
+Los registros se encolan en una cola acotada desde el event loop y un hilo en
+segundo plano los serializa a JSON (formato que consume Logstash) y los
+escribe por lotes. Los logs de éxito (< WARNING) se pueden muestrear; los de
+WARNING en adelante siempre se conservan salvo que la cola esté llena, en cuyo
+caso se descartan y se cuentan en lugar de bloquear la request.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from opentelemetry import trace
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s - [trace_id=%(otelTraceID)s span_id=%(otelSpanID)s]'
+
+EMPTY_TRACE_ID = "0" * 32
+EMPTY_SPAN_ID = "0" * 16
+
+# Espera máxima de flush(); logging.shutdown() lo llama sin argumentos
+FLUSH_TIMEOUT = 5.0
+
+# Atributos estándar de LogRecord; el resto se considera "extra"
+_RESERVED = frozenset(logging.LogRecord(None, 0, "", 0, "", (), None).__dict__) | {
+    "message", "asctime", "otelTraceID", "otelSpanID", "_otel_context",
+}
+
+_STOP = object()
+
+
+def _noop(*args):
+    pass
+
+
+def _attach_trace_ids(record: logging.LogRecord):
+    """Formatea los IDs de traza capturados al emitir (en el hilo de escritura)"""
+    if hasattr(record, "otelTraceID"):
+        return
+    context = getattr(record, "_otel_context", None)
+    if context is None:
+        record.otelTraceID = EMPTY_TRACE_ID
+        record.otelSpanID = EMPTY_SPAN_ID
+    else:
+        record.otelTraceID = trace.format_trace_id(context[0])
+        record.otelSpanID = trace.format_span_id(context[1])
+
+
+class JsonFormatter(logging.Formatter):
+    """Serializa un registro como una línea JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        _attach_trace_ids(record)
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "levelname": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "otelTraceID": record.otelTraceID,
+            "otelSpanID": record.otelSpanID,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato de texto original, con IDs de traza siempre presentes"""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        _attach_trace_ids(record)
+        return super().format(record)
+
+
+class AsyncBatchHandler(logging.Handler):
+    """Handler que encola registros y los escribe por lotes en otro hilo"""
+
+    def __init__(
+        self,
+        stream=None,
+        queue_size: int = 10000,
+        batch_size: int = 256,
+        sample_rate: float = 1.0,
+        on_drop: Callable[[str], None] = _noop,
+        on_written: Callable[[int], None] = _noop,
+    ):
+        super().__init__()
+        # None: sys.stderr resuelto al escribir (puede reemplazarse en runtime)
+        self.stream = stream
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.sample_rate = sample_rate
+        self.on_drop = on_drop
+        # Recibe la profundidad de la cola después de escribir cada lote
+        self.on_written = on_written
+        # Generador propio: el muestreo no altera la secuencia de random
+        self._sampler = random.Random()
+        # Serializa escrituras del hilo y las síncronas posteriores a close()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._start_writer()
+        atexit.register(self.close)
+        # Tras un fork (servidor pre-fork) el hijo necesita su propio hilo
+        ref = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: ref() and ref()._after_fork())
+
+    def _start_writer(self):
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def _after_fork(self):
+        if self._closed:
+            return
+        # Cola y lock pueden haber quedado tomados por el hilo del padre
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self._write_lock = threading.Lock()
+        self._start_writer()
+
+    def emit(self, record: logging.LogRecord):
+        if record.levelno < logging.WARNING:
+            rate = self.sample_rate
+            if rate < 1.0 and (rate <= 0.0 or self._sampler.random() >= rate):
+                self.on_drop("sampled")
+                return
+
+        # Sólo se capturan los enteros; el formateo ocurre en el hilo de escritura
+        if not hasattr(record, "otelTraceID"):
+            context = trace.get_current_span().get_span_context()
+            record._otel_context = (context.trace_id, context.span_id) if context.is_valid else None
+        if record.exc_info:
+            # El traceback debe capturarse antes de que cambie el estado del hilo
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        if self._closed:
+            # Sin hilo de escritura (p. ej. logs del apagado): escritura directa
+            self._write([record])
+            return
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.on_drop("queue_full")
+
+    def _write(self, batch: List[logging.LogRecord]):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+        if lines:
+            try:
+                stream = self.stream or sys.stderr
+                with self._write_lock:
+                    stream.write("\n".join(lines) + "\n")
+                    stream.flush()
+            except Exception:
+                self.handleError(batch[-1])
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            if record is _STOP:
+                self.queue.task_done()
+                return
+            batch = [record]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stop = True
+                    break
+                batch.append(record)
+            self._write(batch)
+            for _ in range(len(batch) + stop):
+                self.queue.task_done()
+            self.on_written(self.queue.qsize())
+            if stop:
+                return
+
+    def flush(self, timeout: Optional[float] = FLUSH_TIMEOUT) -> bool:
+        """Espera a que la cola se vacíe; retorna False si vence el timeout"""
+        if not self._thread.is_alive():
+            return not self.queue.unfinished_tasks
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self):
+        # Lo emitido desde aquí se escribe directo; lo ya encolado se drena
+        self._closed = True
+        if self._thread.is_alive():
+            self.flush()
+            try:
+                self.queue.put(_STOP, timeout=1.0)
+            except queue.Full:
+                pass
+            self._thread.join(timeout=1.0)
+        super().close()
+
+
+def configure_logging(
+    level: str = "INFO",
+    log_format: str = "json",
+    sample_rate: float = 1.0,
+    queue_size: int = 10000,
+    batch_size: int = 256,
+    stream=None,
+) -> AsyncBatchHandler:
+    """Reemplaza los handlers del logger raíz por el handler asíncrono"""
+    handler = AsyncBatchHandler(
+        stream=stream,
+        queue_size=queue_size,
+        batch_size=batch_size,
+        sample_rate=sample_rate,
+    )
+    handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    return handler
@@ -0,0 +1,252 @@
+"""
+Telemetría diferida y reporte de arranque
+
+Importar la aplicación no construye el TracerProvider ni el exportador, ni
+importa el SDK de OpenTelemetry: Telemetry.configure() lo hace una sola vez al
+arrancar el servidor (lifespan) o, si no hubo lifespan, con el primer
+request. Con TRACE_EXPORTER=none nunca se importa el SDK; los tests, el CLI
+y cada contenedor nuevo no pagan por un exportador que no usan, y un Jaeger
+inalcanzable ya no llena el log de tracebacks (ver GuardedSpanExporter).
+
+LazyTracingMiddleware ocupa el lugar del middleware de FastAPIInstrumentor y
+envuelve la app con el OpenTelemetryMiddleware ASGI cuando las trazas quedan
+configuradas. El nombre del span sale de la ruta de Starlette, igual que con
+el instrumentador, sin importar opentelemetry.instrumentation.fastapi (que
+arrastra pkg_resources).
+
+StartupReport registra el costo en milisegundos de importar e inicializar
+cada componente, para ver en qué se va el tiempo hasta estar listo.
+"""
+import importlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional
+
+from opentelemetry import trace
+from starlette.routing import Match
+
+TRACE_EXPORTERS = ("jaeger", "console", "none")
+
+
+def _noop(*args):
+    pass
+
+
+def process_uptime() -> Optional[float]:
+    """Segundos desde que arrancó el proceso (None si /proc no está disponible)"""
+    try:
+        with open("/proc/self/stat") as f:
+            stat = f.read()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        # El nombre del comando puede tener espacios: los campos siguen al último ")"
+        started = int(stat.rsplit(")", 1)[1].split()[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(0.0, uptime - started)
+
+
+class StartupReport:
+    """Costo de importación e inicialización por componente (ms)"""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self._clock = clock
+        self.components: Dict[str, float] = {}
+        self.ready_after: Optional[float] = None
+
+    def record(self, component: str, seconds: Optional[float]):
+        if seconds is not None:
+            self.components[component] = round(seconds * 1000, 3)
+
+    @contextmanager
+    def measure(self, component: str):
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.record(component, self._clock() - start)
+
+    def import_modules(self, *names: str):
+        """Importa y mide módulos; los imports posteriores los encuentran ya cargados"""
+        for name in names:
+            with self.measure(f"import.{name}"):
+                importlib.import_module(name)
+
+    def mark_ready(self):
+        self.ready_after = process_uptime()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "components_ms": dict(self.components),
+            "total_ms": round(sum(self.components.values()), 3),
+            "ready_after_ms": None if self.ready_after is None else round(self.ready_after * 1000, 3),
+        }
+
+
+def route_span_details(scope):
+    """Nombre y atributos del span a partir de la ruta de Starlette que atiende el request"""
+    route = None
+    for candidate in scope["app"].routes:
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            route = candidate.path
+            break
+        if match == Match.PARTIAL:
+            route = candidate.path
+    method = scope.get("method", "")
+    if not route:
+        return method, {}
+    return (f"{method} {route}" if method else route), {"http.route": route}
+
+
+class Telemetry:
+    """
+    Configuración de trazas que se construye la primera vez que se necesita
+
+    exporter es "jaeger", "console" o "none"; jaeger_options son los
+    argumentos de JaegerExporter (p. ej. agent_host_name). Con tail_sampling
+    (argumentos de TailSamplingProcessor) sólo se exportan las trazas que el
+    muestreo por cola conserva; on_decision recibe cada decisión y
+    on_export_error las fallas de exportación (con límite de frecuencia).
+    """
+
+    def __init__(
+        self,
+        exporter: str = "jaeger",
+        resource_attributes: Optional[Dict[str, Any]] = None,
+        jaeger_options: Optional[Dict[str, Any]] = None,
+        tail_sampling: Optional[Dict[str, Any]] = None,
+        excluded_urls: str = "",
+        report: Optional[StartupReport] = None,
+        on_decision: Callable[[bool, str], None] = _noop,
+        on_export_error: Callable[[Exception], None] = _noop,
+    ):
+        if exporter not in TRACE_EXPORTERS:
+            raise ValueError(f"Exportador de trazas desconocido: {exporter!r} (use {TRACE_EXPORTERS})")
+        self.exporter = exporter
+        self.resource_attributes = resource_attributes or {}
+        self.jaeger_options = jaeger_options or {}
+        self.tail_sampling = tail_sampling
+        self.excluded_urls = excluded_urls
+        self.report = report or StartupReport()
+        self.on_decision = on_decision
+        self.on_export_error = on_export_error
+        self.provider = None
+        self.processor = None
+        self.enabled = False
+        self._configured = False
+        self._modules: Optional[SimpleNamespace] = None
+        self._lock = threading.Lock()
+
+    def preload(self):
+        """Importa los módulos de trazas sin configurarlas (el maestro pre-fork los comparte)"""
+        if self.exporter != "none":
+            self._load()
+
+    def _load(self) -> SimpleNamespace:
+        if self._modules is not None:
+            return self._modules
+        with self.report.measure("import.opentelemetry_sdk"):
+            from opentelemetry.instrumentation.asgi import OpenTelemetryMiddleware
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+            from opentelemetry.util.http import parse_excluded_urls
+
+            from src.tracing import GuardedSpanExporter, TailSamplingProcessor, high_risk
+        modules = SimpleNamespace(
+            OpenTelemetryMiddleware=OpenTelemetryMiddleware,
+            Resource=Resource,
+            TracerProvider=TracerProvider,
+            BatchSpanProcessor=BatchSpanProcessor,
+            ConsoleSpanExporter=ConsoleSpanExporter,
+            parse_excluded_urls=parse_excluded_urls,
+            GuardedSpanExporter=GuardedSpanExporter,
+            TailSamplingProcessor=TailSamplingProcessor,
+            high_risk=high_risk,
+            JaegerExporter=None,
+        )
+        if self.exporter == "jaeger":
+            with self.report.measure("import.jaeger_exporter"):
+                from opentelemetry.exporter.jaeger.thrift import JaegerExporter
+            modules.JaegerExporter = JaegerExporter
+        self._modules = modules
+        return modules
+
+    def configure(self) -> bool:
+        """Configura las trazas una sola vez; retorna si quedaron habilitadas"""
+        with self._lock:
+            if self._configured:
+                return self.enabled
+            self._configured = True
+            if self.exporter == "none":
+                return False
+
+            m = self._load()
+            with self.report.measure("init.tracing"):
+                if self.exporter == "jaeger":
+                    exporter = m.JaegerExporter(**self.jaeger_options)
+                else:
+                    exporter = m.ConsoleSpanExporter()
+                processor = m.BatchSpanProcessor(
+                    m.GuardedSpanExporter(exporter, on_error=self.on_export_error)
+                )
+                if self.tail_sampling is not None:
+                    processor = m.TailSamplingProcessor(
+                        processor,
+                        is_interesting=m.high_risk,
+                        on_decision=self.on_decision,
+                        **self.tail_sampling,
+                    )
+                provider = m.TracerProvider(resource=m.Resource(attributes=self.resource_attributes))
+                provider.add_span_processor(processor)
+                trace.set_tracer_provider(provider)
+            self.provider = provider
+            self.processor = processor
+            self.enabled = True
+            return True
+
+    def middleware(self, app):
+        """Envuelve una app ASGI con el middleware de trazas de OpenTelemetry"""
+        m = self._load()
+        return m.OpenTelemetryMiddleware(
+            app,
+            excluded_urls=m.parse_excluded_urls(self.excluded_urls),
+            default_span_details=route_span_details,
+        )
+
+    def force_flush(self, timeout: float = 5.0) -> bool:
+        """Exporta los spans pendientes sin detener el procesador"""
+        if self.provider is None:
+            return True
+        return self.provider.force_flush(int(timeout * 1000))
+
+    def shutdown(self):
+        """Exporta los spans pendientes y detiene el procesador"""
+        if self.provider is not None:
+            self.provider.shutdown()
+
+
+class LazyTracingMiddleware:
+    """
+    Middleware ASGI que agrega las trazas cuando la telemetría se configura
+
+    Mientras las trazas estén deshabilitadas los requests pasan directo a la
+    app, sin crear spans.
+    """
+
+    def __init__(self, app, telemetry: Telemetry):
+        self.app = app
+        self.telemetry = telemetry
+        self._handler = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.app(scope, receive, send)
+            return
+        if self._handler is None:
+            self._handler = self.telemetry.middleware(self.app) if self.telemetry.configure() else self.app
+        await self._handler(scope, receive, send)
@@ -0,0 +1,194 @@
+"""
+Muestreo de trazas por cola (tail-based) con presupuesto de trazas/segundo
+
+Los spans terminados se retienen por traza en un buffer acotado. Cuando
+termina el span raíz local se decide la traza completa: se conservan siempre
+las que tienen errores, las lentas y las que cumplen un predicado de interés
+(p. ej. riesgo alto); el resto compite por un token bucket de N trazas por
+segundo. Sólo los spans conservados llegan al procesador de exportación.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.trace import StatusCode
+
+# Motivos de conservación/descarte (etiqueta de métricas)
+KEEP_ERROR = "error"
+KEEP_SLOW = "slow"
+KEEP_INTERESTING = "interesting"
+KEEP_RATE = "rate"
+DROP_RATE = "rate_limited"
+DROP_OVERFLOW = "overflow"
+
+
+def _noop(*args):
+    pass
+
+
+class TokenBucket:
+    """Token bucket que permite `rate` eventos por segundo (ráfaga de `burst`)"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        if burst is None:
+            # Con rate 0 sólo pasan las trazas que se conservan siempre
+            burst = max(1.0, rate) if rate > 0 else 0.0
+        self.burst = burst
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def allow(self) -> bool:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+
+class TailSamplingProcessor(SpanProcessor):
+    """
+    Decide qué trazas exportar cuando termina su span raíz local
+
+    delegate es el procesador real (p. ej. BatchSpanProcessor). on_decision
+    recibe (kept, reason) una vez por traza decidida.
+    """
+
+    def __init__(
+        self,
+        delegate: SpanProcessor,
+        traces_per_second: float = 10.0,
+        slow_threshold: float = 0.5,
+        max_traces: int = 2048,
+        max_spans_per_trace: int = 64,
+        is_interesting: Callable[[ReadableSpan], bool] = lambda span: False,
+        on_decision: Callable[[bool, str], None] = _noop,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.delegate = delegate
+        self.slow_threshold_ns = int(slow_threshold * 1e9)
+        self.max_traces = max_traces
+        self.max_spans_per_trace = max_spans_per_trace
+        self._is_interesting = is_interesting
+        self.on_decision = on_decision
+        self._bucket = TokenBucket(traces_per_second, clock=clock)
+        self._lock = threading.Lock()
+        # trace_id -> spans terminados pendientes de decisión
+        self._pending: "OrderedDict[int, List[ReadableSpan]]" = OrderedDict()
+        # Decisiones recientes para spans que terminan después de la raíz
+        self._decided: "OrderedDict[int, bool]" = OrderedDict()
+
+    def on_start(self, span: Span, parent_context: Optional[Context] = None) -> None:
+        self.delegate.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        trace_id = span.context.trace_id
+        export: List[ReadableSpan] = []
+        with self._lock:
+            decided = self._decided.get(trace_id)
+            if decided is not None:
+                if decided:
+                    export.append(span)
+            elif span.parent is None or span.parent.is_remote:
+                spans = self._pending.pop(trace_id, [])
+                spans.append(span)
+                kept, reason = self._decide(span, spans)
+                self._remember(trace_id, kept)
+                if kept:
+                    export = spans
+                self.on_decision(kept, reason)
+            else:
+                spans = self._pending.get(trace_id)
+                if spans is None:
+                    spans = self._pending[trace_id] = []
+                    if len(self._pending) > self.max_traces:
+                        # Buffer lleno: se descarta la traza pendiente más antigua
+                        evicted, _ = self._pending.popitem(last=False)
+                        self._remember(evicted, False)
+                        self.on_decision(False, DROP_OVERFLOW)
+                if len(spans) < self.max_spans_per_trace:
+                    spans.append(span)
+        for kept_span in export:
+            self.delegate.on_end(kept_span)
+
+    def _decide(self, root: ReadableSpan, spans: List[ReadableSpan]):
+        if any(s.status.status_code is StatusCode.ERROR for s in spans):
+            return True, KEEP_ERROR
+        if root.end_time - root.start_time >= self.slow_threshold_ns:
+            return True, KEEP_SLOW
+        if any(self._is_interesting(s) for s in spans):
+            return True, KEEP_INTERESTING
+        if self._bucket.allow():
+            return True, KEEP_RATE
+        return False, DROP_RATE
+
+    def _remember(self, trace_id: int, kept: bool):
+        self._decided[trace_id] = kept
+        if len(self._decided) > self.max_traces:
+            self._decided.popitem(last=False)
+
+    def pending_traces(self) -> int:
+        return len(self._pending)
+
+    def shutdown(self) -> None:
+        self.delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.delegate.force_flush(timeout_millis)
+
+
+class GuardedSpanExporter(SpanExporter):
+    """
+    Exportador que no deja escapar errores del backend de trazas
+
+    Con Jaeger inalcanzable cada lote lanza una excepción y el SDK registra un
+    traceback por lote; aquí el lote se descarta y on_error recibe la falla a
+    lo sumo una vez cada error_interval segundos.
+    """
+
+    def __init__(
+        self,
+        delegate: SpanExporter,
+        on_error: Callable[[Exception], None] = _noop,
+        error_interval: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.delegate = delegate
+        self.on_error = on_error
+        self.error_interval = error_interval
+        self._clock = clock
+        self._last_error: Optional[float] = None
+        self.failures = 0
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        try:
+            return self.delegate.export(spans)
+        except Exception as e:
+            self.failures += 1
+            now = self._clock()
+            if self._last_error is None or now - self._last_error >= self.error_interval:
+                self._last_error = now
+                self.on_error(e)
+            return SpanExportResult.FAILURE
+
+    def shutdown(self) -> None:
+        try:
+            self.delegate.shutdown()
+        except Exception as e:
+            self.on_error(e)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.delegate.force_flush(timeout_millis)
+
+
+def high_risk(span: ReadableSpan) -> bool:
+    """Predicado de interés: resultados de validación con riesgo alto"""
+    attributes: Dict = span.attributes or {}
+    return attributes.get("validation.risk_level") == "high"
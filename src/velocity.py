@@ -0,0 +1,175 @@
+"""
+Índice de velocidad por cuenta para detección de fraude
+
+Ventana deslizante dividida en buckets de tiempo. Cada cuenta guarda sólo dos
+arreglos compactos (conteo y monto por bucket) más los totales de la ventana,
+así que registrar y consultar una transacción es O(1) amortizado. Las cuentas
+inactivas y los pares emisor/receptor viejos se expulsan automáticamente para
+que la memoria quede acotada aun con millones de cuentas.
+
+El índice vive en la memoria de cada proceso: con el servidor pre-fork
+(src/server.py) cada worker cuenta sólo las transacciones que atendió, así
+que los umbrales de VelocityRules se aplican por worker y en el contenedor
+equivalen, en el peor caso, a WEB_CONCURRENCY veces el umbral configurado.
+"""
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+class AccountWindow:
+    """Estado compacto de una cuenta dentro de la ventana"""
+    __slots__ = ("epoch", "counts", "amounts", "total_count", "total_amount")
+
+    def __init__(self, buckets: int, epoch: int):
+        self.epoch = epoch
+        self.counts = array("I", bytes(4 * buckets))
+        self.amounts = array("d", bytes(8 * buckets))
+        self.total_count = 0
+        self.total_amount = 0.0
+
+    def advance(self, epoch: int):
+        """Expira los buckets que salieron de la ventana"""
+        buckets = len(self.counts)
+        elapsed = epoch - self.epoch
+        if elapsed <= 0:
+            return
+        if elapsed >= buckets:
+            for i in range(buckets):
+                self.counts[i] = 0
+                self.amounts[i] = 0.0
+            self.total_count = 0
+            self.total_amount = 0.0
+        else:
+            for step in range(1, elapsed + 1):
+                slot = (self.epoch + step) % buckets
+                self.total_count -= self.counts[slot]
+                self.total_amount -= self.amounts[slot]
+                self.counts[slot] = 0
+                self.amounts[slot] = 0.0
+        self.epoch = epoch
+
+    def add(self, amount: float):
+        slot = self.epoch % len(self.counts)
+        self.counts[slot] += 1
+        self.amounts[slot] += amount
+        self.total_count += 1
+        self.total_amount += amount
+
+
+@dataclass(frozen=True)
+class VelocitySnapshot:
+    """Actividad de la ventana incluyendo la transacción actual"""
+    sender_count: int
+    sender_amount: float
+    receiver_count: int
+    new_pair: bool
+
+
+class VelocityIndex:
+    """Índice de ventana deslizante por cuenta emisora y receptora"""
+
+    def __init__(
+        self,
+        window_seconds: float = 60.0,
+        buckets: int = 12,
+        max_accounts: int = 1000000,
+        pair_ttl_seconds: float = 86400.0,
+        max_pairs: int = 1000000,
+    ):
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.bucket_seconds = window_seconds / buckets
+        self.max_accounts = max_accounts
+        self.pair_ttl_seconds = pair_ttl_seconds
+        self.max_pairs = max_pairs
+        self._senders: "OrderedDict[str, AccountWindow]" = OrderedDict()
+        self._receivers: "OrderedDict[str, AccountWindow]" = OrderedDict()
+        # Llave (emisor, receptor) completa: un hash de la tupla podría hacer
+        # que dos pares distintos compartan historial
+        self._pairs: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._senders) + len(self._receivers)
+
+    def _touch(self, accounts: "OrderedDict[str, AccountWindow]", account: str, epoch: int, amount: float) -> AccountWindow:
+        state = accounts.get(account)
+        if state is None:
+            state = AccountWindow(self.buckets, epoch)
+            accounts[account] = state
+        else:
+            state.advance(epoch)
+            accounts.move_to_end(account)
+        state.add(amount)
+
+        # Las cuentas menos recientes están al inicio: expulsar las que ya
+        # salieron de la ventana y respetar el tope de cuentas
+        while accounts:
+            oldest_account, oldest = next(iter(accounts.items()))
+            if epoch - oldest.epoch < self.buckets and len(accounts) <= self.max_accounts:
+                break
+            del accounts[oldest_account]
+        return state
+
+    def _seen_pair(self, sender: str, receiver: str, now: float) -> bool:
+        key = (sender, receiver)
+        last_seen = self._pairs.pop(key, None)
+        self._pairs[key] = now
+
+        while self._pairs:
+            oldest_key, oldest_seen = next(iter(self._pairs.items()))
+            if now - oldest_seen < self.pair_ttl_seconds and len(self._pairs) <= self.max_pairs:
+                break
+            del self._pairs[oldest_key]
+
+        return last_seen is not None and now - last_seen < self.pair_ttl_seconds
+
+    def record(self, sender: str, receiver: str, amount: float, now: Optional[float] = None) -> VelocitySnapshot:
+        """Registra una transacción y retorna la actividad de la ventana"""
+        if now is None:
+            now = time.time()
+        epoch = int(now // self.bucket_seconds)
+
+        sender_state = self._touch(self._senders, sender, epoch, amount)
+        receiver_state = self._touch(self._receivers, receiver, epoch, amount)
+
+        return VelocitySnapshot(
+            sender_count=sender_state.total_count,
+            sender_amount=sender_state.total_amount,
+            receiver_count=receiver_state.total_count,
+            new_pair=not self._seen_pair(sender, receiver, now),
+        )
+
+
+@dataclass(frozen=True)
+class VelocityRules:
+    """Umbrales de las reglas de velocidad"""
+    max_sender_count: int = 10
+    max_sender_amount: float = 2000000.0
+    max_receiver_count: int = 50
+    new_pair_amount: float = 500000.0
+
+
+def velocity_risk(snapshot: VelocitySnapshot, amount: float, rules: VelocityRules):
+    """Calcula el riesgo [0, 1] y las advertencias de las reglas de velocidad"""
+    risk = 0.0
+    warnings = []
+    if snapshot.sender_count > rules.max_sender_count:
+        risk += 0.5
+        warnings.append(
+            f"Velocidad inusual: {snapshot.sender_count} transferencias del emisor en la ventana"
+        )
+    if snapshot.sender_amount > rules.max_sender_amount:
+        risk += 0.5
+        warnings.append("Monto acumulado del emisor excede el límite de la ventana")
+    if snapshot.receiver_count > rules.max_receiver_count:
+        risk += 0.3
+        warnings.append(
+            f"Velocidad inusual: {snapshot.receiver_count} transferencias al receptor en la ventana"
+        )
+    if snapshot.new_pair and amount > rules.new_pair_amount:
+        risk += 0.3
+        warnings.append("Monto alto hacia un receptor nuevo para el emisor")
+    return min(risk, 1.0), warnings
@@ -8,6 +8,13 @@ import os
 # Agregar el directorio src al path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# Sin exportador de trazas: los tests no necesitan un Jaeger
+os.environ.setdefault("TRACE_EXPORTER", "none")
+# Los tests leen /metrics justo después de generar tráfico
+os.environ.setdefault("METRICS_CACHE_TTL_SECONDS", "0")
+# Sin calentamiento: los tests no ejecutan el arranque de la app
+os.environ.setdefault("WARMUP_ENABLED", "false")
+
 
 @pytest.fixture(scope="session")
 def test_app():
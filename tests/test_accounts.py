@@ -0,0 +1,106 @@
+"""
+Tests para el registro compacto de cuentas
+"""
+import os
+
+import pytest
+
+from src.accounts import (
+    AccountRegistry,
+    AccountSnapshot,
+    AccountSnapshotError,
+    build_snapshot,
+)
+from src.rules import RuleError, compile_rules
+
+ACCOUNTS = [f"{i:010d}" for i in range(1000, 6000)]
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = str(tmp_path / "accounts.snapshot")
+    build_snapshot(ACCOUNTS, path)
+    return path
+
+
+class TestAccountSnapshot:
+    """Tests del snapshot mapeado en memoria"""
+
+    def test_known_and_unknown_accounts(self, snapshot_path):
+        snapshot = AccountSnapshot(snapshot_path)
+        assert len(snapshot) == len(ACCOUNTS)
+        assert all(account in snapshot for account in ACCOUNTS)
+        assert not any(f"{i:010d}" in snapshot for i in range(10000, 15000))
+
+    def test_duplicates_are_counted_once(self, tmp_path):
+        path = str(tmp_path / "accounts.snapshot")
+        assert build_snapshot(["1234567890", "1234567890", "0987654321"], path) == 2
+        assert len(AccountSnapshot(path)) == 2
+
+    def test_empty_snapshot(self, tmp_path):
+        path = str(tmp_path / "accounts.snapshot")
+        build_snapshot([], path)
+        assert "1234567890" not in AccountSnapshot(path)
+
+    def test_invalid_file_is_rejected(self, tmp_path):
+        path = tmp_path / "accounts.snapshot"
+        path.write_bytes(b"no es un snapshot" * 10)
+        with pytest.raises(AccountSnapshotError):
+            AccountSnapshot(str(path))
+        with pytest.raises(AccountSnapshotError):
+            AccountSnapshot(str(tmp_path / "no-existe"))
+
+
+class TestAccountRegistry:
+    """Tests del swap atómico del registro"""
+
+    def test_refresh_picks_up_replaced_snapshot(self, snapshot_path):
+        now = [0.0]
+        reloads = []
+        registry = AccountRegistry(snapshot_path, refresh_interval=10, on_reload=reloads.append,
+                                   clock=lambda: now[0])
+        old = registry.snapshot
+        assert "9999999999" not in registry
+
+        build_snapshot(ACCOUNTS + ["9999999999"], snapshot_path)
+        assert "9999999999" not in registry
+        now[0] = 11
+        assert "9999999999" in registry
+        assert registry.snapshot is not old and reloads == [registry.snapshot]
+        # El snapshot anterior sigue utilizable por quien ya lo tenía
+        assert ACCOUNTS[0] in old
+
+    def test_invalid_refresh_keeps_current_snapshot(self, snapshot_path):
+        now = [0.0]
+        errors = []
+        registry = AccountRegistry(snapshot_path, refresh_interval=10, on_reload_error=errors.append,
+                                   clock=lambda: now[0])
+        with open(snapshot_path + ".tmp", "wb") as f:
+            f.write(b"roto")
+        os.replace(snapshot_path + ".tmp", snapshot_path)
+
+        now[0] = 11
+        assert ACCOUNTS[0] in registry
+        assert len(errors) == 1
+        with pytest.raises(AccountSnapshotError):
+            registry.reload()
+
+    def test_known_account_rule(self, snapshot_path):
+        registry = AccountRegistry(snapshot_path)
+        spec = {"checks": [
+            {"name": "valid_sender", "all": [
+                {"field": "sender_account", "op": "min_len", "value": 10},
+                {"field": "sender_account", "op": "known_account"},
+            ]},
+        ]}
+        plan = compile_rules(spec, accounts=registry)
+
+        class Tx:
+            sender_account = ACCOUNTS[0]
+        assert plan.evaluate(Tx)[0] == {"valid_sender": True}
+        Tx.sender_account = "5555555555"
+        assert plan.evaluate(Tx)[0] == {"valid_sender": False}
+        assert plan.evaluate_columns([Tx])[0] == {"valid_sender": [False]}
+
+        with pytest.raises(RuleError):
+            compile_rules(spec)
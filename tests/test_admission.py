@@ -0,0 +1,101 @@
+"""
+Tests para el control de admisión
+"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from src.admission import SHED_QUEUE_FULL, SHED_TIMEOUT, AdaptiveLimiter, AdmissionControlMiddleware
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+class TestAdaptiveLimiter:
+    """Tests de admisión, cola y ajuste del límite"""
+
+    async def test_waiter_gets_released_slot(self):
+        limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, queue_timeout=1)
+        assert await limiter.acquire() is None
+
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.release(None)
+        assert await waiter is None
+        assert limiter.in_flight == 1
+
+        limiter.release(None)
+        assert limiter.in_flight == 0
+
+    async def test_sheds_on_timeout_and_full_queue(self):
+        limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_queue=1, queue_timeout=0.01)
+        assert await limiter.acquire() is None
+
+        queued = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert await limiter.acquire() == SHED_QUEUE_FULL
+        assert await queued == SHED_TIMEOUT
+        assert limiter.in_flight == 1
+
+    async def test_aimd_adjusts_limit(self):
+        clock = FakeClock()
+        limits = []
+        limiter = AdaptiveLimiter(
+            initial_limit=10, min_limit=2, target_latency=0.1, window=1,
+            on_limit=limits.append, clock=clock
+        )
+        for _ in range(10):
+            await limiter.acquire()
+        clock.now = 1.0
+        limiter.release(0.5)
+        assert limiter.limit == pytest.approx(9.0)
+
+        # Latencia sana con el límite en uso: incremento aditivo
+        clock.now = 2.0
+        limiter.release(0.01)
+        assert limiter.limit == pytest.approx(10.0)
+        assert limits == [pytest.approx(9.0), pytest.approx(10.0)]
+
+
+@pytest.mark.asyncio
+class TestAdmissionControlMiddleware:
+    """Tests de descarte rápido y rutas exentas"""
+
+    async def test_sheds_with_503_and_bypasses_health(self):
+        release = asyncio.Event()
+        app = FastAPI()
+
+        @app.post("/api/v1/validate")
+        async def validate():
+            await release.wait()
+            return {"ok": True}
+
+        @app.get("/health")
+        async def health():
+            return {"status": "healthy"}
+
+        shed = []
+        limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_queue=0)
+        app.add_middleware(AdmissionControlMiddleware, limiter=limiter, on_shed=shed.append)
+
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            first = asyncio.create_task(client.post("/api/v1/validate"))
+            await asyncio.sleep(0.05)
+
+            rejected = await client.post("/api/v1/validate")
+            assert rejected.status_code == 503
+            assert rejected.headers["retry-after"] == "1"
+            assert (await client.get("/health")).status_code == 200
+
+            release.set()
+            assert (await first).status_code == 200
+        assert shed == [SHED_QUEUE_FULL]
+        assert limiter.in_flight == 0
@@ -0,0 +1,146 @@
+"""
+Tests para validación por lotes
+"""
+import asyncio
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from src import main
+from src.main import Transaction, app, rule_engine
+
+client = TestClient(app)
+
+
+def make_transaction(i, **overrides):
+    transaction = {
+        "transaction_id": f"TX-B{i:05d}",
+        "amount": 1000 + i,
+        "currency": "MXN",
+        "sender_account": "1234567890",
+        "receiver_account": "0987654321"
+    }
+    transaction.update(overrides)
+    return transaction
+
+
+class TestEvaluateColumns:
+    """Tests de la evaluación columnar"""
+
+    def test_columns_match_input_order(self):
+        transactions = [
+            Transaction.model_construct(
+                transaction_id=str(i), amount=amount, currency=currency,
+                sender_account=sender, receiver_account=receiver, description=None
+            )
+            for i, (amount, currency, sender, receiver) in enumerate([
+                (100, "MXN", "1234567890", "0987654321"),
+                (30000, "USD", "123", "0987654321"),
+                (2000000, "JPY", "1234567890", "1234567890"),
+            ])
+        ]
+        checks, warnings = rule_engine.plan.evaluate_columns(transactions)
+        assert checks['amount_within_limits'] == [True, True, False]
+        assert checks['valid_sender'] == [True, False, True]
+        assert checks['different_accounts'] == [True, True, False]
+        assert checks['compliance'] == [True, True, False]
+        assert warnings[0] == []
+        # 30,000 USD supera el umbral de alto valor en moneda base
+        assert len(warnings[1]) == 1
+        # JPY no está en la tabla de tipos de cambio: no se normaliza
+        assert warnings[2] == []
+
+
+class TestBatchEndpoint:
+    """Tests del endpoint /api/v1/validate/batch"""
+
+    def test_json_array_batch(self):
+        transactions = [make_transaction(i) for i in range(5)]
+        transactions[2]["receiver_account"] = "1234567890"
+
+        response = client.post("/api/v1/validate/batch", json=transactions)
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["total"] == 5
+        assert data["failed"] == 0
+        assert [item["index"] for item in data["results"]] == list(range(5))
+        assert [item["transaction_id"] for item in data["results"]] == [
+            t["transaction_id"] for t in transactions
+        ]
+        assert data["results"][2]["result"]["checks_passed"]["different_accounts"] is False
+        assert "fraud_check" in data["results"][0]["result"]["checks_passed"]
+
+    def test_fraud_budget_falls_back(self, monkeypatch):
+        async def slow_fraud(transactions):
+            await asyncio.sleep(1)
+
+        monkeypatch.setattr(main, "fraud_detection_batch", slow_fraud)
+        start = time.monotonic()
+        response = client.post(
+            "/api/v1/validate/batch",
+            json=[make_transaction(i) for i in range(3)],
+            headers={"X-Request-Timeout-Ms": "50"},
+        )
+        assert time.monotonic() - start < 0.5
+        assert response.status_code == 200
+        for item in response.json()["results"]:
+            assert item["result"]["skipped_stages"] == ["fraud_detection"]
+            assert item["result"]["checks_passed"]["fraud_check"] is False
+            assert main.BUDGET_WARNING in item["result"]["warnings"]
+
+    def test_partial_failures_reported_per_item(self):
+        transactions = [
+            make_transaction(0),
+            make_transaction(1, currency="JPY"),
+            make_transaction(2, amount=-5),
+            make_transaction(3),
+        ]
+        response = client.post("/api/v1/validate/batch", json=transactions)
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["failed"] == 2
+        results = data["results"]
+        assert results[0]["result"] is not None
+        assert results[1]["result"] is None
+        assert results[1]["transaction_id"] == "TX-B00001"
+        assert results[1]["errors"][0]["loc"] == ["currency"]
+        assert results[2]["errors"] is not None
+        assert results[3]["result"]["transaction_id"] == "TX-B00003"
+
+    def test_ndjson_batch(self):
+        lines = [json.dumps(make_transaction(i)) for i in range(3)]
+        lines.insert(1, "{no es json")
+        response = client.post(
+            "/api/v1/validate/batch",
+            content="\n".join(lines) + "\n",
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["total"] == 4
+        assert data["failed"] == 1
+        assert data["results"][1]["errors"][0]["type"] == "json_invalid"
+        assert data["results"][3]["transaction_id"] == "TX-B00002"
+
+    def test_invalid_batch_body(self):
+        response = client.post("/api/v1/validate/batch", json={"transaction_id": "TX"})
+        assert response.status_code == 422
+
+        response = client.post("/api/v1/validate/batch", json=[])
+        assert response.status_code == 422
+
+    def test_large_batch_throughput(self):
+        """Un lote de 1000 se valida mucho más rápido que 1000 llamadas individuales"""
+        transactions = [make_transaction(i) for i in range(1000)]
+        start = time.perf_counter()
+        response = client.post("/api/v1/validate/batch", json=transactions)
+        elapsed = time.perf_counter() - start
+
+        assert response.status_code == 200
+        assert len(response.json()["results"]) == 1000
+        # Una llamada individual tarda al menos 60ms de latencia simulada
+        assert elapsed < 1000 * 0.06 / 10
@@ -0,0 +1,94 @@
+"""
+Tests para el micro-batching de llamadas individuales
+"""
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from src import main
+from src.batching import MicroBatcher
+
+
+async def double(items):
+    return [item * 2 for item in items]
+
+
+@pytest.mark.asyncio
+class TestMicroBatcher:
+    """Tests del agrupador de llamadas"""
+
+    async def test_concurrent_calls_share_a_batch(self):
+        sizes = []
+        waits = []
+        batcher = MicroBatcher(double, max_batch_size=100, max_wait=0.01,
+                               on_batch=sizes.append, on_wait=waits.append)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+        assert results == [i * 2 for i in range(10)]
+        assert sizes == [10]
+        assert len(waits) == 10 and all(0 <= wait < 0.1 for wait in waits)
+
+    async def test_full_batch_is_dispatched_without_waiting(self):
+        sizes = []
+        batcher = MicroBatcher(double, max_batch_size=4, max_wait=10, on_batch=sizes.append)
+        results = await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(8))), 1)
+        assert results == [i * 2 for i in range(8)]
+        assert sizes == [4, 4]
+
+    async def test_single_call_waits_at_most_max_wait(self):
+        batcher = MicroBatcher(double, max_batch_size=100, max_wait=0.001)
+        assert await asyncio.wait_for(batcher.submit(21), 0.5) == 42
+
+    async def test_errors_reach_their_callers(self):
+        async def per_item(items):
+            return [ValueError(item) if item == "malo" else item for item in items]
+
+        batcher = MicroBatcher(per_item, max_wait=0.001)
+        good, bad = await asyncio.gather(
+            batcher.submit("bueno"), batcher.submit("malo"), return_exceptions=True
+        )
+        assert good == "bueno"
+        assert isinstance(bad, ValueError)
+
+        async def broken(items):
+            raise RuntimeError("falla")
+
+        batcher = MicroBatcher(broken, max_wait=0.001)
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    async def test_cancelled_caller_does_not_break_batch(self):
+        batcher = MicroBatcher(double, max_batch_size=100, max_wait=0.01)
+        cancelled = asyncio.ensure_future(batcher.submit(1))
+        kept = asyncio.ensure_future(batcher.submit(2))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        assert await kept == 4
+
+
+@pytest.mark.asyncio
+async def test_validate_endpoint_with_micro_batching(monkeypatch):
+    sizes = []
+    monkeypatch.setattr(main, "micro_batcher", MicroBatcher(
+        main.validate_micro_batch, max_batch_size=64, max_wait=0.01, on_batch=sizes.append
+    ))
+    transactions = [
+        {
+            "transaction_id": f"TX-MB{i:03d}",
+            "amount": 1000,
+            "currency": "MXN",
+            "sender_account": f"01200000{i:02d}",
+            "receiver_account": "0987654321"
+        }
+        for i in range(20)
+    ]
+    async with AsyncClient(app=main.app, base_url="http://test") as client:
+        responses = await asyncio.gather(*(
+            client.post("/api/v1/validate", json=transaction) for transaction in transactions
+        ))
+
+    ok = [response.json() for response in responses if response.status_code == 200]
+    assert len(ok) >= 18  # 0.8% de errores simulados
+    assert all(result["transaction_id"].startswith("TX-MB") for result in ok)
+    assert all("fraud_check" in result["checks_passed"] for result in ok)
+    assert max(sizes) > 1
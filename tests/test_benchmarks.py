@@ -0,0 +1,65 @@
+"""
+Tests para la comparación contra la línea base de benchmarks
+"""
+import json
+
+from benchmarks import suite
+
+
+class TestCompare:
+    """Tests de detección de regresiones"""
+
+    def test_detects_p95_and_throughput_regressions(self):
+        baseline = {
+            "stages.parse": {"p95_us": 10.0, "ops_per_sec": 1000.0},
+            "e2e.validate": {"p95_us": 100.0, "ops_per_sec": 500.0},
+        }
+        current = {
+            "stages.parse": {"p95_us": 11.0, "ops_per_sec": 950.0},
+            "e2e.validate": {"p95_us": 130.0, "ops_per_sec": 300.0},
+            "metrics.render_100": {"p95_us": 1.0},
+        }
+        regressions = suite.compare(current, baseline, threshold=0.2)
+        assert len(regressions) == 2
+        assert all(r.startswith("e2e.validate") for r in regressions)
+
+    def test_derived_results_are_not_compared(self):
+        baseline = {"middleware.overhead": {"p95_us": 1.0}}
+        current = {"middleware.overhead": {"p95_us": 50.0, "derived": True}}
+        assert suite.compare(current, baseline, threshold=0.2) == []
+
+    def test_histogram_buckets(self):
+        counts = suite.histogram([500_000, 3_000_000, 2_000_000_000])
+        assert counts["le_1000us"] == 1
+        assert counts["le_5000us"] == 1
+        assert counts["inf"] == 1
+
+
+class TestSuiteRun:
+    """La suite corre con semilla fija y guarda/compara la línea base"""
+
+    def test_save_then_compare(self, tmp_path, monkeypatch):
+        path = tmp_path / "baseline.json"
+        assert suite.main(["--only", "stages", "--quick", "--save", "--baseline", str(path)]) == 0
+        saved = json.loads(path.read_text())
+        assert set(saved["results"]) == {"stages.parse", "stages.checks", "stages.fraud", "stages.result"}
+
+        # Una línea base imposible de alcanzar hace fallar la comparación
+        for result in saved["results"].values():
+            result["p95_us"] = 1e-6
+        path.write_text(json.dumps(saved))
+        assert suite.main(["--only", "stages", "--quick", "--compare", "--baseline", str(path)]) == 1
+
+
+class TestE2eWorkload:
+    """Cada request de e2e recorre el camino normal de validación"""
+
+    def test_bodies_are_unique_and_pass_the_rules(self):
+        from src import main
+
+        transactions = [main.parse_transaction(suite.e2e_body(i), "application/json") for i in range(50)]
+        assert len({t.transaction_id for t in transactions}) == 50
+        assert len({(t.sender_account, t.receiver_account) for t in transactions}) == 50
+        for transaction in transactions:
+            checks, warnings = main.check_rules(transaction)
+            assert all(checks.values()) and warnings == []
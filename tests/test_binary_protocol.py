@@ -0,0 +1,210 @@
+"""
+Tests para el protocolo binario de validación
+"""
+import asyncio
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from prometheus_client import REGISTRY
+
+from src import main
+from src.binary_protocol import (
+    HEADER,
+    VALIDATE,
+    BinaryClient,
+    BinaryServer,
+    CallError,
+    ProtocolError,
+    decode_error,
+    decode_result,
+    decode_validate,
+    encode_error,
+    encode_frame,
+    encode_result,
+    encode_validate,
+    parse_address,
+)
+from src.lifecycle import DRAINING, Lifecycle
+
+
+def make_transaction(i, **overrides):
+    transaction = {
+        "transaction_id": f"TX-BIN-{i:05d}",
+        "amount": 1000.0 + i,
+        "currency": "MXN",
+        "sender_account": "1234567890",
+        "receiver_account": "0987654321",
+        "description": "Binaria",
+    }
+    transaction.update(overrides)
+    return transaction
+
+
+def payload_of(frame: bytes) -> bytes:
+    return frame[HEADER.size:]
+
+
+class TestCodec:
+    """Tests de codificación de los frames"""
+
+    def test_validate_round_trip(self):
+        transaction = make_transaction(1, description=None)
+        frame = encode_validate(7, transaction, deadline_ms=250)
+        length, kind, call_id = HEADER.unpack_from(frame)
+        assert (length, kind, call_id) == (len(frame) - HEADER.size, VALIDATE, 7)
+        fields, deadline_ms = decode_validate(payload_of(frame))
+        assert deadline_ms == 250
+        assert fields == {k: v for k, v in transaction.items() if v is not None}
+
+    def test_result_round_trip(self):
+        result = SimpleNamespace(
+            transaction_id="TX-1", is_valid=False, validation_score=0.75, risk_level="medium",
+            checks_passed={"amount_within_limits": True, "fraud_check": False},
+            warnings=["alto valor"], skipped_stages=["fraud_detection"],
+            timestamp=datetime(2025, 1, 15, 12, 30, 45, 123456),
+        )
+        assert decode_result(payload_of(encode_result(3, result))) == vars(result)
+
+    def test_error_round_trip(self):
+        assert decode_error(payload_of(encode_error(1, 422, "Monto inválido"))) == (422, "Monto inválido")
+
+    def test_malformed_payloads(self):
+        frame = encode_validate(1, make_transaction(1))
+        with pytest.raises(ProtocolError, match="truncado"):
+            decode_validate(payload_of(frame)[:-3])
+        with pytest.raises(ProtocolError, match="sobrantes"):
+            decode_validate(payload_of(frame) + b"\x00")
+
+    def test_addresses(self):
+        assert parse_address("unix:/tmp/v.sock") == ("unix", "/tmp/v.sock")
+        assert parse_address(":9000") == (None, ("0.0.0.0", 9000))
+        assert parse_address("[::1]:9000") == (None, ("::1", 9000))
+        with pytest.raises(ValueError):
+            parse_address("localhost")
+
+
+def binary_count(status: str) -> float:
+    return REGISTRY.get_sample_value(
+        "transaction_validator_requests_total",
+        {"method": "BINARY", "endpoint": "/api/v1/validate", "status": status},
+    ) or 0.0
+
+
+@pytest.mark.asyncio
+class TestBinaryServer:
+    """Tests del servidor conectado al núcleo de validación"""
+
+    async def serve(self, tmp_path, handler=None, **kwargs):
+        address = f"unix:{tmp_path / 'validator.sock'}"
+        server = BinaryServer(address, handler or main.validate_binary, **kwargs)
+        await server.start()
+        return server, await BinaryClient.connect(address)
+
+    async def test_unary_call_matches_http_checks(self, tmp_path):
+        server, client = await self.serve(tmp_path)
+        before = binary_count("200")
+        try:
+            try:
+                result = await client.validate(make_transaction(1))
+            except CallError as e:
+                # Error interno simulado del 0.8%
+                assert e.status == 500
+                return
+            assert result["transaction_id"] == "TX-BIN-00001"
+            assert set(result["checks_passed"]) >= {"amount_within_limits", "fraud_check", "compliance"}
+            assert result["risk_level"] in ("low", "medium", "high")
+            assert binary_count("200") == before + 1
+        finally:
+            await client.close()
+            await server.close()
+
+    async def test_invalid_transaction_is_422(self, tmp_path):
+        server, client = await self.serve(tmp_path)
+        try:
+            with pytest.raises(CallError) as info:
+                await client.validate(make_transaction(2, currency="XXX"))
+            assert info.value.status == 422
+            assert json.loads(info.value.message)[0]["loc"] == ["currency"]
+            # La conexión sigue abierta después de un error de validación
+            with pytest.raises(CallError) as info:
+                await client.validate(make_transaction(3, amount=-1.0))
+            assert info.value.status == 422
+        finally:
+            await client.close()
+            await server.close()
+
+    async def test_bidirectional_stream(self, tmp_path):
+        server, client = await self.serve(tmp_path)
+
+        async def transactions():
+            for i in range(20):
+                yield make_transaction(100 + i)
+
+        try:
+            received = {}
+            async for index, outcome in client.stream(transactions()):
+                received[index] = outcome
+            assert sorted(received) == list(range(20))
+            for index, outcome in received.items():
+                if isinstance(outcome, CallError):
+                    assert outcome.status == 500
+                else:
+                    assert outcome["transaction_id"] == f"TX-BIN-{100 + index:05d}"
+        finally:
+            await client.close()
+            await server.close()
+
+    async def test_in_flight_is_bounded_per_connection(self, tmp_path):
+        active = []
+        peak = []
+
+        async def slow(call_id, fields, deadline_ms):
+            active.append(call_id)
+            peak.append(len(active))
+            await asyncio.sleep(0.01)
+            active.remove(call_id)
+            return encode_error(call_id, 418, fields["transaction_id"])
+
+        server, client = await self.serve(tmp_path, slow, max_in_flight=2)
+        try:
+            outcomes = await asyncio.gather(
+                *(client.validate(make_transaction(i)) for i in range(8)), return_exceptions=True
+            )
+            assert [e.message for e in outcomes] == [f"TX-BIN-{i:05d}" for i in range(8)]
+            assert max(peak) == 2
+        finally:
+            await client.close()
+            await server.close()
+
+    async def test_draining_rejects_and_closes(self, tmp_path, monkeypatch):
+        lifecycle = Lifecycle(warm=False)
+        monkeypatch.setattr(main, "lifecycle", lifecycle)
+        server, client = await self.serve(tmp_path, closing=lambda: not lifecycle.accepting)
+        try:
+            lifecycle.phase = DRAINING
+            with pytest.raises(CallError) as info:
+                await client.validate(make_transaction(4))
+            assert info.value.status == 503
+            # Después del rechazo el servidor cierra la conexión
+            with pytest.raises(ConnectionError):
+                await client.validate(make_transaction(5))
+            assert lifecycle.in_flight == 0
+        finally:
+            await client.close()
+            await server.close()
+
+    async def test_malformed_frame_closes_connection(self, tmp_path):
+        errors = []
+        server, client = await self.serve(tmp_path, on_protocol_error=errors.append)
+        reader, writer = await asyncio.open_unix_connection(str(tmp_path / "validator.sock"))
+        try:
+            writer.write(encode_frame(9, 1, b""))
+            data = await reader.read()
+            assert decode_error(data[HEADER.size:]) == (400, "Tipo de frame desconocido: 9")
+            assert len(errors) == 1
+        finally:
+            writer.close()
+            await client.close()
+            await server.close()
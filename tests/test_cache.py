@@ -0,0 +1,176 @@
+"""
+Tests para el cache de idempotencia
+"""
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.cache import IdempotencyCache, InMemorySharedBackend, LRUCache
+from src.main import app
+
+client = TestClient(app)
+
+
+class TestLRUCache:
+    """Tests del nivel local"""
+
+    def test_lru_eviction(self):
+        evictions = []
+        cache = LRUCache(max_size=2, ttl=60, on_evict=evictions.append)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert evictions == ["lru"]
+
+    def test_ttl_expiration(self):
+        evictions = []
+        cache = LRUCache(max_size=10, ttl=0.01, on_evict=evictions.append)
+        cache.set("a", 1)
+        time.sleep(0.02)
+
+        assert cache.get("a") is None
+        assert evictions == ["expired"]
+        assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+class TestIdempotencyCache:
+    """Tests de single-flight y backend compartido"""
+
+    async def test_concurrent_requests_single_flight(self):
+        calls = 0
+        hits = []
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "resultado"
+
+        cache = IdempotencyCache(max_size=10, ttl=60, on_hit=hits.append)
+        results = await asyncio.gather(*(
+            cache.get_or_compute("TX-1", compute) for _ in range(5)
+        ))
+
+        assert results == ["resultado"] * 5
+        assert calls == 1
+        assert hits == ["in_flight"] * 4
+
+        await cache.get_or_compute("TX-1", compute)
+        assert calls == 1
+        assert hits[-1] == "local"
+
+    async def test_errors_are_not_cached(self):
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            raise RuntimeError("falla")
+
+        cache = IdempotencyCache(max_size=10, ttl=60)
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await cache.get_or_compute("TX-1", compute)
+        assert calls == 2
+
+    async def test_rejected_values_are_not_cached(self):
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            return "degradado"
+
+        cache = IdempotencyCache(max_size=10, ttl=60, should_cache=lambda value: value != "degradado")
+        for _ in range(2):
+            assert await cache.get_or_compute("TX-1", compute) == "degradado"
+        assert calls == 2
+
+    async def test_shared_backend_between_instances(self):
+        backend = InMemorySharedBackend()
+        hits = []
+
+        async def compute():
+            return "resultado"
+
+        first = IdempotencyCache(max_size=10, ttl=60, backend=backend)
+        second = IdempotencyCache(max_size=10, ttl=60, backend=backend, on_hit=hits.append)
+
+        await first.get_or_compute("TX-1", compute)
+
+        async def fail():
+            raise AssertionError("no debe recalcular")
+
+        assert await second.get_or_compute("TX-1", fail) == "resultado"
+        assert hits == ["shared"]
+
+    async def test_cancelled_leader_does_not_cancel_followers(self):
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "resultado"
+
+        cache = IdempotencyCache(max_size=10, ttl=60)
+        leader = asyncio.ensure_future(cache.get_or_compute("TX-1", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.get_or_compute("TX-1", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == "resultado"
+        assert leader.cancelled()
+        assert calls == 1
+        assert cache.local.get("TX-1") == "resultado"
+
+    async def test_backend_errors_fall_back_to_compute(self):
+        class BrokenBackend:
+            async def get(self, key):
+                raise ConnectionError("backend caído")
+
+            async def set(self, key, value, ttl):
+                raise ConnectionError("backend caído")
+
+        errors = []
+
+        async def compute():
+            return "resultado"
+
+        cache = IdempotencyCache(
+            max_size=10, ttl=60, backend=BrokenBackend(), on_backend_error=errors.append
+        )
+        assert await cache.get_or_compute("TX-1", compute) == "resultado"
+        assert errors == ["get", "set"]
+        assert cache.local.get("TX-1") == "resultado"
+
+
+class TestIdempotentEndpoint:
+    """Tests del cache en /api/v1/validate"""
+
+    def test_retry_returns_cached_result(self):
+        transaction = {
+            "transaction_id": "TX-IDEM-001",
+            "amount": 1500,
+            "currency": "MXN",
+            "sender_account": "1234567890",
+            "receiver_account": "0987654321"
+        }
+        first = client.post("/api/v1/validate", json=transaction)
+        second = client.post("/api/v1/validate", json=transaction)
+
+        if first.status_code == 200:
+            assert second.json() == first.json()
+
+        metrics = client.get("/metrics").text
+        assert "transaction_validator_idempotency_cache_hits_total" in metrics
+        assert "transaction_validator_idempotency_cache_misses_total" in metrics
@@ -0,0 +1,101 @@
+"""
+Tests para la exposición cacheada de /metrics
+"""
+import asyncio
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry, Counter
+from prometheus_client.openmetrics.exposition import CONTENT_TYPE_LATEST as OPENMETRICS
+
+from src.exposition import MetricsExposition, accepts_gzip
+from src.main import app
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_exposition(**kwargs):
+    registry = CollectorRegistry()
+    counter = Counter("scrape_test", "Contador de prueba", registry=registry)
+    renders = []
+    scrapes = []
+    exposition = MetricsExposition(
+        lambda: registry,
+        on_render=lambda seconds, size: renders.append(size),
+        on_scrape=scrapes.append,
+        **kwargs
+    )
+    return exposition, counter, renders, scrapes
+
+
+@pytest.mark.asyncio
+class TestMetricsExposition:
+    """Tests del render cacheado"""
+
+    async def test_payload_is_cached_for_ttl(self):
+        clock = FakeClock()
+        exposition, counter, renders, scrapes = make_exposition(ttl=5, clock=clock)
+        counter.inc()
+        first = await exposition.payload()
+        counter.inc()
+        assert (await exposition.payload()).body == first.body
+        assert b"scrape_test_total 1.0" in first.body
+
+        clock.now = 5
+        assert b"scrape_test_total 2.0" in (await exposition.payload()).body
+        assert len(renders) == 2
+        assert scrapes == ["miss", "hit", "miss"]
+
+    async def test_concurrent_scrapes_share_one_render(self):
+        exposition, _, renders, scrapes = make_exposition(ttl=0)
+        payloads = await asyncio.gather(*(exposition.payload() for _ in range(5)))
+        assert len(renders) == 1
+        assert len({payload.body for payload in payloads}) == 1
+        assert sorted(scrapes) == ["in_flight"] * 4 + ["miss"]
+
+    async def test_format_and_encoding_negotiation(self):
+        exposition, counter, _, _ = make_exposition()
+        counter.inc()
+        openmetrics = await exposition.payload("application/openmetrics-text; version=1.0.0", "gzip")
+        assert openmetrics.content_type == OPENMETRICS
+        assert openmetrics.content_encoding == "gzip"
+        assert gzip.decompress(openmetrics.body).endswith(b"# EOF\n")
+
+        text = await exposition.payload("text/plain", "gzip;q=0, identity")
+        assert text.content_type.startswith("text/plain")
+        assert text.content_encoding is None and b"# EOF" not in text.body
+
+    async def test_snapshot_mode_serves_without_rendering(self):
+        exposition, counter, renders, scrapes = make_exposition(ttl=0)
+        exposition.start_refresh(0.01)
+        await asyncio.sleep(0.05)
+        counter.inc()
+        await asyncio.sleep(0.05)
+        assert b"scrape_test_total 1.0" in (await exposition.payload()).body
+        assert scrapes == ["hit"] and len(renders) >= 2
+        await exposition.stop_refresh()
+
+
+def test_accepts_gzip():
+    assert accepts_gzip("gzip, deflate")
+    assert accepts_gzip("*")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip("identity")
+    assert not accepts_gzip(None)
+
+
+def test_metrics_endpoint_compresses_and_reports_scrapes():
+    client = TestClient(app)
+    response = client.get("/metrics", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    # httpx descomprime el cuerpo
+    assert "transaction_validator_metrics_scrapes_total" in response.text
+    assert "transaction_validator_metrics_render_duration_seconds" in response.text
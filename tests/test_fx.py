@@ -0,0 +1,162 @@
+"""
+Tests para la normalización de montos con la tabla de tipos de cambio
+"""
+import json
+import os
+import subprocess
+import sys
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.fx import FxError, load_fx_table, parse_fx_table
+from src.main import app, rule_engine
+from src.rules import RuleEngine, RuleError, compile_rules
+
+client = TestClient(app)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+TABLE = {"version": "t1", "base": "MXN", "rates": {"MXN": "1", "USD": "17.05", "EUR": "18.52"}}
+
+LIMIT_SPEC = {
+    "input": {"max_base_amount": 1000000},
+    "checks": [{"name": "limit", "field": "base_amount", "op": "le", "value": 1000000}],
+    "warnings": [{"name": "high", "field": "base_amount", "op": "gt", "value": 500000, "message": "alto"}],
+}
+
+
+def make_tx(amount, currency):
+    return SimpleNamespace(transaction_id="TX-FX", amount=amount, currency=currency,
+                           sender_account="1234567890", receiver_account="0987654321", description=None)
+
+
+class TestFxTable:
+    """Tests de carga y validación de la tabla"""
+
+    def test_rates_are_exact_decimals(self, tmp_path):
+        path = tmp_path / "fx.json"
+        path.write_text('{"version": "v", "base": "MXN", "rates": {"MXN": 1, "USD": 17.05}}')
+        table = load_fx_table(str(path))
+        assert table.rates["USD"] == Decimal("17.05")
+        assert table.to_base(0.1, "USD") == Decimal("1.705")
+
+    @pytest.mark.parametrize("spec", [
+        {"base": "MXN", "rates": {"MXN": "1"}},
+        {"version": "v", "base": "MXN", "rates": {}},
+        {"version": "v", "base": "MXN", "rates": {"MXN": "1", "USD": "0"}},
+        {"version": "v", "base": "MXN", "rates": {"MXN": "1", "USD": "abc"}},
+        {"version": "v", "base": "USD", "rates": {"MXN": "1"}},
+    ])
+    def test_invalid_tables_are_rejected(self, spec):
+        with pytest.raises(FxError):
+            parse_fx_table(spec)
+
+
+class TestBaseAmountRules:
+    """Tests de las reglas sobre el monto normalizado"""
+
+    @pytest.mark.parametrize("exact", [False, True])
+    def test_limits_apply_per_currency(self, exact):
+        plan = compile_rules(LIMIT_SPEC, fx=parse_fx_table(TABLE), exact=exact)
+        assert plan.evaluate(make_tx(900000.0, "MXN")) == ({"limit": True}, ["alto"])
+        # 900k EUR son ~16.7M MXN
+        assert plan.evaluate(make_tx(900000.0, "EUR"))[0] == {"limit": False}
+        assert plan.evaluate(make_tx(20000.0, "USD")) == ({"limit": True}, [])
+        # Moneda sin tipo de cambio: no cumple ninguna comparación
+        assert plan.evaluate(make_tx(1.0, "JPY")) == ({"limit": False}, [])
+
+        checks, warnings = plan.evaluate_columns([make_tx(900000.0, "MXN"), make_tx(900000.0, "EUR")])
+        assert checks == {"limit": [True, False]}
+        assert warnings == [["alto"], ["alto"]]
+
+    def test_float_thresholds_are_precomputed(self):
+        plan = compile_rules(LIMIT_SPEC, fx=parse_fx_table(TABLE))
+        # Sin conversión en el hot path: comparación contra el umbral de la moneda
+        assert "f_amount <= _c0.get(f_currency, _nan)" in plan.source
+        assert "_mul" not in plan.source
+
+    def test_exact_mode_has_no_float_rounding(self):
+        table = parse_fx_table(TABLE)
+        # El umbral float de EUR redondea hacia arriba: 53995.68034557236 EUR
+        # son 1,000,000.0000000001 MXN
+        amount = table.thresholds(1000000)["EUR"]
+        assert table.to_base(amount, "EUR") > 1000000
+        assert compile_rules(LIMIT_SPEC, fx=table).evaluate(make_tx(amount, "EUR"))[0] == {"limit": True}
+        exact = compile_rules(LIMIT_SPEC, fx=table, exact=True)
+        assert exact.evaluate(make_tx(amount, "EUR"))[0] == {"limit": False}
+        assert exact.exceeds_input_limit(amount, "EUR")
+        assert not exact.exceeds_input_limit(1000000 / 18.52 - 0.01, "EUR")
+
+    def test_invalid_base_amount_rules(self):
+        with pytest.raises(RuleError, match="FX_RATES_FILE"):
+            compile_rules(LIMIT_SPEC)
+        with pytest.raises(RuleError, match="base_amount"):
+            compile_rules({"checks": [{"name": "x", "field": "base_amount", "op": "eq", "value": 1}]},
+                          fx=parse_fx_table(TABLE))
+
+    def test_input_currencies_need_rates(self):
+        spec = dict(LIMIT_SPEC, input={"currencies": ["MXN", "JPY"]})
+        with pytest.raises(RuleError, match="JPY"):
+            compile_rules(spec, fx=parse_fx_table(TABLE))
+
+
+class TestFxReload:
+    """La tabla se recarga junto con las reglas y se publica con el plan"""
+
+    def test_reload_publishes_new_fx_version(self, tmp_path):
+        rules_path = tmp_path / "rules.json"
+        fx_path = tmp_path / "fx.json"
+        rules_path.write_text(json.dumps(LIMIT_SPEC))
+        fx_path.write_text(json.dumps(TABLE))
+        engine = RuleEngine(str(rules_path), fx_path=str(fx_path))
+        assert engine.plan.fx_version == "t1"
+        assert engine.evaluate(make_tx(55000.0, "USD"))[0] == {"limit": True}
+
+        fx_path.write_text(json.dumps(dict(TABLE, version="t2", rates=dict(TABLE["rates"], USD="20"))))
+        assert engine.reload().fx_version == "t2"
+        assert engine.evaluate(make_tx(55000.0, "USD"))[0] == {"limit": False}
+
+        # Una tabla inválida conserva el plan activo
+        fx_path.write_text('{"version": "t3"}')
+        with pytest.raises(RuleError):
+            engine.reload()
+        assert engine.plan.fx_version == "t2"
+
+
+class TestFxEndpoints:
+    """Tests de la validación de entrada y la administración"""
+
+    def test_input_limit_is_normalized(self, sample_transaction):
+        mxn = dict(sample_transaction, transaction_id="TX-FX-MXN", amount=900000)
+        eur = dict(sample_transaction, transaction_id="TX-FX-EUR", amount=900000, currency="EUR")
+        assert client.post("/api/v1/validate", json=mxn).status_code in (200, 500)
+        assert client.post("/api/v1/validate", json=eur).status_code == 422
+
+    @pytest.mark.parametrize("currency, allowed, rejected", [
+        ("USD", 58600, 58700),
+        ("EUR", 53900, 54100),
+    ])
+    def test_bundled_limit_is_in_mxn(self, sample_transaction, currency, allowed, rejected):
+        # Cambio de contrato de la versión 2 de las reglas: 1,000,000 MXN, no 1,000,000 por moneda
+        ok = dict(sample_transaction, transaction_id=f"TX-FX-{currency}-OK", amount=allowed, currency=currency)
+        over = dict(sample_transaction, transaction_id=f"TX-FX-{currency}-OVER", amount=rejected, currency=currency)
+        assert client.post("/api/v1/validate", json=ok).status_code in (200, 500)
+        assert client.post("/api/v1/validate", json=over).status_code == 422
+
+    def test_empty_fx_rates_file_uses_bundled_table(self):
+        env = dict(os.environ, FX_RATES_FILE="")
+        output = subprocess.run(
+            [sys.executable, "-c", "from src.main import rule_engine; print(rule_engine.plan.fx_version)"],
+            cwd=ROOT, env=env, capture_output=True, text=True, timeout=60,
+        )
+        assert output.returncode == 0, output.stderr
+        assert output.stdout.strip().splitlines()[-1] == rule_engine.plan.fx_version
+
+    def test_admin_rules_report_fx_table(self):
+        fx = client.get("/api/v1/admin/rules").json()["fx"]
+        assert fx["version"] == rule_engine.plan.fx_version
+        assert fx["base"] == "MXN" and fx["exact"] is rule_engine.exact
+        assert fx["rates"]["USD"] == "17.05"
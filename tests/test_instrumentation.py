@@ -0,0 +1,101 @@
+"""
+Tests para el middleware de métricas
+"""
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+
+from src.instrumentation import UNMATCHED_ROUTE, MetricsMiddleware
+
+
+def make_app(log_sample_rate=1.0, logger=None):
+    registry = CollectorRegistry()
+    request_count = Counter('t_requests_total', 'r', ['method', 'endpoint', 'status'], registry=registry)
+    request_latency = Histogram('t_request_duration_seconds', 'l', ['method', 'endpoint'], registry=registry)
+    active = Gauge('t_active', 'a', registry=registry)
+    errors = Counter('t_errors_total', 'e', ['error_type'], registry=registry)
+
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"item_id": item_id}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("falla")
+
+    app.add_middleware(
+        MetricsMiddleware,
+        request_count=request_count,
+        request_latency=request_latency,
+        active_transactions=active,
+        error_count=errors,
+        logger=logger or logging.getLogger("test.instrumentation"),
+        routes=app.routes,
+        log_sample_rate=log_sample_rate,
+    )
+    return app, registry
+
+
+def endpoints(registry):
+    return {
+        sample.labels["endpoint"]
+        for metric in registry.collect()
+        if metric.name == "t_requests"
+        for sample in metric.samples
+        if sample.name == "t_requests_total" and sample.value > 0
+    }
+
+
+class TestMetricsMiddleware:
+    """Tests de etiquetas y muestreo"""
+
+    def test_labels_use_route_template(self):
+        app, registry = make_app()
+        client = TestClient(app)
+        for i in range(20):
+            assert client.get(f"/items/{i}").status_code == 200
+
+        assert endpoints(registry) == {"/items/{item_id}"}
+        value = registry.get_sample_value(
+            't_requests_total', {"method": "GET", "endpoint": "/items/{item_id}", "status": "200"}
+        )
+        assert value == 20
+
+    def test_unknown_paths_share_one_series(self):
+        app, registry = make_app()
+        client = TestClient(app)
+        for path in ("/wp-admin", "/.env", "/a/b/c"):
+            assert client.get(path).status_code == 404
+
+        assert endpoints(registry) == {UNMATCHED_ROUTE}
+        assert registry.get_sample_value(
+            't_requests_total', {"method": "GET", "endpoint": UNMATCHED_ROUTE, "status": "404"}
+        ) == 3
+
+    def test_known_routes_are_prebound(self):
+        app, registry = make_app()
+        client = TestClient(app)
+        client.get("/items/1")
+        assert registry.get_sample_value(
+            't_request_duration_seconds_count', {"method": "GET", "endpoint": "/boom"}
+        ) == 0
+
+    def test_errors_are_counted(self):
+        app, registry = make_app()
+        client = TestClient(app, raise_server_exceptions=False)
+        assert client.get("/boom").status_code == 500
+        assert registry.get_sample_value('t_errors_total', {"error_type": "RuntimeError"}) == 1
+        assert registry.get_sample_value('t_active') == 0
+
+    def test_access_log_sampling(self, caplog):
+        logger = logging.getLogger("test.instrumentation.sampled")
+        app, _ = make_app(log_sample_rate=0.0, logger=logger)
+        client = TestClient(app)
+        with caplog.at_level(logging.INFO, logger=logger.name):
+            client.get("/items/1")
+            client.get("/missing")
+        assert [r for r in caplog.records if r.name == logger.name] == []
@@ -0,0 +1,137 @@
+"""
+Tests para el calentamiento y el drenado del proceso
+"""
+import asyncio
+import json
+
+import pytest
+from prometheus_client import REGISTRY
+from fastapi.testclient import TestClient
+
+from src import main
+from src.lifecycle import DRAINED, DRAINING, SERVING, WARMING, DrainMiddleware, Lifecycle
+
+client = TestClient(main.app)
+
+
+def replay_matches(kind):
+    return REGISTRY.get_sample_value("transaction_validator_replay_matches_total", {"kind": kind}) or 0.0
+
+
+@pytest.mark.asyncio
+class TestLifecycle:
+    """Tests de las fases y el drenado"""
+
+    async def test_warm_up_then_serving(self):
+        phases = []
+        calls = []
+        lifecycle = Lifecycle(on_phase=lambda previous, phase: phases.append(phase))
+
+        async def hook():
+            calls.append(lifecycle.phase)
+
+        lifecycle.add_warmup("hook", hook)
+        assert not lifecycle.ready and lifecycle.accepting
+        await lifecycle.start_warm_up()
+        assert calls == [WARMING]
+        assert lifecycle.ready and phases == [SERVING]
+        assert lifecycle.warmup_report["hook"] >= 0
+
+    async def test_failed_hook_does_not_block_serving(self):
+        errors = []
+        lifecycle = Lifecycle(on_warmup_error=lambda name, error: errors.append(name))
+
+        async def broken():
+            raise RuntimeError("sin caches")
+
+        lifecycle.add_warmup("broken", broken)
+        await lifecycle.start_warm_up()
+        assert lifecycle.ready
+        assert errors == ["broken"] and lifecycle.warmup_report["broken"] is None
+
+    async def test_drain_waits_for_in_flight_and_flushes(self):
+        flushes = []
+        lifecycle = Lifecycle(warm=False)
+        lifecycle.add_flush("logs", lambda timeout: flushes.append(timeout) or True)
+        assert lifecycle.enter()
+
+        task = lifecycle.drain(timeout=5, flush_timeout=2)
+        await asyncio.sleep(0.01)
+        assert lifecycle.phase == DRAINING and not lifecycle.enter()
+        lifecycle.exit()
+
+        report = await task
+        assert lifecycle.phase == DRAINED
+        assert report["completed"] == 1 and report["abandoned"] == 0
+        assert report["flushed"] == {"logs": True} and flushes == [2]
+        # Idempotente
+        assert lifecycle.drain(timeout=5) is task
+
+    async def test_drain_deadline_abandons_in_flight(self):
+        failed = []
+        lifecycle = Lifecycle(warm=False, on_flush_error=failed.append)
+        lifecycle.add_flush("spans", lambda timeout: False)
+        lifecycle.enter()
+
+        report = await lifecycle.drain(timeout=0.05)
+        assert report["abandoned"] == 1 and report["completed"] == 0
+        assert failed == ["spans"]
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def test_drain_middleware():
+    lifecycle = Lifecycle(warm=False)
+    rejected = []
+    test_client = TestClient(DrainMiddleware(ok_app, lifecycle, on_reject=lambda: rejected.append(1)))
+    response = test_client.post("/api/v1/validate")
+    assert response.status_code == 200 and "connection" not in response.headers
+
+    lifecycle.phase = DRAINING
+    response = test_client.post("/api/v1/validate")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1" and response.headers["connection"] == "close"
+    assert rejected == [1]
+    # El resto de las rutas sigue respondiendo, pero cierra la conexión
+    response = test_client.get("/health")
+    assert response.status_code == 200 and response.headers["connection"] == "close"
+    assert lifecycle.in_flight == 0
+
+
+class TestLifecycleEndpoints:
+    """Tests de /ready, el calentamiento de la app y el drenado por endpoint"""
+
+    def test_ready_is_false_while_warming(self, monkeypatch):
+        monkeypatch.setattr(main, "lifecycle", Lifecycle())
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json() == {"ready": False, "phase": WARMING}
+
+    @pytest.mark.asyncio
+    async def test_warm_up_validations_run_the_hot_path(self, monkeypatch):
+        monkeypatch.setattr(main, "WARMUP_TRANSACTIONS", 4)
+        written = []
+        monkeypatch.setattr(main, "result_outbox", type("Outbox", (), {"append": written.append})())
+        velocity_accounts = len(main.velocity_index)
+        matches = [replay_matches(kind) for kind in ("transaction_id", "transaction")]
+        await main.warm_up_validations()
+        assert written == []
+        # El estado compartido con el tráfico real no cambia
+        assert len(main.velocity_index) == velocity_accounts
+        assert [replay_matches(kind) for kind in ("transaction_id", "transaction")] == matches
+        assert len(main.warmup_velocity_index) > 0
+        body = json.loads(main.warmup_transactions(1)[0])
+        assert not main.replay_filter.check_and_add(f"id:{body['transaction_id']}")
+
+    def test_drain_endpoint(self, monkeypatch):
+        monkeypatch.delenv("PREFORK_MASTER_PID", raising=False)
+        monkeypatch.setattr(main, "lifecycle", Lifecycle(warm=False))
+        response = client.post("/api/v1/admin/drain?wait=true")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["phase"] == DRAINED and body["drain"]["abandoned"] == 0
+        assert client.get("/ready").status_code == 503
+        assert client.get("/api/v1/admin/lifecycle").json()["phase"] == DRAINED
@@ -0,0 +1,106 @@
+"""
+Tests para el outbox de resultados
+"""
+import glob
+import os
+import time
+
+import pytest
+
+from src.outbox import OutboxError, ResultOutbox, encode_record, read_records
+
+
+def segments(directory):
+    return sorted(glob.glob(os.path.join(directory, "results-*.seg")))
+
+
+class TestResultOutbox:
+    """Tests del escritor por lotes"""
+
+    def test_records_are_written_in_batches(self, tmp_path):
+        flushes = []
+        outbox = ResultOutbox(str(tmp_path), batch_size=10, flush_interval=0.5,
+                              on_flush=lambda count, seconds: flushes.append(count))
+        for i in range(25):
+            outbox.append(b'{"n": %d}' % i)
+        assert outbox.flush()
+        outbox.close()
+
+        [segment] = segments(str(tmp_path))
+        records, offset = read_records(segment)
+        assert records == [b'{"n": %d}' % i for i in range(25)]
+        assert offset == os.path.getsize(segment)
+        assert flushes == [10, 10, 5]
+
+    def test_partial_batch_is_flushed_by_time(self, tmp_path):
+        outbox = ResultOutbox(str(tmp_path), batch_size=1000, flush_interval=0.02)
+        outbox.append(b"uno")
+        time.sleep(0.2)
+        [segment] = segments(str(tmp_path))
+        assert read_records(segment)[0] == [b"uno"]
+        outbox.close()
+
+    def test_full_queue_drops_without_blocking(self, tmp_path):
+        dropped = []
+        outbox = ResultOutbox(str(tmp_path), queue_size=1, flush_interval=0.5, batch_size=1000,
+                              on_drop=lambda reason, count: dropped.append(reason))
+        # El escritor retiene el primero en su lote; la cola admite uno más
+        for _ in range(10):
+            outbox.append(b"x")
+        assert "queue_full" in dropped
+        outbox.close()
+        outbox.append(b"x")
+        assert dropped[-1] == "closed"
+
+    def test_segments_rotate_by_size(self, tmp_path):
+        outbox = ResultOutbox(str(tmp_path), batch_size=1, flush_interval=0, segment_bytes=100,
+                              fsync="never")
+        for _ in range(5):
+            outbox.append(b"x" * 60)
+        outbox.close()
+        # Se rota al superar el límite: dos registros de 68 bytes por segmento
+        files = segments(str(tmp_path))
+        assert [len(read_records(path)[0]) for path in files] == [2, 2, 1]
+
+    def test_unknown_fsync_policy(self, tmp_path):
+        with pytest.raises(ValueError):
+            ResultOutbox(str(tmp_path), fsync="a-veces")
+
+    def test_append_is_cheap(self, tmp_path):
+        outbox = ResultOutbox(str(tmp_path), fsync="never")
+        payload = b'{"transaction_id": "TX-1", "is_valid": true}'
+        start = time.perf_counter()
+        for _ in range(5000):
+            outbox.append(payload)
+        elapsed = time.perf_counter() - start
+        outbox.close()
+        # 5k resultados/s no deben costar más de una fracción de ms cada uno
+        assert elapsed / 5000 < 0.0001
+
+
+class TestReadRecords:
+    """Tests del lector de segmentos"""
+
+    def test_tail_leaves_incomplete_record(self, tmp_path):
+        path = str(tmp_path / "segment.seg")
+        complete = encode_record(b"completo")
+        partial = encode_record(b"a medio escribir")[:10]
+        with open(path, "wb") as f:
+            f.write(complete + partial)
+
+        records, offset = read_records(path)
+        assert records == [b"completo"] and offset == len(complete)
+
+        with open(path, "ab") as f:
+            f.write(encode_record(b"a medio escribir")[10:])
+        records, offset = read_records(path, offset)
+        assert records == [b"a medio escribir"]
+
+    def test_corrupt_record(self, tmp_path):
+        path = str(tmp_path / "segment.seg")
+        record = bytearray(encode_record(b"dato"))
+        record[-1] ^= 0xFF
+        with open(path, "wb") as f:
+            f.write(record)
+        with pytest.raises(OutboxError):
+            read_records(path)
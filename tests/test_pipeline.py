@@ -0,0 +1,192 @@
+"""
+Tests para el pipeline asíncrono de validación
+"""
+import asyncio
+import time
+
+import pytest
+from httpx import AsyncClient
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from src.main import app
+from src.pipeline import ASYNC, CPU, Stage, ValidationPipeline
+
+tracer = trace.get_tracer(__name__)
+
+
+async def slow_stage(transaction):
+    await asyncio.sleep(0.1)
+    return {'slow': True}, ["lento"]
+
+
+def cpu_stage(transaction):
+    time.sleep(0.1)
+    return {'cpu': True}, []
+
+
+def inline_stage(transaction):
+    return {'inline': transaction == "tx"}, ["inline"]
+
+
+@pytest.mark.asyncio
+class TestValidationPipeline:
+    """Tests del pipeline de etapas"""
+
+    async def test_async_stages_run_concurrently(self):
+        """Las etapas asíncronas se ejecutan en paralelo"""
+        pipeline = ValidationPipeline(tracer, [
+            Stage("a", slow_stage, kind=ASYNC),
+            Stage("b", slow_stage, kind=ASYNC),
+            Stage("c", slow_stage, kind=ASYNC),
+        ])
+        start = time.perf_counter()
+        await pipeline.run("tx")
+        assert time.perf_counter() - start < 0.25
+
+    async def test_cpu_stage_does_not_block_loop(self):
+        """Las etapas CPU-bound corren en el executor"""
+        pipeline = ValidationPipeline(tracer, [Stage("cpu", cpu_stage, kind=CPU)], max_workers=2)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        checks, _ = await pipeline.run("tx")
+        task.cancel()
+        pipeline.shutdown()
+
+        assert checks == {'cpu': True}
+        assert ticks >= 5
+
+    async def test_results_keep_declaration_order(self):
+        """Checks y advertencias respetan el orden de las etapas"""
+        pipeline = ValidationPipeline(tracer, [
+            Stage("slow", slow_stage, kind=ASYNC),
+            Stage("inline", inline_stage),
+        ])
+        checks, warnings = await pipeline.run("tx")
+        assert list(checks) == ['slow', 'inline']
+        assert warnings == ["lento", "inline"]
+
+    async def test_collapsed_stages_become_parent_attributes(self):
+        """Con collapse_spans las etapas se registran en el span padre"""
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        local_tracer = provider.get_tracer(__name__)
+        pipeline = ValidationPipeline(local_tracer, [
+            Stage("slow", slow_stage, kind=ASYNC),
+            Stage("inline", inline_stage),
+        ], collapse_spans=True)
+
+        with local_tracer.start_as_current_span("validate"):
+            checks, _ = await pipeline.run("tx")
+
+        spans = exporter.get_finished_spans()
+        assert [span.name for span in spans] == ["validate"]
+        attributes = spans[0].attributes
+        assert attributes["check.slow"] is True
+        assert attributes["check.inline"] is True
+        assert attributes["stage.slow.duration_ms"] >= 100
+        assert checks == {'slow': True, 'inline': True}
+
+    async def test_exhausted_budget_uses_fallback(self):
+        """Una etapa que agota su presupuesto se cancela y usa su respaldo"""
+        exhausted = []
+        pipeline = ValidationPipeline(tracer, [
+            Stage("inline", inline_stage),
+            Stage("slow", slow_stage, kind=ASYNC, budget=0.02,
+                  fallback=lambda transaction: ({'slow': False}, ["sin tiempo"])),
+        ], on_budget_exhausted=exhausted.append)
+
+        start = time.perf_counter()
+        checks, warnings, skipped = await pipeline.run_with_deadline("tx", None)
+        assert time.perf_counter() - start < 0.08
+        assert checks == {'inline': True, 'slow': False}
+        assert warnings == ["inline", "sin tiempo"]
+        assert skipped == exhausted == ["slow"]
+
+    async def test_expired_deadline_fails_closed(self):
+        """Con el deadline vencido ninguna etapa corre; sin respaldo fallan cerradas"""
+        calls = []
+        pipeline = ValidationPipeline(tracer, [
+            Stage("inline", lambda transaction: calls.append(transaction) or ({'inline': True}, [])),
+            Stage("slow", slow_stage, kind=ASYNC),
+        ])
+
+        checks, warnings, skipped = await pipeline.run_with_deadline("tx", time.monotonic())
+        assert calls == []
+        assert checks == {'inline': False, 'slow': False}
+        assert len(warnings) == 2
+        assert skipped == ["inline", "slow"]
+
+    async def test_deadline_bounds_stage_without_budget(self):
+        """El tiempo restante del deadline acota a las etapas sin presupuesto propio"""
+        pipeline = ValidationPipeline(tracer, [Stage("slow", slow_stage, kind=ASYNC)])
+        checks, _, skipped = await pipeline.run_with_deadline("tx", time.monotonic() + 0.02)
+        assert checks == {'slow': False}
+        assert skipped == ["slow"]
+
+        checks, _, skipped = await pipeline.run_with_deadline("tx", time.monotonic() + 1)
+        assert checks == {'slow': True}
+        assert skipped == []
+
+    async def test_endpoint_serves_concurrent_requests(self):
+        """El endpoint atiende requests concurrentes sin serializarlas"""
+        transactions = [
+            {
+                "transaction_id": f"TX-C{i:03d}",
+                "amount": 1000,
+                "currency": "MXN",
+                "sender_account": "1234567890",
+                "receiver_account": "0987654321"
+            }
+            for i in range(20)
+        ]
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                client.post("/api/v1/validate", json=transaction)
+                for transaction in transactions
+            ))
+            elapsed = time.perf_counter() - start
+
+        # En serie tomaría al menos 20 * 60ms
+        assert elapsed < 1.0
+
+
+class TestRequestDeadline:
+    """Tests del deadline por request en /api/v1/validate"""
+
+    def test_header_shortens_default_deadline(self):
+        from src.main import VALIDATION_DEADLINE, request_deadline
+
+        assert request_deadline(None, 10.0) == 10.0 + VALIDATION_DEADLINE
+        assert request_deadline("50", 10.0) == pytest.approx(10.05)
+        assert request_deadline("600000", 10.0) == 10.0 + VALIDATION_DEADLINE
+        assert request_deadline("abc", 10.0) == 10.0 + VALIDATION_DEADLINE
+
+    @pytest.mark.asyncio
+    async def test_expired_deadline_returns_504(self):
+        transaction = {
+            "transaction_id": "TX-DEADLINE",
+            "amount": 1000,
+            "currency": "MXN",
+            "sender_account": "1234567890",
+            "receiver_account": "0987654321"
+        }
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post(
+                "/api/v1/validate", json=transaction, headers={"X-Request-Timeout-Ms": "1"}
+            )
+            metrics = (await client.get("/metrics")).text
+
+        assert response.status_code == 504
+        assert "transaction_validator_deadline_exceeded_total" in metrics
@@ -0,0 +1,135 @@
+"""
+Tests para los timers por etapa y el profiler por muestreo
+"""
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import main
+from src.profiling import NULL_LAP, LogHistogram, ProfilerBusy, SamplingProfiler, StageTimers, collapsed
+
+client = TestClient(main.app)
+
+
+class TestLogHistogram:
+    """Tests del histograma log-lineal"""
+
+    def test_percentiles_have_bounded_relative_error(self):
+        histogram = LogHistogram(precision=0.01)
+        for i in range(1, 1001):
+            histogram.record(i / 1000)
+        assert histogram.count == 1000
+        assert histogram.percentile(50) == pytest.approx(0.5, rel=0.02)
+        assert histogram.percentile(99) == pytest.approx(0.99, rel=0.02)
+        assert histogram.percentile(100) == 1.0
+        assert histogram.summary()["mean_ms"] == pytest.approx(500.5)
+
+    def test_empty(self):
+        assert LogHistogram().percentile(95) == 0.0
+
+
+class TestStageTimers:
+    """Tests de los timers por etapa"""
+
+    def test_disabled_timers_record_nothing(self):
+        timers = StageTimers(enabled=False)
+        lap = timers.lap()
+        assert lap is NULL_LAP
+        lap.mark("parse")
+        assert timers.snapshot() == {}
+
+    def test_laps_record_each_stage(self):
+        timers = StageTimers(enabled=True)
+        lap = timers.lap()
+        time.sleep(0.01)
+        lap.mark("sleep")
+        lap.mark("nada")
+        stages = timers.snapshot()
+        assert stages["sleep"]["count"] == 1 and stages["sleep"]["p50_ms"] >= 10
+        assert stages["nada"]["p50_ms"] < 5
+        timers.reset()
+        assert timers.snapshot() == {}
+
+
+def spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler:
+    """Tests del profiler por muestreo"""
+
+    def test_profile_collects_collapsed_stacks(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=spin, args=(stop,), name="spinner")
+        worker.start()
+        try:
+            stacks = SamplingProfiler(interval=0.002).profile(0.2)
+        finally:
+            stop.set()
+            worker.join()
+        spinner = [stack for stack in stacks if stack.startswith("spinner;")]
+        assert spinner and any("spin (" in stack.split(";")[-1] for stack in spinner)
+
+        lines = collapsed(stacks).splitlines()
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+    def test_one_profile_at_a_time(self):
+        profiler = SamplingProfiler()
+        runner = threading.Thread(target=profiler.profile, args=(0.3,))
+        runner.start()
+        time.sleep(0.05)
+        with pytest.raises(ProfilerBusy):
+            profiler.profile(0.1)
+        runner.join()
+        assert not profiler.running
+
+    @pytest.mark.asyncio
+    async def test_run_uses_a_dedicated_thread_and_rejects_concurrent_runs(self):
+        profiler = SamplingProfiler(interval=0.002)
+        first = asyncio.ensure_future(profiler.run(0.2))
+        await asyncio.sleep(0)
+        assert profiler.running
+        # El segundo se rechaza sin encolarse detrás del primero
+        with pytest.raises(ProfilerBusy):
+            await profiler.run(0.1)
+        stacks = await first
+        assert not profiler.running
+        assert stacks
+        assert profiler._executor._thread_name_prefix == "profiler"
+        profiler.shutdown()
+
+    def test_collapsed_orders_by_samples(self):
+        assert collapsed(Counter({"a;b": 1, "a;c": 3})) == "a;c 3\na;b 1\n"
+
+
+class TestProfilingEndpoints:
+    """Tests de los endpoints de administración"""
+
+    def test_disabled_by_default(self):
+        assert client.get("/api/v1/admin/timers").status_code == 404
+        assert client.post("/api/v1/admin/profile?seconds=0.1").status_code == 404
+
+    def test_timers_cover_the_hot_path(self, monkeypatch, sample_transaction):
+        monkeypatch.setattr(main.stage_timers, "enabled", True)
+        main.stage_timers.reset()
+        assert client.post("/api/v1/validate", json=sample_transaction).status_code in (200, 500)
+
+        stages = client.get("/api/v1/admin/timers?reset=true").json()["stages"]
+        assert {"validate.read_body", "validate.parse", "process.simulated_latency",
+                "middleware.app", "middleware.metrics"} <= set(stages)
+        # Después del reset sólo queda el middleware del propio GET anterior
+        assert not any(stage.startswith("validate.") for stage in client.get("/api/v1/admin/timers").json()["stages"])
+
+    def test_profile_endpoint(self, monkeypatch):
+        monkeypatch.setattr(main, "PROFILING_ENABLED", True)
+        response = client.post("/api/v1/admin/profile?seconds=0.1&interval_ms=2")
+        assert response.status_code == 200
+        assert int(response.headers["x-profile-samples"]) > 0
+        assert response.text.strip()
+
+        assert client.post("/api/v1/admin/profile?seconds=3600").status_code == 422
@@ -0,0 +1,107 @@
+"""
+Tests para la detección de duplicados y reenvíos
+"""
+import os
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.checks import DUPLICATE_WARNING, REPLAY_WARNING
+from src.main import app
+from src.replay import ReplayFilter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestReplayFilter:
+    """Tests del filtro por ventana de tiempo"""
+
+    def test_detects_repeats_without_false_negatives(self):
+        replay = ReplayFilter(memory_bytes=1024 * 1024)
+        keys = [f"TX-{i}" for i in range(5000)]
+        assert not any(replay.check_and_add(key) for key in keys)
+        assert all(replay.check_and_add(key) for key in keys)
+
+    def test_false_positive_rate_within_target(self):
+        replay = ReplayFilter(memory_bytes=1024 * 1024, false_positive_rate=0.01)
+        for i in range(10000):
+            replay.check_and_add(f"TX-{i}")
+        false_positives = sum(replay.check_and_add(f"NEW-{i}") for i in range(10000))
+        assert false_positives <= 200
+        assert replay.estimated_false_positive_rate() < 0.01
+
+    def test_keys_expire_after_window(self):
+        clock = FakeClock()
+        replay = ReplayFilter(window_seconds=100, partitions=4, memory_bytes=64 * 1024, clock=clock)
+        replay.check_and_add("TX-1")
+        clock.now = 99
+        assert replay.check_and_add("TX-1")
+        # Re-agregada a los 99 s: se recuerda al menos hasta los 199 s
+        clock.now = 198
+        assert replay.check_and_add("TX-1")
+        clock.now = 500
+        assert not replay.check_and_add("TX-1")
+
+    def test_memory_is_fixed(self):
+        replay = ReplayFilter(memory_bytes=64 * 1024)
+        before = replay.memory_bytes
+        for i in range(50000):
+            replay.check_and_add(f"TX-{i}")
+        assert replay.memory_bytes == before <= 64 * 1024
+        assert replay.stats()["estimated_false_positive_rate"] > replay.false_positive_rate
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="requiere fork")
+    def test_filters_are_shared_across_fork(self):
+        replay = ReplayFilter(memory_bytes=64 * 1024)
+        pid = os.fork()
+        if pid == 0:
+            replay.check_and_add("DEL-HIJO")
+            os._exit(0)
+        os.waitpid(pid, 0)
+        assert replay.check_and_add("DEL-HIJO")
+
+    @pytest.mark.parametrize("kwargs", [
+        {"window_seconds": 0},
+        {"partitions": 0},
+        {"false_positive_rate": 1.0},
+        {"memory_bytes": 16},
+    ])
+    def test_rejects_invalid_parameters(self, kwargs):
+        with pytest.raises(ValueError):
+            ReplayFilter(**kwargs)
+
+
+class TestReplayEndpoints:
+    """Tests de la integración con la validación"""
+
+    def test_repeated_transaction_gets_warnings(self, sample_transaction):
+        client = TestClient(app)
+        transaction = dict(sample_transaction, transaction_id=f"REPLAY-{uuid.uuid4()}", amount=1234.56)
+
+        first = client.post("/api/v1/validate", json=transaction)
+        if first.status_code == 500:
+            pytest.skip("Error simulado del procesamiento")
+        assert REPLAY_WARNING not in first.json()["warnings"]
+
+        resent = client.post("/api/v1/validate", json=dict(transaction, amount=99.5))
+        if resent.status_code == 500:
+            pytest.skip("Error simulado del procesamiento")
+        assert REPLAY_WARNING in resent.json()["warnings"]
+
+        twice = client.post("/api/v1/validate", json=dict(transaction, transaction_id=f"REPLAY-{uuid.uuid4()}"))
+        if twice.status_code == 500:
+            pytest.skip("Error simulado del procesamiento")
+        warnings = twice.json()["warnings"]
+        assert DUPLICATE_WARNING in warnings and REPLAY_WARNING not in warnings
+
+    def test_stats_endpoint(self):
+        stats = TestClient(app).get("/api/v1/admin/replay-filter").json()
+        assert stats["partitions"] == 4
+        assert stats["estimated_false_positive_rate"] < stats["target_false_positive_rate"]
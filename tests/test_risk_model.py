@@ -0,0 +1,125 @@
+"""
+Tests para el modelo de riesgo en proceso
+"""
+import json
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.risk_model import (
+    FEATURES,
+    LogisticModel,
+    RiskModelError,
+    RiskScorer,
+    build_model,
+    feature_matrix,
+    register_model_type,
+)
+
+MODEL = {
+    "version": "test",
+    "type": "logistic",
+    "features": ["log_amount", "currency_usd", "same_bank"],
+    "weights": [1.0, 2.0, -1.0],
+    "bias": -10.0,
+    "threshold": 0.5,
+    "warning_threshold": 0.2,
+}
+
+
+def tx(amount=1000.0, currency="MXN", sender="0120000000", receiver="0720000000",
+       timestamp=datetime(2025, 1, 1, 18, 0), description=None):
+    return SimpleNamespace(amount=amount, currency=currency, sender_account=sender,
+                           receiver_account=receiver, timestamp=timestamp, description=description)
+
+
+class TestFeatures:
+    """Tests de la extracción vectorizada de features"""
+
+    def test_feature_matrix(self):
+        matrix = feature_matrix(
+            ["log_amount", "currency_usd", "currency_other", "same_bank", "has_description"],
+            [tx(), tx(currency="USD", sender="0721111111", description="pago"), tx(currency="JPY")],
+        )
+        assert matrix.shape == (3, 5)
+        assert matrix[0, 0] == pytest.approx(np.log1p(1000.0))
+        assert matrix[:, 1].tolist() == [0, 1, 0]
+        assert matrix[:, 2].tolist() == [0, 0, 1]
+        assert matrix[:, 3].tolist() == [0, 1, 0]
+        assert matrix[:, 4].tolist() == [0, 1, 0]
+
+    def test_hour_uses_utc(self):
+        local = datetime(2025, 1, 1, 0, 0, tzinfo=timezone.utc).astimezone()
+        aware = feature_matrix(["hour_sin", "hour_cos"], [tx(timestamp=local)])
+        assert aware[0].tolist() == pytest.approx([0.0, 1.0])
+
+
+class TestLogisticModel:
+    """Tests del modelo logístico"""
+
+    def test_scores_single_and_batch_alike(self):
+        model = build_model(MODEL)
+        batch = [tx(), tx(amount=100000.0, currency="USD"), tx(sender="0720000000")]
+        scores = model.score(batch)
+        assert scores.shape == (3,)
+        assert [model.score([t])[0] for t in batch] == pytest.approx(scores.tolist())
+        expected = 1 / (1 + np.exp(-(np.log1p(100000.0) + 2.0 - 10.0)))
+        assert scores[1] == pytest.approx(expected)
+        assert scores[2] < scores[0]
+
+    @pytest.mark.parametrize("change", [
+        {"type": "svm"},
+        {"features": ["log_amount", "desconocida", "same_bank"]},
+        {"features": ["log_amount", "log_amount", "same_bank"]},
+        {"weights": [1.0, 2.0]},
+        {"weights": [1.0, "2", -1.0]},
+        {"bias": float("nan")},
+        {"threshold": 1.5},
+        {"warning_threshold": 0.9},
+    ])
+    def test_invalid_models_are_rejected(self, change):
+        with pytest.raises(RiskModelError):
+            build_model({**MODEL, **change})
+
+    def test_custom_model_type(self):
+        class Constant:
+            version = "const"
+            threshold = 0.5
+            warning_threshold = 0.5
+
+            def score(self, transactions):
+                return np.full(len(transactions), 0.25)
+
+        register_model_type("constant-test", lambda spec: Constant())
+        assert build_model({"type": "constant-test"}).score([tx()]).tolist() == [0.25]
+
+    def test_single_transaction_latency(self):
+        model = build_model({**MODEL, "features": list(FEATURES), "weights": [0.1] * len(FEATURES)})
+        transaction = tx()
+        model.score([transaction])
+        start = time.perf_counter()
+        for _ in range(1000):
+            model.score([transaction])
+        assert (time.perf_counter() - start) / 1000 < 0.0005
+
+
+class TestRiskScorer:
+    """Tests de la recarga en caliente"""
+
+    def test_reload_swaps_model_and_keeps_current_on_error(self, tmp_path):
+        path = tmp_path / "model.json"
+        path.write_text(json.dumps(MODEL))
+        scorer = RiskScorer(str(path))
+        first = scorer.model
+        assert isinstance(first, LogisticModel)
+
+        path.write_text(json.dumps({**MODEL, "version": "v2"}))
+        assert scorer.reload().version == "v2"
+
+        path.write_text("{roto")
+        with pytest.raises(RiskModelError):
+            scorer.reload()
+        assert scorer.model.version == "v2"
@@ -0,0 +1,183 @@
+"""
+Tests para el motor de reglas declarativo
+"""
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import app, rule_engine
+from src.fx import parse_fx_table
+from src.rules import RuleEngine, RuleError, compile_rules
+
+client = TestClient(app)
+
+
+def make_tx(**overrides):
+    values = dict(
+        transaction_id="TX-R001",
+        amount=1000.0,
+        currency="MXN",
+        sender_account="1234567890",
+        receiver_account="0987654321",
+        description=None,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+class TestCompileRules:
+    """Tests de compilación y evaluación"""
+
+    def test_default_rules_match_original_checks(self):
+        checks, warnings = rule_engine.evaluate(make_tx())
+        assert checks == {
+            'amount_within_limits': True,
+            'valid_sender': True,
+            'valid_receiver': True,
+            'different_accounts': True,
+            'compliance': True,
+        }
+        assert warnings == []
+
+        checks, warnings = rule_engine.evaluate(make_tx(amount=750000.0, receiver_account="1234567890"))
+        assert checks['different_accounts'] is False
+        assert warnings == ["Transacción de alto valor - requiere aprobación adicional"]
+
+    def test_composite_rules_evaluate_cheap_conditions_first(self):
+        plan = compile_rules({"checks": [{
+            "name": "mx_local",
+            "all": [
+                {"field": "description", "op": "regex", "value": "pago.*"},
+                {"field": "currency", "op": "eq", "value": "MXN"},
+            ]
+        }]})
+        # La comparación barata va antes que la regex
+        assert plan.source.index("==") < plan.source.index("fullmatch")
+        assert plan.evaluate(make_tx(description="pago renta"))[0] == {"mx_local": True}
+        assert plan.evaluate(make_tx(currency="USD", description="pago"))[0] == {"mx_local": False}
+
+    def test_checks_keep_declared_order(self):
+        plan = compile_rules({"checks": [
+            {"name": "b_regex", "field": "transaction_id", "op": "regex", "value": "TX-.*"},
+            {"name": "a_amount", "field": "amount", "op": "gt", "value": 0},
+        ]})
+        assert list(plan.evaluate(make_tx())[0]) == ["b_regex", "a_amount"]
+
+    @pytest.mark.parametrize("spec", [
+        {"checks": []},
+        {"checks": [{"name": "x", "field": "__class__", "op": "eq", "value": 1}]},
+        {"checks": [{"name": "x", "field": "amount", "op": "exec", "value": 1}]},
+        {"checks": [{"name": "x", "field": "amount", "op": "gt", "value": 1}] * 2},
+        {"checks": [{"name": "x", "field": "amount", "op": "gt", "value": 1}], "warnings": [
+            {"name": "w", "field": "amount", "op": "gt", "value": 1}
+        ]},
+        {"checks": [{"name": "x", "field": "amount", "op": "le", "value": float("inf")}]},
+        {"checks": [{"name": "x", "field": "amount", "op": "le", "value": "abc"}]},
+        {"checks": [{"name": "x", "field": "currency", "op": "in", "value": [["MXN"]]}]},
+        {"checks": [{"name": "x", "field": "currency", "op": "in", "value": "MXN"}]},
+        {"checks": [{"name": "x", "field": "sender_account", "op": "min_len", "value": "10"}]},
+        {"checks": [{"name": "x", "field": "description", "op": "regex", "value": "("}]},
+        {"checks": [{"name": "x", "not": "amount"}]},
+        {"checks": ["amount"]},
+        {"checks": [{"name": "x", "field": "amount", "op": "gt", "value": 1}], "input": {"max_amount": -1}},
+        {"checks": [{"name": "x", "field": "amount", "op": "gt", "value": 1}], "input": {"currencies": "MXN"}},
+        [],
+    ])
+    def test_invalid_specs_are_rejected(self, spec):
+        with pytest.raises(RuleError):
+            compile_rules(spec)
+
+    def test_many_rules_stay_in_microseconds(self):
+        plan = compile_rules({"checks": [
+            {"name": f"rule_{i}", "field": "amount", "op": "le", "value": 1000000 + i}
+            for i in range(120)
+        ]})
+        tx = make_tx()
+        iterations = 2000
+        start = time.perf_counter()
+        for _ in range(iterations):
+            plan.evaluate(tx)
+        per_call = (time.perf_counter() - start) / iterations
+        assert per_call < 100e-6
+
+
+class TestRuleReload:
+    """Tests de recarga en caliente"""
+
+    def test_reload_swaps_plan_atomically(self, tmp_path):
+        path = tmp_path / "rules.json"
+        path.write_text(json.dumps({"version": "1", "checks": [
+            {"name": "limit", "field": "amount", "op": "le", "value": 100}
+        ]}))
+        engine = RuleEngine(str(path))
+        old_plan = engine.plan
+        assert engine.evaluate(make_tx(amount=500.0))[0] == {"limit": False}
+
+        path.write_text(json.dumps({"version": "2", "checks": [
+            {"name": "limit", "field": "amount", "op": "le", "value": 1000}
+        ]}))
+        engine.reload()
+
+        assert engine.plan.version == "2"
+        assert engine.evaluate(make_tx(amount=500.0))[0] == {"limit": True}
+        # Una request en vuelo con el plan anterior sigue funcionando
+        assert old_plan.evaluate(make_tx(amount=500.0))[0] == {"limit": False}
+
+    def test_invalid_reload_keeps_current_plan(self, tmp_path):
+        path = tmp_path / "rules.json"
+        path.write_text(json.dumps({"version": "1", "checks": [
+            {"name": "limit", "field": "amount", "op": "le", "value": 100}
+        ]}))
+        engine = RuleEngine(str(path))
+        path.write_text("{no es json")
+
+        with pytest.raises(RuleError):
+            engine.reload()
+        assert engine.plan.version == "1"
+
+    def test_reload_rejects_non_finite_values(self, tmp_path):
+        path = tmp_path / "rules.json"
+        path.write_text(json.dumps({"version": "1", "checks": [
+            {"name": "limit", "field": "amount", "op": "le", "value": 100}
+        ]}))
+        engine = RuleEngine(str(path))
+        path.write_text('{"version": "2", "checks": [{"name": "limit", "field": "amount", "op": "le", "value": Infinity}]}')
+
+        with pytest.raises(RuleError):
+            engine.reload()
+        assert engine.plan.version == "1"
+        assert engine.evaluate(make_tx(amount=50.0))[0] == {"limit": True}
+
+    def test_input_bounds_follow_active_plan(self, monkeypatch):
+        transaction = {
+            "transaction_id": "TX-R-INPUT",
+            "amount": 1500000,
+            "currency": "JPY",
+            "sender_account": "1234567890",
+            "receiver_account": "0987654321"
+        }
+        assert client.post("/api/v1/validate/batch", json=[transaction]).json()["failed"] == 1
+
+        spec = json.loads(open(rule_engine.path, encoding="utf-8").read())
+        spec["input"] = {"max_amount": 2000000, "currencies": ["MXN", "USD", "EUR", "JPY"]}
+        fx = rule_engine.plan.fx
+        jpy = parse_fx_table({"version": "jpy", "base": fx.base, "rates": dict(fx.rates, JPY="0.11")})
+        monkeypatch.setattr(rule_engine, "plan", compile_rules(spec, fx=jpy))
+
+        body = client.post("/api/v1/validate/batch", json=[transaction]).json()
+        checks = body["results"][0]["result"]["checks_passed"]
+        assert checks["compliance"] is False
+        # 1,500,000 JPY = 165,000 MXN: dentro del límite en moneda base
+        assert checks["amount_within_limits"] is True
+
+    def test_admin_endpoints(self):
+        response = client.get("/api/v1/admin/rules")
+        assert response.status_code == 200
+        assert "amount_within_limits" in response.json()["checks"]
+
+        response = client.post("/api/v1/admin/rules/reload")
+        assert response.status_code == 200
+        assert response.json()["rules"] == len(rule_engine.plan)
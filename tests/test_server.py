@@ -0,0 +1,129 @@
+"""
+Tests para el servidor multiproceso
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+from src.server import available_cpus, bind_socket, prepare_multiprocess_dir
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestWorkerCount:
+    """Tests de detección de CPUs"""
+
+    def test_cgroup_quota_limits_cpus(self, tmp_path):
+        cpu_max = tmp_path / "cpu.max"
+        cpu_max.write_text("150000 100000\n")
+        assert available_cpus(str(cpu_max)) == min(2, len(os.sched_getaffinity(0)))
+
+    def test_unlimited_quota_uses_affinity(self, tmp_path):
+        cpu_max = tmp_path / "cpu.max"
+        cpu_max.write_text("max 100000\n")
+        assert available_cpus(str(cpu_max)) == len(os.sched_getaffinity(0))
+        assert available_cpus(str(tmp_path / "missing")) == len(os.sched_getaffinity(0))
+
+    def test_multiprocess_dir_is_cleaned(self, tmp_path, monkeypatch):
+        (tmp_path / "counter_1.db").write_bytes(b"x")
+        monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+        assert prepare_multiprocess_dir() == str(tmp_path)
+        assert os.listdir(tmp_path) == []
+
+    def test_accepted_connections_disable_nagle(self):
+        # asyncio sólo activa TCP_NODELAY en sockets aceptados de un socket IPPROTO_TCP
+        sock = bind_socket("127.0.0.1", 0)
+        with sock:
+            assert sock.proto == socket.IPPROTO_TCP
+
+
+def start_server(workers: int, multiproc_dir):
+    """Arranca python -m src.server y espera a /health; retorna (proceso, URL base)"""
+    port = free_port()
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        HOST="127.0.0.1",
+        PORT=str(port),
+        PROMETHEUS_MULTIPROC_DIR=str(multiproc_dir),
+        JAEGER_HOST="127.0.0.1",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "src.server"], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            urllib.request.urlopen(f"{base}/health", timeout=1)
+            return proc, base
+        except OSError:
+            if time.monotonic() > deadline or proc.poll() is not None:
+                proc.kill()
+                pytest.fail("el servidor no arrancó")
+            time.sleep(0.1)
+
+
+class TestPreforkServer:
+    """Métricas agregadas entre workers"""
+
+    def test_single_worker_creates_multiprocess_dir(self, tmp_path):
+        # Como en la imagen: PROMETHEUS_MULTIPROC_DIR definido pero sin crear
+        multiproc_dir = tmp_path / "prometheus-multiproc"
+        proc, base = start_server(1, multiproc_dir)
+        try:
+            body = urllib.request.urlopen(f"{base}/metrics", timeout=5).read().decode()
+            assert "transaction_validator_requests_total" in body
+            assert multiproc_dir.is_dir()
+        finally:
+            proc.terminate()
+            assert proc.wait(timeout=15) == 0
+
+    def test_metrics_aggregate_across_workers(self, tmp_path):
+        proc, base = start_server(2, tmp_path)
+        try:
+            for _ in range(10):
+                urllib.request.urlopen(f"{base}/", timeout=5)
+            # Un archivo mmap de contadores por worker (más el del maestro)
+            assert len([n for n in os.listdir(tmp_path) if n.startswith("counter_")]) >= 2
+
+            def served():
+                body = urllib.request.urlopen(f"{base}/metrics", timeout=5).read().decode()
+                line = next(
+                    l for l in body.splitlines()
+                    if l.startswith('transaction_validator_requests_total{endpoint="/",method="GET"')
+                )
+                return float(line.split()[-1])
+
+            # El contador se incrementa al terminar de enviar la respuesta
+            deadline = time.monotonic() + 5
+            while served() < 10 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert served() == 10
+
+            def admission_limit():
+                body = urllib.request.urlopen(f"{base}/metrics", timeout=5).read().decode()
+                line = next(l for l in body.splitlines()
+                            if l.startswith("transaction_validator_admission_concurrency_limit "))
+                return float(line.split()[-1])
+
+            # Suma del límite inicial de cada worker, sin un valor fijo del maestro
+            deadline = time.monotonic() + 5
+            while admission_limit() != 200 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert admission_limit() == 200
+        finally:
+            proc.terminate()
+            assert proc.wait(timeout=15) == 0
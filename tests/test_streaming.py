@@ -0,0 +1,125 @@
+"""
+Tests para validación en streaming NDJSON
+"""
+import asyncio
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import app, validate_stream_file
+from src.streaming import LineTooLong, iter_lines, process_ordered
+
+client = TestClient(app)
+
+
+def make_line(i, **overrides):
+    transaction = {
+        "transaction_id": f"TX-S{i:05d}",
+        "amount": 1000 + i,
+        "currency": "MXN",
+        "sender_account": "1234567890",
+        "receiver_account": "0987654321"
+    }
+    transaction.update(overrides)
+    return json.dumps(transaction)
+
+
+async def chunks_of(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+@pytest.mark.asyncio
+class TestStreamingUtilities:
+    """Tests de lectura incremental y ventana acotada"""
+
+    async def test_iter_lines_across_chunks(self):
+        data = b'{"a": 1}\n\n{"b": 2}\n{"c": 3}'
+        lines = [line async for line in iter_lines(chunks_of(data, 3))]
+        assert lines == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+    async def test_iter_lines_rejects_long_lines(self):
+        data = b"x" * 50 + b"\nok\n"
+        lines = [line async for line in iter_lines(chunks_of(data, 7), max_line_bytes=10)]
+        assert isinstance(lines[0], LineTooLong)
+        assert lines[1] == b"ok"
+
+    async def test_process_ordered_bounds_in_flight(self):
+        in_flight = 0
+        peak = 0
+
+        async def items():
+            for i in range(50):
+                yield i
+
+        async def worker(index, item):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.001 * (item % 5))
+            in_flight -= 1
+            return item
+
+        results = [r async for r in process_ordered(items(), worker, max_in_flight=4)]
+        assert results == list(range(50))
+        assert peak <= 4
+
+    async def test_slow_consumer_applies_backpressure(self):
+        produced = 0
+
+        async def items():
+            nonlocal produced
+            for i in range(1000):
+                produced += 1
+                yield i
+
+        async def worker(index, item):
+            return item
+
+        stream = process_ordered(items(), worker, max_in_flight=8)
+        for _ in range(3):
+            await stream.__anext__()
+        await stream.aclose()
+
+        # Sólo se leyó lo necesario para llenar la ventana
+        assert produced <= 3 + 8
+
+
+class TestStreamEndpoint:
+    """Tests del endpoint /api/v1/validate/stream"""
+
+    def test_stream_results_in_order(self):
+        lines = [make_line(i) for i in range(10)]
+        lines.insert(3, make_line(99, currency="JPY"))
+        body = "\n".join(lines) + "\n"
+
+        response = client.post(
+            "/api/v1/validate/stream",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["index"] for r in results] == list(range(11))
+        assert "errors" in results[3]
+        assert results[0]["transaction_id"] == "TX-S00000"
+        assert results[10]["transaction_id"] == "TX-S00009"
+
+
+@pytest.mark.asyncio
+class TestStreamCli:
+    """Tests del modo CLI validate-stream"""
+
+    async def test_validate_stream_file(self):
+        source = io.BytesIO(("\n".join(make_line(i) for i in range(5)) + "\n").encode())
+        output = io.StringIO()
+
+        count = await validate_stream_file(source, output)
+
+        assert count == 5
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert [r["index"] for r in results] == list(range(5))
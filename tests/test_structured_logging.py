@@ -0,0 +1,128 @@
+"""
+Tests para el logging estructurado asíncrono
+"""
+import io
+import json
+import logging
+import threading
+import weakref
+
+from src.structured_logging import AsyncBatchHandler, JsonFormatter, TextFormatter
+
+
+class BlockingStream(io.StringIO):
+    """Stream que bloquea la escritura hasta que se libera el evento"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, s):
+        self.release.wait(5)
+        return super().write(s)
+
+
+def make_logger(handler, name):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    return logger
+
+
+class TestAsyncBatchHandler:
+    """Tests de formato, muestreo y descarte"""
+
+    def test_json_lines(self):
+        stream = io.StringIO()
+        handler = AsyncBatchHandler(stream=stream)
+        handler.setFormatter(JsonFormatter())
+        logger = make_logger(handler, "test.logging.json")
+
+        logger.info("Transacción %s validada", "TX-1", extra={"risk_level": "low"})
+        try:
+            raise ValueError("falla")
+        except ValueError:
+            logger.error("Error", exc_info=True)
+        assert handler.flush(timeout=5)
+        handler.close()
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert lines[0]["message"] == "Transacción TX-1 validada"
+        assert lines[0]["levelname"] == "INFO"
+        assert lines[0]["risk_level"] == "low"
+        assert lines[0]["otelTraceID"] == "0" * 32
+        assert "ValueError: falla" in lines[1]["exc_info"]
+
+    def test_text_format_keeps_trace_fields(self):
+        stream = io.StringIO()
+        handler = AsyncBatchHandler(stream=stream)
+        handler.setFormatter(TextFormatter())
+        logger = make_logger(handler, "test.logging.text")
+
+        logger.warning("aviso")
+        assert handler.flush(timeout=5)
+        handler.close()
+
+        assert "WARNING - aviso - [trace_id=" in stream.getvalue()
+
+    def test_sampling_keeps_warnings(self):
+        stream = io.StringIO()
+        drops = []
+        handler = AsyncBatchHandler(stream=stream, sample_rate=0.0, on_drop=drops.append)
+        handler.setFormatter(JsonFormatter())
+        logger = make_logger(handler, "test.logging.sampled")
+
+        for _ in range(10):
+            logger.info("éxito")
+        logger.error("error")
+        assert handler.flush(timeout=5)
+        handler.close()
+
+        lines = stream.getvalue().splitlines()
+        assert len(lines) == 1
+        assert json.loads(lines[0])["levelname"] == "ERROR"
+        assert drops == ["sampled"] * 10
+
+    def test_full_queue_drops_without_blocking(self):
+        stream = BlockingStream()
+        drops = []
+        handler = AsyncBatchHandler(stream=stream, queue_size=2, batch_size=1, on_drop=drops.append)
+        handler.setFormatter(JsonFormatter())
+        logger = make_logger(handler, "test.logging.full")
+
+        for i in range(20):
+            logger.warning("registro %d", i)
+        assert drops and set(drops) == {"queue_full"}
+
+        stream.release.set()
+        assert handler.flush(timeout=5)
+        handler.close()
+        assert len(stream.getvalue().splitlines()) == 20 - len(drops)
+
+    def test_flush_timeout(self):
+        stream = BlockingStream()
+        handler = AsyncBatchHandler(stream=stream)
+        handler.setFormatter(JsonFormatter())
+        logger = make_logger(handler, "test.logging.timeout")
+
+        logger.info("lento")
+        assert handler.flush(timeout=0.05) is False
+        stream.release.set()
+        assert handler.flush(timeout=5)
+        handler.close()
+
+    def test_log_after_close_does_not_hang_shutdown(self):
+        stream = io.StringIO()
+        handler = AsyncBatchHandler(stream=stream)
+        handler.setFormatter(JsonFormatter())
+        logger = make_logger(handler, "test.logging.closed")
+
+        logger.info("antes")
+        handler.close()
+        logger.warning("después del cierre")
+        logging.shutdown([weakref.ref(handler)])
+
+        messages = [json.loads(line)["message"] for line in stream.getvalue().splitlines()]
+        assert messages == ["antes", "después del cierre"]
+        assert handler.flush() is True
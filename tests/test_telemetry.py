@@ -0,0 +1,101 @@
+"""
+Tests para la telemetría diferida y el reporte de arranque
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from src.main import app
+from src.telemetry import LazyTracingMiddleware, StartupReport, Telemetry, process_uptime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestStartupReport:
+    """Tests del reporte de arranque"""
+
+    def test_measure_records_milliseconds(self):
+        clock = FakeClock()
+        report = StartupReport(clock=clock)
+        with report.measure("init.rules"):
+            clock.now = 0.25
+        report.record("imports", 0.5)
+        report.record("desconocido", None)
+        assert report.as_dict()["components_ms"] == {"init.rules": 250.0, "imports": 500.0}
+        assert report.as_dict()["total_ms"] == 750.0
+
+    def test_process_uptime(self):
+        uptime = process_uptime()
+        assert uptime is None or 0 <= uptime < 24 * 3600
+
+    def test_endpoint(self):
+        response = TestClient(app).get("/api/v1/admin/startup")
+        assert response.status_code == 200
+        components = response.json()["components_ms"]
+        assert {"init.rules", "init.risk_model", "init.app"} <= set(components)
+
+
+class TestTelemetry:
+    """Tests de la configuración diferida de trazas"""
+
+    def test_unknown_exporter(self):
+        with pytest.raises(ValueError):
+            Telemetry(exporter="zipkin")
+
+    @pytest.mark.parametrize("exporter", ["jaeger", "none"])
+    def test_importing_the_app_does_not_load_the_sdk(self, exporter):
+        code = (
+            "import sys, src.main; "
+            "print([m for m in ('opentelemetry.sdk.trace', 'opentelemetry.instrumentation.fastapi',"
+            " 'opentelemetry.exporter.jaeger.thrift') if m in sys.modules])"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=60,
+            env={**os.environ, "TRACE_EXPORTER": exporter},
+        )
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip().splitlines()[-1] == "[]"
+
+    def test_disabled_tracing_passes_requests_through(self):
+        telemetry = Telemetry(exporter="none")
+        application = FastAPI()
+        application.add_api_route("/ping", lambda: {"ok": True})
+        application.add_middleware(LazyTracingMiddleware, telemetry=telemetry)
+        assert TestClient(application).get("/ping").json() == {"ok": True}
+        assert telemetry.configure() is False and telemetry.provider is None
+
+    def test_tracing_is_configured_on_first_request(self):
+        report = StartupReport()
+        telemetry = Telemetry(exporter="console", excluded_urls="/health", report=report)
+        application = FastAPI()
+        application.add_api_route("/items/{item_id}", lambda item_id: {"id": item_id})
+        application.add_api_route("/health", lambda: {"ok": True})
+        application.add_middleware(LazyTracingMiddleware, telemetry=telemetry)
+        client = TestClient(application)
+
+        assert client.get("/items/1").status_code == 200
+        assert telemetry.enabled
+        assert {"import.opentelemetry_sdk", "init.tracing"} <= set(report.components)
+
+        exporter = InMemorySpanExporter()
+        telemetry.provider.add_span_processor(SimpleSpanProcessor(exporter))
+        client.get("/items/2")
+        client.get("/health")
+        roots = [span for span in exporter.get_finished_spans() if span.parent is None]
+        assert [span.name for span in roots] == ["GET /items/{item_id}"]
+        assert roots[0].attributes["http.route"] == "/items/{item_id}"
+        telemetry.shutdown()
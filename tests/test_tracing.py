@@ -0,0 +1,121 @@
+"""
+Tests para el muestreo de trazas por cola
+"""
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExportResult
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import Status, StatusCode
+
+from src.tracing import GuardedSpanExporter, TailSamplingProcessor, TokenBucket, high_risk
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_tracer(**kwargs):
+    exporter = InMemorySpanExporter()
+    decisions = []
+    processor = TailSamplingProcessor(
+        SimpleSpanProcessor(exporter),
+        on_decision=lambda kept, reason: decisions.append((kept, reason)),
+        **kwargs
+    )
+    provider = TracerProvider()
+    provider.add_span_processor(processor)
+    return provider.get_tracer(__name__), exporter, decisions
+
+
+def run_trace(tracer, risk_level="low", error=False):
+    with tracer.start_as_current_span("request"):
+        with tracer.start_as_current_span("validate_transaction") as span:
+            span.set_attribute("validation.risk_level", risk_level)
+            if error:
+                span.set_status(Status(StatusCode.ERROR))
+
+
+class TestTokenBucket:
+    """Tests del presupuesto de trazas por segundo"""
+
+    def test_refills_at_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, clock=clock)
+        assert [bucket.allow() for _ in range(3)] == [True, True, False]
+        clock.now = 0.5
+        assert bucket.allow() is True
+        assert bucket.allow() is False
+
+
+class TestTailSamplingProcessor:
+    """Tests de las decisiones por traza"""
+
+    def test_rate_limits_healthy_traces(self):
+        clock = FakeClock()
+        tracer, exporter, decisions = make_tracer(traces_per_second=2, clock=clock)
+        for _ in range(5):
+            run_trace(tracer)
+
+        assert decisions == [(True, "rate")] * 2 + [(False, "rate_limited")] * 3
+        # Las trazas conservadas se exportan completas
+        assert len(exporter.get_finished_spans()) == 4
+
+    def test_always_keeps_errors_slow_and_interesting(self):
+        clock = FakeClock()
+        tracer, exporter, decisions = make_tracer(
+            traces_per_second=0, slow_threshold=60, is_interesting=high_risk, clock=clock
+        )
+        run_trace(tracer)
+        run_trace(tracer, error=True)
+        run_trace(tracer, risk_level="high")
+
+        assert decisions == [(False, "rate_limited"), (True, "error"), (True, "interesting")]
+        assert len(exporter.get_finished_spans()) == 4
+
+    def test_slow_traces_are_kept(self):
+        tracer, exporter, decisions = make_tracer(traces_per_second=0, slow_threshold=0)
+        run_trace(tracer)
+        assert decisions == [(True, "slow")]
+
+    def test_pending_buffer_is_bounded(self):
+        tracer, exporter, decisions = make_tracer(traces_per_second=100, max_traces=2)
+        roots = [tracer.start_span(f"root-{i}") for i in range(3)]
+        for root in roots:
+            tracer.start_span("child", context=trace.set_span_in_context(root)).end()
+
+        assert decisions == [(False, "overflow")]
+        for root in roots:
+            root.end()
+        # La traza expulsada ya no se exporta aunque termine su raíz
+        exported = [s.name for s in exporter.get_finished_spans() if s.parent is None]
+        assert exported == ["root-1", "root-2"]
+
+
+class TestGuardedSpanExporter:
+    """Tests del exportador protegido"""
+
+    def test_backend_errors_are_rate_limited(self):
+        class Unreachable(InMemorySpanExporter):
+            def export(self, spans):
+                raise OSError("Name or service not known")
+
+        clock = FakeClock()
+        errors = []
+        exporter = GuardedSpanExporter(Unreachable(), on_error=errors.append, error_interval=60, clock=clock)
+        assert exporter.export([]) is SpanExportResult.FAILURE
+        exporter.export([])
+        clock.now = 61
+        exporter.export([])
+        assert exporter.failures == 3
+        assert len(errors) == 2 and isinstance(errors[0], OSError)
+
+    def test_successful_export_is_delegated(self):
+        delegate = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(GuardedSpanExporter(delegate)))
+        provider.get_tracer(__name__).start_span("ok").end()
+        assert [s.name for s in delegate.get_finished_spans()] == ["ok"]
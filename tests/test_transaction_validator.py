@@ -199,6 +199,32 @@ class TestErrorHandling:
         )
         assert response.status_code == 422
 
+    def test_validation_error_format(self):
+        """El parseo rápido conserva el formato de errores de FastAPI"""
+        response = client.post(
+            "/api/v1/validate",
+            content=b'{"transaction_id": ',
+            headers={"Content-Type": "application/json"}
+        )
+        assert response.json()["detail"] == [{
+            "type": "json_invalid",
+            "loc": ["body", 19],
+            "msg": "JSON decode error",
+            "input": {},
+            "ctx": {"error": "Expecting value"},
+        }]
+
+        response = client.post("/api/v1/validate", json={"transaction_id": "TX-E", "amount": -1})
+        errors = response.json()["detail"]
+        assert [error["loc"] for error in errors] == [
+            ["body", "amount"], ["body", "sender_account"], ["body", "receiver_account"]
+        ]
+        assert errors[0]["msg"] == "Input should be greater than 0"
+
+        response = client.post("/api/v1/validate", headers={"Content-Type": "application/json"})
+        assert response.json()["detail"][0]["type"] == "missing"
+        assert response.json()["detail"][0]["loc"] == ["body"]
+
 
 @pytest.mark.asyncio
 class TestConcurrentRequests:
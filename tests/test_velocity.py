@@ -0,0 +1,88 @@
+"""
+Tests para el índice de velocidad por cuenta
+"""
+from src.velocity import VelocityIndex, VelocityRules, VelocitySnapshot, velocity_risk
+
+
+class TestVelocityIndex:
+    """Tests de la ventana deslizante"""
+
+    def test_counts_and_amounts_within_window(self):
+        index = VelocityIndex(window_seconds=60, buckets=12)
+        for i in range(5):
+            snapshot = index.record("A", "B", 100.0, now=1000.0 + i)
+
+        assert snapshot.sender_count == 5
+        assert snapshot.sender_amount == 500.0
+        assert snapshot.receiver_count == 5
+
+    def test_old_buckets_expire(self):
+        index = VelocityIndex(window_seconds=60, buckets=12)
+        index.record("A", "B", 100.0, now=1000.0)
+        index.record("A", "B", 100.0, now=1030.0)
+
+        snapshot = index.record("A", "C", 50.0, now=1065.0)
+        assert snapshot.sender_count == 2
+        assert snapshot.sender_amount == 150.0
+
+        snapshot = index.record("A", "C", 50.0, now=1200.0)
+        assert snapshot.sender_count == 1
+        assert snapshot.sender_amount == 50.0
+
+    def test_new_pair_detection(self):
+        index = VelocityIndex(pair_ttl_seconds=3600)
+        assert index.record("A", "B", 1.0, now=0.0).new_pair is True
+        assert index.record("A", "B", 1.0, now=10.0).new_pair is False
+        assert index.record("A", "C", 1.0, now=20.0).new_pair is True
+        assert index.record("A", "B", 1.0, now=5000.0).new_pair is True
+
+    def test_pairs_with_equal_hash_are_distinct(self):
+        class Account(str):
+            # Fuerza la colisión que un hash de la tupla (emisor, receptor) no distingue
+            def __hash__(self):
+                return 42
+
+        index = VelocityIndex(pair_ttl_seconds=3600)
+        assert index.record(Account("A"), Account("B"), 1.0, now=0.0).new_pair is True
+        assert index.record(Account("C"), Account("D"), 1.0, now=1.0).new_pair is True
+
+    def test_idle_accounts_are_evicted(self):
+        index = VelocityIndex(window_seconds=60, buckets=12)
+        for i in range(1000):
+            index.record(f"S{i}", f"R{i}", 1.0, now=1000.0)
+        assert len(index) == 2000
+
+        index.record("S-nuevo", "R-nuevo", 1.0, now=2000.0)
+        assert len(index) == 2
+
+    def test_account_cap_bounds_memory(self):
+        index = VelocityIndex(max_accounts=100)
+        for i in range(1000):
+            index.record(f"S{i}", "R", 1.0, now=1000.0)
+        assert len(index) <= 101
+
+
+class TestVelocityRules:
+    """Tests de las reglas de riesgo"""
+
+    def test_quiet_account_has_no_risk(self):
+        snapshot = VelocitySnapshot(sender_count=1, sender_amount=100.0, receiver_count=1, new_pair=False)
+        risk, warnings = velocity_risk(snapshot, 100.0, VelocityRules())
+        assert risk == 0.0
+        assert warnings == []
+
+    def test_burst_of_transfers_is_risky(self):
+        rules = VelocityRules(max_sender_count=3)
+        index = VelocityIndex()
+        for i in range(4):
+            snapshot = index.record("A", f"B{i}", 100.0, now=1000.0 + i)
+
+        risk, warnings = velocity_risk(snapshot, 100.0, rules)
+        assert risk >= 0.15
+        assert len(warnings) == 1
+
+    def test_high_amount_to_new_receiver(self):
+        snapshot = VelocitySnapshot(sender_count=1, sender_amount=600000.0, receiver_count=1, new_pair=True)
+        risk, warnings = velocity_risk(snapshot, 600000.0, VelocityRules())
+        assert risk > 0
+        assert len(warnings) == 1